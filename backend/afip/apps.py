@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class AfipConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "afip"
+
+    def ready(self):
+        from .cpe_referencias import conectar_senales
+
+        conectar_senales()
+
+        # El renovador de tickets WSAA y la precarga de tipos de comprobante arrancan con el
+        # servidor (afip.arranque), no acá: ready() corre también en migrate, test, etc.
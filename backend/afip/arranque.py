@@ -0,0 +1,37 @@
+"""
+Tareas en segundo plano de los procesos que atienden requests.
+
+No se arrancan desde AfipConfig.ready(): ready() corre en cada manage.py (migrate,
+test, makemigrations) y en los dos procesos del autoreloader de runserver. En cambio
+server/wsgi.py y server/asgi.py llaman a iniciar_servidor(), y esos módulos sólo los
+importa el proceso que sirve (el hijo de runserver, cada worker de gunicorn/uvicorn).
+Con gunicorn --preload la app se importa en el master antes del fork y los hilos no
+pasan a los workers: ahí conviene `manage.py renovar_tickets_afip` como proceso aparte.
+"""
+import threading
+
+from django.conf import settings
+
+
+def iniciar_precarga_tipos_comprobante() -> threading.Thread | None:
+    """Precarga en un hilo los tipos de comprobante de AFIP_PRECARGAR_PTO_VTAS (ver solicitar_cae)."""
+    if not settings.AFIP_PRECARGAR_PTO_VTAS:
+        return None
+    from .solicitar_cae import precargar_tipos_comprobante
+
+    hilo = threading.Thread(
+        target=precargar_tipos_comprobante,
+        args=(settings.AFIP_CUIT_EMISOR, settings.AFIP_PRECARGAR_PTO_VTAS),
+        name="afip-precarga-tipos-cbte",
+        daemon=True,
+    )
+    hilo.start()
+    return hilo
+
+
+def iniciar_servidor() -> None:
+    if settings.AFIP_WSAA_RENOVADOR_AUTOMATICO:
+        from .wsaa import iniciar_renovador
+
+        iniciar_renovador()
+    iniciar_precarga_tipos_comprobante()
@@ -0,0 +1,115 @@
+"""
+Modo CAEA: el CAEA se pide una vez por quincena y los comprobantes se emiten localmente
+(numeración con el numerador local, sin round-trip a AFIP). Después se informan en lotes
+con FECAEARegInformativo (manage.py informar_caea), reintentando si AFIP no responde.
+
+Se activa con settings.AFIP_MODO_EMISION = "CAEA". El punto de venta usado tiene que
+estar dado de alta en AFIP como punto de venta CAEA.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import solicitar_cae as fe
+from .models import Caea
+
+LOGGER = logging.getLogger(__name__)
+
+# AFIP permite pedir el CAEA de la quincena siguiente dentro de los 5 días previos.
+DIAS_ANTICIPO = 5
+
+
+def modo_caea() -> bool:
+    return str(getattr(settings, "AFIP_MODO_EMISION", "CAE")).upper() == "CAEA"
+
+
+def periodo_y_orden(fecha: date) -> tuple[str, int]:
+    return fecha.strftime("%Y%m"), 1 if fecha.day <= 15 else 2
+
+
+def _siguiente_quincena(fecha: date) -> date:
+    if fecha.day <= 15:
+        return fecha.replace(day=16)
+    return (fecha.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _fecha(valor: str) -> date | None:
+    return datetime.strptime(valor, "%Y%m%d").date() if valor else None
+
+
+def pedir_caea(cuit: str, periodo: str, orden: int) -> Caea:
+    datos = fe.solicitar_caea(cuit, periodo, orden)
+    caea, _ = Caea.objects.update_or_create(
+        cuit=str(cuit),
+        periodo=periodo,
+        orden=orden,
+        defaults={
+            "caea": datos["caea"],
+            "vigente_desde": _fecha(datos["fch_vig_desde"]),
+            "vigente_hasta": _fecha(datos["fch_vig_hasta"]),
+            "tope_informar": _fecha(datos["fch_tope_inf"]),
+        },
+    )
+    return caea
+
+
+def obtener_caea_vigente(cuit: str, fecha: date | None = None) -> Caea:
+    """CAEA de la quincena de `fecha` (hoy); si todavía no se pidió, se pide a AFIP."""
+    periodo, orden = periodo_y_orden(fecha or timezone.localdate())
+    caea = Caea.objects.filter(cuit=str(cuit), periodo=periodo, orden=orden).first()
+    return caea or pedir_caea(cuit, periodo, orden)
+
+
+def asegurar_caea(cuit: str, hoy: date | None = None) -> list[Caea]:
+    """Deja pedido el CAEA vigente y, en los días previos al cambio de quincena, el siguiente."""
+    hoy = hoy or timezone.localdate()
+    caeas = [obtener_caea_vigente(cuit, hoy)]
+    siguiente = _siguiente_quincena(hoy)
+    if (siguiente - hoy).days <= DIAS_ANTICIPO:
+        caeas.append(obtener_caea_vigente(cuit, siguiente))
+    return caeas
+
+
+def informar_pendientes(cuit: str, *, reintentar_rechazados: bool = False) -> dict:
+    """
+    Informa los comprobantes CAEA todavía no informados, agrupados por
+    (pto_vta, cbte_tipo, CAEA). Aprobados -> caea_informado; rechazados -> caea_rechazo con
+    las observaciones (no se reintentan solos). Un error de AFIP corta ese grupo y se
+    reintenta en la próxima pasada.
+    """
+    from billing.models import Invoice
+
+    qs = Invoice.objects.filter(modo_autorizacion=Invoice.MODO_CAEA, caea_informado__isnull=True)
+    if not reintentar_rechazados:
+        qs = qs.filter(caea_rechazo="")
+
+    grupos: dict[tuple, list] = defaultdict(list)
+    for inv in qs.order_by("pto_vta", "cbte_tipo", "cbte_nro"):
+        grupos[(inv.pto_vta, inv.cbte_tipo, inv.cae)].append(inv)
+
+    stats = {"informados": 0, "rechazados": 0, "errores": 0}
+    for (pto_vta, cbte_tipo, caea), facturas in grupos.items():
+        comprobantes = [
+            {"cbte_nro": inv.cbte_nro, **inv.metadata.get("caea_detalle", {})} for inv in facturas
+        ]
+        try:
+            resultados = fe.informar_caea(cuit, pto_vta, cbte_tipo, caea, comprobantes)
+        except Exception as exc:
+            LOGGER.warning("No se pudo informar el CAEA %s (%s-%s): %s", caea, pto_vta, cbte_tipo, exc)
+            stats["errores"] += len(facturas)
+            continue
+
+        ahora = timezone.now()
+        for inv, res in zip(facturas, resultados):
+            if res["resultado"] == "A":
+                inv.caea_informado = ahora
+                inv.caea_rechazo = ""
+                stats["informados"] += 1
+            else:
+                inv.caea_rechazo = "; ".join(res["observations"]) or "Rechazado por AFIP"
+                stats["rechazados"] += 1
+        Invoice.objects.bulk_update(facturas, ["caea_informado", "caea_rechazo"])
+    return stats
@@ -1,4 +1,9 @@
-"""Consulta el estado de una CPE automotor y guarda la respuesta en la base de datos."""
+"""
+Consulta el estado de una CPE automotor y guarda la respuesta en la base de datos.
+
+Script de prueba para un solo CTG; para consultar listas de CTG usar
+`python manage.py consultar_cpes`.
+"""
 
 from __future__ import annotations
 
@@ -17,7 +22,7 @@ BASE_DIR = Path(__file__).resolve().parents[1]
 if str(BASE_DIR) not in sys.path:
     sys.path.append(str(BASE_DIR))
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "count.settings")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server.settings")
 
 import django  # noqa: E402
 
@@ -0,0 +1,191 @@
+"""
+Clientes, proveedores, productos y vehículos que referencia cada CPE, resueltos con
+un cache LRU por proceso.
+
+Una consulta de CPE hacía hasta seis queries de datos de referencia (get_or_create
+del pagador, del producto y del vehículo, búsqueda del proveedor, renombre del
+producto). En un lote los mismos pocos pagadores, granos y camiones se repiten miles
+de veces, así que cada resolver_* mira primero el cache y sólo va a la base si no
+está.
+
+- Las entradas se agregan cuando commitea la transacción que las leyó o creó: un
+  rollback no deja en el cache filas que no existen.
+- post_save / post_delete de cada modelo descartan las entradas de esa fila (por
+  clave y por pk), así que ediciones desde la API o el admin se ven al instante en
+  este proceso. Cambios hechos en otro proceso o con queryset.update() no disparan
+  señales; el tamaño acotado hace que esas entradas terminen saliendo.
+
+settings.CPE_REFERENCIAS_CACHE fija cuántas entradas guarda cada cache (0 lo apaga).
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from billing.models import Client, Product, Provider
+from trips.models import Vehicle
+
+# Valor cacheado para "no existe" (proveedor desconocido): evita repetir la query en cada CPE.
+_NO_EXISTE = object()
+
+
+def _tamano() -> int:
+    return int(getattr(settings, "CPE_REFERENCIAS_CACHE", 4096))
+
+
+class CacheLRU:
+    """dict acotado con orden de uso; seguro entre hilos."""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._datos: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def get(self, clave):
+        with self._lock:
+            valor = self._datos.get(clave)
+            if valor is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def put(self, clave, valor) -> None:
+        tamano = _tamano()
+        if tamano <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > tamano:
+                self._datos.popitem(last=False)
+
+    def put_al_commitear(self, clave, valor) -> None:
+        transaction.on_commit(lambda: self.put(clave, valor))
+
+    def descartar(self, claves=(), pk=None) -> None:
+        with self._lock:
+            for clave in claves:
+                self._datos.pop(clave, None)
+            if pk is not None:
+                for clave, valor in list(self._datos.items()):
+                    if getattr(valor, "pk", None) == pk:
+                        del self._datos[clave]
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+            self.aciertos = self.fallos = 0
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+
+_CLIENTES = CacheLRU("clientes")  # CUIT -> Client
+_PROVEEDORES = CacheLRU("proveedores")  # CUIT -> Provider | _NO_EXISTE
+_PRODUCTOS = CacheLRU("productos")  # ("codigo", afip_code) | ("nombre", nombre en minúsculas) -> Product
+_VEHICULOS = CacheLRU("vehiculos")  # dominio -> Vehicle
+
+CACHES = (_CLIENTES, _PROVEEDORES, _PRODUCTOS, _VEHICULOS)
+
+
+def limpiar_cache() -> None:
+    for cache in CACHES:
+        cache.limpiar()
+
+
+def estadisticas_cache() -> dict:
+    return {cache.nombre: {"entradas": len(cache), "aciertos": cache.aciertos, "fallos": cache.fallos} for cache in CACHES}
+
+
+def resolver_cliente(cuit: str) -> Client | None:
+    """Cliente pagador por CUIT normalizado; si no existe se crea uno provisorio."""
+    if not cuit:
+        return None
+    client = _CLIENTES.get(cuit)
+    if client is None:
+        client, _ = Client.objects.get_or_create(
+            tax_id_normalized=cuit,
+            defaults={
+                "tax_id": cuit,
+                "name": f"Pagador {cuit}",
+                "email": f"pagador{cuit}@auto.example.com",
+            },
+        )
+        _CLIENTES.put_al_commitear(cuit, client)
+    return client
+
+
+def resolver_proveedor(cuit: str) -> Provider | None:
+    if not cuit:
+        return None
+    provider = _PROVEEDORES.get(cuit)
+    if provider is None:
+        provider = Provider.objects.filter(tax_id_normalized=cuit).first() or _NO_EXISTE
+        _PROVEEDORES.put_al_commitear(cuit, provider)
+    return None if provider is _NO_EXISTE else provider
+
+
+def resolver_producto(codigo: str | None, descripcion: str | None) -> Product | None:
+    """
+    Producto por código AFIP (se crea si no existe) o, sin código, por nombre sin
+    distinguir mayúsculas. Si AFIP informa otra descripción, el producto se renombra.
+    """
+    if codigo:
+        clave = ("codigo", codigo)
+        product = cacheado = _PRODUCTOS.get(clave)
+        if product is None:
+            product, _ = Product.objects.get_or_create(afip_code=codigo, defaults={"name": descripcion or codigo})
+    elif descripcion:
+        clave = ("nombre", descripcion.lower())
+        product = cacheado = _PRODUCTOS.get(clave)
+        if product is None:
+            product = Product.objects.filter(name__iexact=descripcion).first()
+            if not product:
+                product = Product.objects.create(name=descripcion)
+    else:
+        return None
+
+    if descripcion and product.name != descripcion:
+        # post_save lo saca del cache; se vuelve a agregar con el nombre nuevo.
+        product.name = descripcion
+        product.save(update_fields=["name"])
+        cacheado = None
+    if cacheado is None:
+        _PRODUCTOS.put_al_commitear(clave, product)
+    return product
+
+
+def resolver_vehiculo(dominio: str | None) -> Vehicle | None:
+    if not dominio:
+        return None
+    vehicle = _VEHICULOS.get(dominio)
+    if vehicle is None:
+        vehicle, _ = Vehicle.objects.get_or_create(domain=dominio)
+        _VEHICULOS.put_al_commitear(dominio, vehicle)
+    return vehicle
+
+
+def _invalidar(sender, instance, created=False, **kwargs) -> None:
+    # Una fila recién creada no puede estar cacheada por pk; alcanza con su clave.
+    pk = None if created else instance.pk
+    if sender is Client:
+        _CLIENTES.descartar([instance.tax_id_normalized], pk=pk)
+    elif sender is Provider:
+        # Un proveedor nuevo tiene que reemplazar el "no existe" cacheado para su CUIT.
+        _PROVEEDORES.descartar([instance.tax_id_normalized], pk=pk)
+    elif sender is Product:
+        _PRODUCTOS.descartar([("codigo", instance.afip_code), ("nombre", (instance.name or "").lower())], pk=pk)
+    elif sender is Vehicle:
+        _VEHICULOS.descartar([instance.domain], pk=pk)
+
+
+def conectar_senales() -> None:
+    for model in (Client, Provider, Product, Vehicle):
+        post_save.connect(_invalidar, sender=model, dispatch_uid=f"cpe_referencias_{model.__name__}_save")
+        post_delete.connect(_invalidar, sender=model, dispatch_uid=f"cpe_referencias_{model.__name__}_delete")
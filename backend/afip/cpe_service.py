@@ -1,13 +1,20 @@
+import base64
+import binascii
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from decimal import Decimal
 import logging
 import xml.etree.ElementTree as ET
 
-import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
 from django.utils import timezone
 
-from trips.models import CPEAutomotor, Vehicle
-from billing.models import Client, Product, Provider
+from trips.models import CPEAutomotor
+from . import transport
+from .cpe_referencias import resolver_cliente, resolver_producto, resolver_proveedor, resolver_vehiculo
 from .wsaa import get_token_sign
 
 logger = logging.getLogger(__name__)
@@ -15,6 +22,35 @@ logger = logging.getLogger(__name__)
 URL_PROD = "https://cpea-ws.afip.gob.ar/wscpe/services/soap"
 CUIT_REP = "30716004720"  # ajustar
 
+# Claves de la respuesta de wscpe que se buscan en cualquier nivel (IndiceRespuesta / _find_first).
+CLAVES_CUIT_CLIENTE = (
+    "cuitDestinatario",
+    "cuitDestino",
+    "cuitDestinatarioFinal",
+    "cuitDestinatarioComercial",
+    "cuitPagadorFlete",
+)
+CLAVES_CUIT_PROVEEDOR = ("cuitTransportista", "cuitInterviniente", "cuitSolicitante")
+CLAVES_PRODUCTO = ("descripcionProducto", "descProducto", "descripcionMercaderia", "mercaderia", "producto")
+CLAVES_COD_PRODUCTO = ("codProducto", "codigoProducto", "idProducto", "codGrano")
+CLAVES_PROCEDENCIA = ("procedencia", "descripcionOrigen", "nombreEstablecimientoOrigen", "domicilioOrigen")
+CLAVES_DESTINO = ("destino", "descripcionDestino", "nombreEstablecimientoDestino", "domicilioDestino")
+CLAVES_PESO_BRUTO = ("pesoBrutoDescarga", "pesoBruto", "pesoBrutoTotal")
+CLAVES_PESO_TARA = ("pesoTaraDescarga",)
+CLAVES_DOMINIO = (
+    "dominio",
+    "patente",
+    "dominioCamion",
+    "dominioCamión",
+    "dominioChasis",
+    "dominioAcoplado",
+    "patenteCamion",
+    "patenteChasis",
+    "patenteAcoplado",
+)
+CLAVES_ERROR_CODIGO = ("codigo", "code", "faultcode")
+CLAVES_ERROR_MENSAJE = ("mensaje", "descripcion", "faultstring", "detalle", "detail")
+
 def _element_to_dict(element):
     children = list(element)
     if not children:
@@ -103,6 +139,96 @@ def _find_first(data, keys):
     return None
 
 
+class IndiceRespuesta:
+    """
+    Índice clave -> valores de una respuesta ya convertida con _element_to_dict.
+
+    Se arma con una sola pasada en el mismo orden DFS que _find_first, así que
+    primero(keys) devuelve exactamente lo mismo que _find_first(data, keys) sin volver
+    a recorrer el árbol: cada consulta mira sólo las apariciones de esas claves.
+    El recorrido con pila visita cada sub-dict/lista como un tramo contiguo; guardando
+    esos tramos, primero(keys, dentro=x) equivale a _find_first(x, keys) para cualquier
+    contenedor x de la respuesta.
+    """
+
+    __slots__ = ("_data", "_apariciones", "_primera", "_tramos")
+
+    def __init__(self, data):
+        self._data = data  # los tramos se indexan por id(): el árbol tiene que seguir vivo
+        # clave corta -> [(orden de visita, valor)], en orden de visita
+        self._apariciones: dict[str, list[tuple[int, object]]] = {}
+        self._primera: dict[tuple[str, int], tuple[int, object] | None] = {}
+        self._tramos: dict[int, tuple[int, int]] = {}
+        if not data:
+            return
+
+        apariciones, tramos = self._apariciones, self._tramos
+        orden = 0
+        stack = [data]
+        while stack:
+            current = stack.pop()
+            if type(current) is _FinTramo:
+                tramos[current.contenedor] = (current.inicio, orden)
+                continue
+            if isinstance(current, (dict, list)):
+                # Debajo de los hijos: sale de la pila cuando terminó todo el subárbol.
+                stack.append(_FinTramo(id(current), orden))
+            if isinstance(current, dict):
+                for key, value in current.items():
+                    short_key = key.rpartition('}')[2]
+                    if short_key in apariciones:
+                        apariciones[short_key].append((orden, value))
+                    else:
+                        apariciones[short_key] = [(orden, value)]
+                    orden += 1
+                    if isinstance(value, (dict, list)):
+                        stack.append(value)
+            elif isinstance(current, list):
+                stack.extend(current)
+
+    def _primera_valida(self, key: str, desde: int) -> tuple[int, object] | None:
+        """Primera aparición de `key` con orden >= desde que _find_first devolvería."""
+        cache_key = (key, desde)
+        if cache_key in self._primera:
+            return self._primera[cache_key]
+        encontrada = None
+        apariciones = self._apariciones.get(key, ())
+        for orden, value in apariciones[bisect_left(apariciones, (desde,)):]:
+            if isinstance(value, (dict, list)):
+                value = _extract_first_leaf(value)
+            if value not in (None, "", []):
+                encontrada = (orden, value)
+                break
+        self._primera[cache_key] = encontrada
+        return encontrada
+
+    def primero(self, keys, dentro=None):
+        """Como _find_first(dentro or data, keys)."""
+        if dentro is None:
+            desde, hasta = 0, None
+        else:
+            tramo = self._tramos.get(id(dentro))
+            if tramo is None or not dentro:
+                return None
+            desde, hasta = tramo
+        mejor = None
+        for key in keys:
+            candidata = self._primera_valida(key, desde)
+            if candidata is None or (hasta is not None and candidata[0] >= hasta):
+                continue
+            if mejor is None or candidata[0] < mejor[0]:
+                mejor = candidata
+        return mejor[1] if mejor is not None else None
+
+
+class _FinTramo:
+    __slots__ = ("contenedor", "inicio")
+
+    def __init__(self, contenedor: int, inicio: int):
+        self.contenedor = contenedor
+        self.inicio = inicio
+
+
 def _to_decimal(value):
     if value in (None, ""):
         return None
@@ -112,17 +238,6 @@ def _to_decimal(value):
         return None
 
 
-def _match_by_tax_id(model, tax_id_value):
-    normalized = _normalize_tax_id(tax_id_value)
-    if not normalized:
-        return None
-    candidates = model.objects.filter(tax_id__icontains=normalized)
-    for candidate in candidates:
-        if _normalize_tax_id(candidate.tax_id) == normalized:
-            return candidate
-    return None
-
-
 def _normalize_domain(value: str | None) -> str | None:
     if not value:
         return None
@@ -130,6 +245,23 @@ def _normalize_domain(value: str | None) -> str | None:
     return cleaned or None
 
 
+def datos_derivados(indice: IndiceRespuesta, peso_bruto_descarga=None) -> dict:
+    """
+    Columnas de CPEAutomotor que salen de raw_response: se extraen una vez al ingresar
+    la CPE para que listados y totales no vuelvan a recorrer el JSON. El peso bruto de
+    la respuesta tiene prioridad sobre el informado a mano.
+    """
+    peso = _to_decimal(indice.primero(CLAVES_PESO_BRUTO))
+    if peso is None:
+        peso = _to_decimal(peso_bruto_descarga)
+    cuit_pagador = _normalize_tax_id(indice.primero(CLAVES_CUIT_CLIENTE))
+    return {
+        "peso_bruto_descarga": peso,
+        "peso_tara_descarga": _to_decimal(indice.primero(CLAVES_PESO_TARA)),
+        "cuit_pagador": cuit_pagador if len(cuit_pagador) == 11 else "",
+    }
+
+
 class CPEConsultationError(Exception):
     def __init__(self, message: str, code: str | None = None, is_transient: bool = False):
         super().__init__(message)
@@ -146,9 +278,11 @@ def _sanitize_payload(value: str, secrets: list[str]) -> str:
     return sanitized
 
 
-def _extract_error_info(payload: dict) -> tuple[str | None, str | None]:
+def _extract_error_info(payload: dict, indice: IndiceRespuesta | None = None) -> tuple[str | None, str | None]:
     if not isinstance(payload, dict):
         return None, None
+    if indice is None:
+        indice = IndiceRespuesta(payload)
 
     potential_containers = [payload]
     for key, value in payload.items():
@@ -161,17 +295,8 @@ def _extract_error_info(payload: dict) -> tuple[str | None, str | None]:
             potential_containers.append(value)
 
     for container in potential_containers:
-        code = _find_first(container, {"codigo", "code", "faultcode"})
-        message = _find_first(
-            container,
-            {
-                "mensaje",
-                "descripcion",
-                "faultstring",
-                "detalle",
-                "detail",
-            },
-        )
+        code = indice.primero(CLAVES_ERROR_CODIGO, dentro=container)
+        message = indice.primero(CLAVES_ERROR_MENSAJE, dentro=container)
         if message:
             return (str(code).strip() if code else None, str(message).strip())
     return None, None
@@ -188,8 +313,41 @@ def _normalize_error_code(code: str | None, message: str | None) -> str | None:
     return None
 
 
-def consultar_cpe_por_ctg(nro_ctg: str, peso_bruto_descarga: Decimal | None = None) -> CPEAutomotor:
-    token, sign = get_token_sign(service="wscpe")
+def parsear_respuesta(xml: str | bytes) -> tuple[dict, IndiceRespuesta]:
+    """
+    <respuesta> de un sobre SOAP de ConsultarCPEAutomotor ya convertida y su índice.
+    Lanza CPEConsultationError si es un Fault o trae errores. No toca la base.
+    """
+    root = ET.fromstring(xml)
+
+    fault = root.find(".//{http://schemas.xmlsoap.org/soap/envelope/}Fault") or root.find(".//Fault")
+    if fault is not None:
+        fault_data = _element_to_dict(fault)
+        code, message = _extract_error_info(fault_data)
+        normalized_code = _normalize_error_code(code, message)
+        raise CPEConsultationError(
+            message or "Respuesta de error de AFIP",
+            code=normalized_code,
+            is_transient=False,
+        )
+
+    resp = root.find(".//respuesta")
+    if resp is None:
+        raise CPEConsultationError("Respuesta inválida del WS CPE", code="INVALID_RESPONSE")
+
+    data = _element_to_dict(resp)
+    indice = IndiceRespuesta(data)
+    error_code, error_message = _extract_error_info(data, indice)
+    if error_message:
+        normalized_code = _normalize_error_code(error_code, error_message)
+        raise CPEConsultationError(error_message, code=normalized_code)
+    return data, indice
+
+
+def _consultar_wscpe(nro_ctg: str, token: str, sign: str) -> tuple[dict, IndiceRespuesta]:
+    """ConsultarCPEAutomotor de un CTG: la <respuesta> ya convertida y su índice. No toca la base."""
+    import requests
+
     body = f"""<?xml version="1.0" encoding="UTF-8"?>
 <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
                   xmlns:wsc="https://serviciosjava.afip.gob.ar/wscpe/">
@@ -223,7 +381,7 @@ def consultar_cpe_por_ctg(nro_ctg: str, peso_bruto_descarga: Decimal | None = No
     )
 
     try:
-        r = requests.post(URL_PROD, data=body.encode("utf-8"), headers=headers, timeout=60)
+        r = transport.post(URL_PROD, data=body.encode("utf-8"), headers=headers, timeout=60)
         r.raise_for_status()
     except requests.RequestException as exc:  # pragma: no cover - logged for debugging
         response_text = getattr(exc.response, "text", "") if hasattr(exc, "response") else ""
@@ -253,82 +411,67 @@ def consultar_cpe_por_ctg(nro_ctg: str, peso_bruto_descarga: Decimal | None = No
         },
     )
 
-    root = ET.fromstring(r.text)
+    return parsear_respuesta(r.text)
 
-    fault = root.find(".//{http://schemas.xmlsoap.org/soap/envelope/}Fault") or root.find(".//Fault")
-    if fault is not None:
-        fault_data = _element_to_dict(fault)
-        code, message = _extract_error_info(fault_data)
-        normalized_code = _normalize_error_code(code, message)
-        raise CPEConsultationError(
-            message or "Respuesta de error de AFIP",
-            code=normalized_code,
-            is_transient=False,
-        )
 
-    resp = root.find(".//respuesta")
-    if resp is None:
-        raise CPEConsultationError("Respuesta inválida del WS CPE", code="INVALID_RESPONSE")
+def separar_pdf(data) -> bytes | None:
+    """
+    Saca de la respuesta el primer <pdf> (base64, el mismo que encontraría _find_first)
+    y lo devuelve decodificado, para que raw_response no cargue con el PDF. Si no se
+    puede decodificar queda donde estaba.
+    """
+    stack = [data]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            for key, value in current.items():
+                if key.split('}')[-1] == "pdf" and isinstance(value, str) and value:
+                    try:
+                        contenido = base64.b64decode(value)
+                    except (binascii.Error, ValueError):
+                        return None
+                    del current[key]
+                    return contenido
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+        elif isinstance(current, list):
+            stack.extend(current)
+    return None
 
-    data = _element_to_dict(resp)
-    error_code, error_message = _extract_error_info(data)
-    if error_message:
-        normalized_code = _normalize_error_code(error_code, error_message)
-        raise CPEConsultationError(error_message, code=normalized_code)
-    cab = data.get("cabecera", {}) or {}
-    client_tax_id = _find_first(
-        data,
-        {
-            "cuitDestinatario",
-            "cuitDestino",
-            "cuitDestinatarioFinal",
-            "cuitDestinatarioComercial",
-            "cuitPagadorFlete",
-        },
-    )
 
-    client = _match_by_tax_id(Client, client_tax_id)
-    if client is None:
-        normalized_client_tax_id = _normalize_tax_id(client_tax_id)
-        if normalized_client_tax_id:
-            client, _ = Client.objects.get_or_create(
-                tax_id=normalized_client_tax_id,
-                defaults={
-                    "name": f"Pagador {normalized_client_tax_id}",
-                    "email": f"pagador{normalized_client_tax_id}@auto.example.com",
-                },
-            )
-    provider = _match_by_tax_id(
-        Provider,
-        _find_first(
-            data,
-            {
-                "cuitTransportista",
-                "cuitInterviniente",
-                "cuitSolicitante",
-            },
-        ),
-    )
+def guardar_pdf(obj: CPEAutomotor, contenido: bytes | None) -> bool:
+    """
+    Escribe el PDF en el storage y lo asigna a obj.pdf (sin guardar la fila). El archivo
+    anterior se borra recién al commitear. True si hubo PDF.
+    """
+    if not contenido:
+        return False
+    anterior = obj.pdf.name if obj.pdf else None
+    obj.pdf.save(f"cpe_{obj.nro_ctg}.pdf", ContentFile(contenido), save=False)
+    if anterior and anterior != obj.pdf.name:
+        storage = obj.pdf.storage
+        transaction.on_commit(lambda: storage.delete(anterior))
+    return True
+
+
+def extraer_cpe(
+    data: dict,
+    nro_ctg: str,
+    peso_bruto_descarga: Decimal | None = None,
+    indice: IndiceRespuesta | None = None,
+) -> tuple[dict, dict]:
+    """
+    Campos de CPEAutomotor que salen de una <respuesta> de wscpe, sin tocar la base:
+    (campos, referencias). referencias son los CUIT, el producto y el dominio que
+    resolver_referencias convierte en FKs. campos["pdf"] son los bytes del PDF (o None),
+    ya fuera de raw_response; quien guarda la fila los pasa a guardar_pdf.
+    """
+    indice = indice or IndiceRespuesta(data)
+    pdf = separar_pdf(data)
+    cab = data.get("cabecera", {}) or {}
 
-    producto_data = _find_first(
-        data,
-        {
-            "descripcionProducto",
-            "descProducto",
-            "descripcionMercaderia",
-            "mercaderia",
-            "producto",
-        },
-    )
-    producto_codigo = _find_first(
-        data,
-        {
-            "codProducto",
-            "codigoProducto",
-            "idProducto",
-            "codGrano",
-        },
-    )
+    producto_data = indice.primero(CLAVES_PRODUCTO)
+    producto_codigo = indice.primero(CLAVES_COD_PRODUCTO)
 
     if isinstance(producto_data, dict):
         producto_descripcion = producto_data.get("descripcion") or producto_data.get("descripcionProducto")
@@ -340,87 +483,178 @@ def consultar_cpe_por_ctg(nro_ctg: str, peso_bruto_descarga: Decimal | None = No
     if producto_codigo:
         producto_codigo = str(producto_codigo).strip()
 
-    product = None
-    if producto_codigo:
-        product, _ = Product.objects.get_or_create(
-            afip_code=producto_codigo,
-            defaults={"name": producto_descripcion or producto_codigo},
-        )
-    elif producto_descripcion:
-        product = Product.objects.filter(name__iexact=producto_descripcion).first()
-        if not product:
-            product = Product.objects.create(name=producto_descripcion)
-
-    if product and producto_descripcion and product.name != producto_descripcion:
-        product.name = producto_descripcion
-        product.save(update_fields=["name"])
-
-    procedencia = _find_first(
-        data,
-        {"procedencia", "descripcionOrigen", "nombreEstablecimientoOrigen", "domicilioOrigen"},
-    )
-    destino = _find_first(
-        data,
-        {"destino", "descripcionDestino", "nombreEstablecimientoDestino", "domicilioDestino"},
-    )
-    peso = _to_decimal(
-        _find_first(
-            data,
-            {"pesoBrutoDescarga", "pesoBruto", "pesoBrutoTotal"},
-        )
-    )
-    if peso is None and peso_bruto_descarga is not None:
-        peso = _to_decimal(peso_bruto_descarga)
-    dominio = _find_first(
-        data,
-        {
-            "dominio",
-            "patente",
-            "dominioCamion",
-            "dominioCamión",
-            "dominioChasis",
-            "dominioAcoplado",
-            "patenteCamion",
-            "patenteChasis",
-            "patenteAcoplado",
-        },
-    )
-
-    domain = _normalize_domain(dominio)
-    vehicle = None
-    if domain:
-        vehicle, _ = Vehicle.objects.get_or_create(domain=domain)
-
-    defaults_extra = {
-        "client": client,
-        "provider": provider,
-        "product": product,
+    procedencia = indice.primero(CLAVES_PROCEDENCIA)
+    destino = indice.primero(CLAVES_DESTINO)
+
+    campos = {
+        "nro_ctg": str(cab.get("nroCTG") or nro_ctg).strip(),
+        "tipo_carta_porte": cab.get("tipoCartaPorte"),
+        "sucursal": cab.get("sucursal"),
+        "nro_orden": cab.get("nroOrden"),
+        "estado": cab.get("estado"),
+        "fecha_emision": _parse_datetime(cab.get("fechaEmision")),
+        "fecha_inicio_estado": _parse_datetime(cab.get("fechaInicioEstado")),
+        "fecha_vencimiento": _parse_datetime(cab.get("fechaVencimiento")),
+        "observaciones": cab.get("observaciones"),
+        "raw_response": data,
         "product_description": producto_descripcion or producto_codigo or "",
         "procedencia": str(procedencia).strip() if procedencia else "",
         "destino": str(destino).strip() if destino else "",
-        "peso_bruto_descarga": peso,
-        "vehicle": vehicle,
+        **datos_derivados(indice, peso_bruto_descarga),
+        "pdf": pdf,
+    }
+    referencias = {
+        "cuit_cliente": _normalize_tax_id(indice.primero(CLAVES_CUIT_CLIENTE)),
+        "cuit_proveedor": _normalize_tax_id(indice.primero(CLAVES_CUIT_PROVEEDOR)),
+        "producto_codigo": producto_codigo or None,
+        "producto_descripcion": producto_descripcion or None,
+        "dominio": _normalize_domain(indice.primero(CLAVES_DOMINIO)),
+    }
+    return campos, referencias
+
+
+def resolver_referencias(referencias: dict, memo: dict | None = None) -> dict:
+    """
+    FKs de la CPE a partir de lo que devuelve extraer_cpe (ver cpe_referencias).
+    `memo` se comparte entre las filas de un lote guardado en una transacción: el cache
+    LRU recién se llena al commitear, así que sin él cada fila repetiría las queries.
+    """
+
+    def resolver(funcion, *args):
+        if memo is None:
+            return funcion(*args)
+        clave = (funcion.__name__, args)
+        if clave not in memo:
+            memo[clave] = funcion(*args)
+        return memo[clave]
+
+    return {
+        "client": resolver(resolver_cliente, referencias["cuit_cliente"]),
+        "provider": resolver(resolver_proveedor, referencias["cuit_proveedor"]),
+        "product": resolver(resolver_producto, referencias["producto_codigo"], referencias["producto_descripcion"]),
+        "vehicle": resolver(resolver_vehiculo, referencias["dominio"]),
     }
 
-    obj, created = CPEAutomotor.objects.update_or_create(
-        nro_ctg=str(cab.get("nroCTG") or nro_ctg).strip(),
-        defaults={
-            "tipo_carta_porte": cab.get("tipoCartaPorte"),
-            "sucursal": cab.get("sucursal"),
-            "nro_orden": cab.get("nroOrden"),
-            "estado": cab.get("estado"),
-            "fecha_emision": _parse_datetime(cab.get("fechaEmision")),
-            "fecha_inicio_estado": _parse_datetime(cab.get("fechaInicioEstado")),
-            "fecha_vencimiento": _parse_datetime(cab.get("fechaVencimiento")),
-            "observaciones": cab.get("observaciones"),
-            "raw_response": data,
-            **defaults_extra,
-        },
-    )
-    if created and product and product.default_tariff and product.default_tariff != 0:
-        obj.tariff = product.default_tariff
-        obj.save(update_fields=["tariff"])
-    elif obj.tariff in (None, Decimal("0")) and product and product.default_tariff:
+
+def _aplicar_tarifa_por_defecto(obj: CPEAutomotor) -> bool:
+    """Una CPE sin tarifa toma la del producto. True si la cambió."""
+    product = obj.product
+    if obj.tariff in (None, Decimal("0")) and product and product.default_tariff:
         obj.tariff = product.default_tariff
-        obj.save(update_fields=["tariff"])
+        return True
+    return False
+
+
+def consultar_cpe_por_ctg(nro_ctg: str, peso_bruto_descarga: Decimal | None = None) -> CPEAutomotor:
+    token, sign = get_token_sign(service="wscpe")
+    data, indice = _consultar_wscpe(nro_ctg, token, sign)
+    campos, referencias = extraer_cpe(data, nro_ctg, peso_bruto_descarga, indice)
+    campos.update(resolver_referencias(referencias))
+    pdf = campos.pop("pdf")
+
+    obj, _ = CPEAutomotor.objects.update_or_create(nro_ctg=campos.pop("nro_ctg"), defaults=campos)
+    cambios = []
+    if _aplicar_tarifa_por_defecto(obj):
+        cambios.append("tariff")
+    if guardar_pdf(obj, pdf):
+        cambios.append("pdf")
+    if cambios:
+        obj.save(update_fields=cambios)
     return obj
+
+
+def _estado_error(exc: Exception) -> dict:
+    if isinstance(exc, CPEConsultationError):
+        if exc.code == "INVALID_CTG":
+            estado = "no_encontrado"
+        elif exc.is_transient:
+            estado = "error_transitorio"
+        else:
+            estado = "error"
+        return {"estado": estado, "codigo": exc.code, "detalle": exc.message}
+    return {"estado": "error", "codigo": None, "detalle": str(exc)}
+
+
+def guardar_cpes(extraidas) -> dict[str, CPEAutomotor]:
+    """
+    Guarda varias CPE ya extraídas ((campos, referencias) de extraer_cpe) con un
+    bulk_create para las nuevas y un bulk_update para las existentes, en una sola
+    transacción. Devuelve nro_ctg -> CPEAutomotor.
+    """
+    filas: dict[str, dict] = {}
+    pdfs: dict[str, bytes | None] = {}
+    memo: dict = {}
+    with transaction.atomic():
+        for campos, referencias in extraidas:
+            campos = {**campos, **resolver_referencias(referencias, memo)}
+            nro_ctg = campos.pop("nro_ctg")
+            pdfs[nro_ctg] = campos.pop("pdf", None)
+            filas[nro_ctg] = campos
+        if not filas:
+            return {}
+
+        existentes = CPEAutomotor.objects.only("id", "nro_ctg", "tariff", "pdf").in_bulk(
+            list(filas), field_name="nro_ctg"
+        )
+        nuevas, actualizadas = [], []
+        for nro_ctg, campos in filas.items():
+            obj = existentes.get(nro_ctg)
+            if obj is None:
+                obj = CPEAutomotor(nro_ctg=nro_ctg)
+                nuevas.append(obj)
+            else:
+                actualizadas.append(obj)
+            for campo, valor in campos.items():
+                setattr(obj, campo, valor)
+            _aplicar_tarifa_por_defecto(obj)
+            obj.calcular_derivados()
+            guardar_pdf(obj, pdfs[nro_ctg])
+
+        CPEAutomotor.objects.bulk_create(nuevas, batch_size=500)
+        if actualizadas:
+            columnas = {campo for campos in filas.values() for campo in campos}
+            columnas.update(("tariff", "pdf", *CPEAutomotor.CAMPOS_DERIVADOS))
+            CPEAutomotor.objects.bulk_update(actualizadas, sorted(columnas), batch_size=500)
+    return {obj.nro_ctg: obj for obj in (*nuevas, *actualizadas)}
+
+
+def consultar_cpes(nros_ctg, *, max_workers: int | None = None) -> dict[str, dict]:
+    """
+    Consulta varios CTG en paralelo (a lo sumo AFIP_CPE_CONCURRENCIA a la vez, con un
+    único ticket WSAA y el pool HTTP compartido de transport) y guarda los que responden
+    con guardar_cpes. Devuelve nro_ctg pedido -> {nro_ctg, estado ("ok", "no_encontrado",
+    "error_transitorio", "error"), codigo, detalle, cpe}.
+    """
+    nros_ctg = list(dict.fromkeys(str(nro).strip() for nro in nros_ctg if str(nro).strip()))
+    if not nros_ctg:
+        return {}
+    token, sign = get_token_sign(service="wscpe")
+
+    max_workers = max_workers or int(getattr(settings, "AFIP_CPE_CONCURRENCIA", 4))
+    respuestas: dict[str, tuple | Exception] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(nros_ctg)))) as executor:
+        futures = {executor.submit(_consultar_wscpe, nro, token, sign): nro for nro in nros_ctg}
+        for future in as_completed(futures):
+            nro = futures[future]
+            try:
+                respuestas[nro] = future.result()
+            except Exception as exc:
+                respuestas[nro] = exc
+
+    resultado: dict[str, dict] = {}
+    extraidas: dict[str, tuple[dict, dict]] = {}
+    for nro in nros_ctg:
+        respuesta = respuestas[nro]
+        if isinstance(respuesta, Exception):
+            resultado[nro] = {"nro_ctg": nro, **_estado_error(respuesta), "cpe": None}
+            continue
+        data, indice = respuesta
+        try:
+            extraidas[nro] = extraer_cpe(data, nro, indice=indice)
+        except Exception as exc:  # pragma: no cover - defensivo, respuesta malformada
+            resultado[nro] = {"nro_ctg": nro, **_estado_error(exc), "cpe": None}
+
+    guardadas = guardar_cpes(extraidas.values())
+    for nro, (campos, _) in extraidas.items():
+        resultado[nro] = {"nro_ctg": nro, "estado": "ok", "codigo": None, "detalle": None, "cpe": guardadas[campos["nro_ctg"]]}
+    return {nro: resultado[nro] for nro in nros_ctg}
@@ -0,0 +1,29 @@
+"""
+Procesos del pool de extracción de respuestas de wscpe (comando cargar_respuestas_cpe).
+
+Igual que pdf_worker: el hijo desempaqueta estas funciones antes de django.setup(),
+así que el módulo no importa modelos ni cpe_service a nivel módulo.
+"""
+
+
+def iniciar() -> None:
+    import django
+
+    django.setup()
+
+
+def extraer_archivo(nombre: str, contenido: bytes):
+    """
+    XML archivado -> (nombre, (campos, referencias), None) o (nombre, None, error).
+    Sólo parsea y extrae (la misma lógica que consultar_cpe_por_ctg); no toca la base.
+    """
+    from .cpe_service import extraer_cpe, parsear_respuesta
+
+    try:
+        data, indice = parsear_respuesta(contenido)
+        campos, referencias = extraer_cpe(data, "", indice=indice)
+    except Exception as exc:
+        return nombre, None, f"{type(exc).__name__}: {exc}"
+    if not campos["nro_ctg"]:
+        return nombre, None, "la respuesta no trae nroCTG"
+    return nombre, (campos, referencias), None
@@ -0,0 +1,219 @@
+"""
+Almacenamiento de tickets WSAA (TA) por (CUIT emisor, servicio).
+
+Cada servicio (wsfe, wscpe, ws_sr_padron_a13, ...) conserva su propio TA vigente.
+Backends:
+- "file": un TA por archivo en secrets/ (un solo nodo, lock con fcntl/msvcrt)
+- "db":   tabla AfipTicket (varios nodos comparten el mismo ticket, lock por fila)
+Se elige con settings.AFIP_CREDENTIAL_STORE ("file", "db" o ruta a una clase).
+"""
+from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager, contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+@dataclass(frozen=True)
+class Ticket:
+    token: str
+    sign: str
+    expiration: datetime  # siempre aware (UTC si el TA no trae offset)
+
+    def vigente(self, margen: timedelta = timedelta(0)) -> bool:
+        return self.expiration - margen > datetime.now(dt_timezone.utc)
+
+
+def _parse_expiration(value: str) -> datetime:
+    exp_dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if exp_dt.tzinfo is None:
+        exp_dt = exp_dt.replace(tzinfo=dt_timezone.utc)
+    return exp_dt
+
+
+def parse_ta(ta_xml: bytes) -> Ticket:
+    """Extrae token, sign y expirationTime de un loginTicketResponse."""
+    from lxml import etree
+
+    root = etree.fromstring(ta_xml)
+    exp = root.findtext(".//expirationTime")
+    token = root.findtext(".//token")
+    sign = root.findtext(".//sign")
+    if not (exp and token and sign):
+        raise ValueError("TA incompleto: faltan token, sign o expirationTime")
+    return Ticket(token=token.strip(), sign=sign.strip(), expiration=_parse_expiration(exp))
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Lock exclusivo entre procesos (fcntl en POSIX, msvcrt en Windows)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as fh:
+        try:
+            import fcntl
+        except ImportError:  # pragma: no cover - Windows
+            import msvcrt
+
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+class CredentialStore(ABC):
+    """Interfaz: cargar/guardar el TA de (cuit, service) y serializar su renovación."""
+
+    @abstractmethod
+    def load(self, cuit: str, service: str) -> Ticket | None:
+        """TA guardado de (cuit, service), o None si no hay."""
+
+    @abstractmethod
+    def save(self, cuit: str, service: str, ta_xml: bytes) -> Ticket:
+        """Guarda el loginTicketResponse recién emitido y devuelve su Ticket."""
+
+    @abstractmethod
+    def lock(self, cuit: str, service: str) -> AbstractContextManager:
+        """Context manager exclusivo entre procesos mientras se renueva el TA de (cuit, service)."""
+
+
+class FileCredentialStore(CredentialStore):
+    def __init__(self, base_dir: Path):
+        self.base_dir = Path(base_dir)
+
+    def ta_path(self, cuit: str, service: str) -> Path:
+        return self.base_dir / f"ta_{cuit}_{service}.xml"
+
+    def legacy_ta_path(self, cuit: str, service: str) -> Path | None:
+        """
+        Archivo de antes de guardar un TA por (CUIT, servicio), sólo del CUIT emisor:
+        ta_a13.xml era del padrón A13 y ta.xml lo compartían wsfe y wscpe (es del servicio
+        del último login_ticket_request.xml). Si no se lee, el primer deploy pediría
+        un TA nuevo y WSAA lo rechaza mientras el viejo siga vigente.
+        """
+        if str(cuit) != str(getattr(settings, "AFIP_CUIT_EMISOR", "")):
+            return None
+        if service == "ws_sr_padron_a13":
+            return self.base_dir / "ta_a13.xml"
+        if service in ("wsfe", "wscpe") and self._servicio_tra_legacy() == service:
+            return self.base_dir / "ta.xml"
+        return None
+
+    def _servicio_tra_legacy(self) -> str:
+        from lxml import etree
+
+        try:
+            servicio = etree.fromstring((self.base_dir / "login_ticket_request.xml").read_bytes()).findtext("service")
+        except Exception:
+            servicio = None
+        return servicio if servicio in ("wsfe", "wscpe") else "wsfe"
+
+    def load(self, cuit, service):
+        path = self.ta_path(cuit, service)
+        if not path.exists():
+            legacy = self.legacy_ta_path(cuit, service)
+            if legacy is None or not legacy.exists():
+                return None
+            try:
+                ticket = parse_ta(legacy.read_bytes())
+            except Exception:
+                return None
+            from .obtener_token import escribir_atomico
+
+            # Se migra al nombre nuevo: de acá en más se lee y renueva ése.
+            escribir_atomico(path, legacy.read_bytes())
+            return ticket
+        try:
+            return parse_ta(path.read_bytes())
+        except Exception:
+            return None
+
+    def save(self, cuit, service, ta_xml):
+        from .obtener_token import escribir_atomico
+
+        ticket = parse_ta(ta_xml)
+        escribir_atomico(self.ta_path(cuit, service), ta_xml)
+        return ticket
+
+    @contextmanager
+    def lock(self, cuit, service):
+        with file_lock(self.base_dir / f".wsaa_{cuit}_{service}.lock"):
+            yield
+
+
+class DatabaseCredentialStore(CredentialStore):
+    """
+    Comparte el TA entre todos los nodos que usan la misma base.
+    La renovación se serializa con SELECT ... FOR UPDATE sobre la fila del ticket;
+    en motores sin row locks (SQLite) se cae a un lock de archivo local.
+    """
+
+    def __init__(self, lock_dir: Path):
+        self.lock_dir = Path(lock_dir)
+
+    def load(self, cuit, service):
+        from .models import AfipTicket
+
+        row = AfipTicket.objects.filter(cuit=cuit, service=service).first()
+        if row is None or not (row.token and row.sign and row.expiration):
+            return None
+        return row.as_ticket()
+
+    def save(self, cuit, service, ta_xml):
+        from .models import AfipTicket
+
+        ticket = parse_ta(ta_xml)
+        AfipTicket.objects.update_or_create(
+            cuit=cuit,
+            service=service,
+            defaults={
+                "token": ticket.token,
+                "sign": ticket.sign,
+                "expiration": ticket.expiration,
+                "ta_xml": ta_xml.decode("utf-8"),
+            },
+        )
+        return ticket
+
+    @contextmanager
+    def lock(self, cuit, service):
+        from django.db import connection, transaction
+
+        from .models import AfipTicket
+
+        if not connection.features.has_select_for_update:
+            with file_lock(self.lock_dir / f".wsaa_{cuit}_{service}.lock"):
+                yield
+            return
+
+        AfipTicket.objects.get_or_create(cuit=cuit, service=service)
+        with transaction.atomic():
+            AfipTicket.objects.select_for_update().get(cuit=cuit, service=service)
+            yield
+
+
+STORES = {
+    "file": "afip.credential_store.FileCredentialStore",
+    "db": "afip.credential_store.DatabaseCredentialStore",
+}
+
+
+def get_credential_store(base_dir: Path) -> CredentialStore:
+    backend = getattr(settings, "AFIP_CREDENTIAL_STORE", "file")
+    return import_string(STORES.get(backend, backend))(base_dir)
@@ -1,17 +1,23 @@
 from io import BytesIO
+from datetime import date
+from functools import lru_cache
 from decimal import Decimal, ROUND_HALF_UP
 import base64
 import json
 import os
 from urllib.parse import quote_plus
 
-from django.template.loader import render_to_string
-from django.core.files.base import ContentFile
+from django.template.loader import get_template
 from django.conf import settings
+from django.db.models import Max
 from django.utils import timezone
 
 from billing.models import Invoice
 from . import solicitar_cae as fe
+from .caea import modo_caea, obtener_caea_vigente
+from .numerador import reservar_numero
+from .pdf_renderer import encolar_pdf
+
 
 def _build_arca_qr_payload(
     *,
@@ -80,10 +86,12 @@ def _build_arca_qr_url(payload: dict) -> tuple[str, str]:
     return url, p_b64
 
 
+@lru_cache(maxsize=512)
 def _make_qr_png_data_uri(qr_url: str) -> str | None:
     """
     Genera un PNG embebible en HTML: <img src="data:image/png;base64,....">
     Requiere: pip install qrcode[pil]
+    Cacheado por URL (= payload): re-renders y reintentos de la misma factura no lo rehacen.
     """
     try:
         import qrcode
@@ -97,69 +105,276 @@ def _make_qr_png_data_uri(qr_url: str) -> str | None:
     return f"data:image/png;base64,{b64}"
 
 
-def _render_pdf_to_bytes(template_name: str, context: dict) -> bytes:
+_CSS_PAGINA = "@page { size: A4; margin: 12mm 12mm 14mm 12mm; }"
+
+
+def _link_callback(uri: str, rel: str) -> str:
+    """Resuelve static/media a rutas locales para xhtml2pdf."""
+    # Permitir recursos remotos (si los usás)
+    if uri.startswith(("http://", "https://")):
+        return uri
+
+    static_url = getattr(settings, "STATIC_URL", "/static/")
+    media_url = getattr(settings, "MEDIA_URL", "/media/")
+    static_root = getattr(settings, "STATIC_ROOT", "")
+    media_root = getattr(settings, "MEDIA_ROOT", "")
+
+    if static_url and uri.startswith(static_url) and static_root:
+        path = os.path.join(static_root, uri.replace(static_url, "", 1))
+    elif media_url and uri.startswith(media_url) and media_root:
+        path = os.path.join(media_root, uri.replace(media_url, "", 1))
+    else:
+        # Intentar ruta absoluta
+        path = uri
+
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Recurso no encontrado para PDF: {uri} -> {path}")
+
+    return path
+
+
+class PdfRenderer:
     """
-    Render HTML -> PDF con mejor soporte de CSS:
-    - Preferido: WeasyPrint (recomendado para facturas: A4, tipografías, layout consistente)
-    - Fallback: xhtml2pdf (mejorado con link_callback para static/media)
+    Render HTML -> PDF reutilizable para un template.
+
+    Vive lo que vive el proceso (ver get_renderer): el template compilado, la hoja
+    @page ya parseada y la FontConfiguration de WeasyPrint se arman una sola vez y no
+    en cada factura. Motor preferido WeasyPrint; si no está instalado se recuerda y se
+    va directo a xhtml2pdf (con link_callback para static/media).
     """
-    html = render_to_string(template_name, context)
 
-    # 1) Preferir WeasyPrint si está disponible
-    weasy_err = None
-    try:
-        from weasyprint import HTML, CSS  # type: ignore
+    def __init__(self, template_name: str):
+        self.template_name = template_name
+        self._template = None
+        self._weasy = None  # (HTML, stylesheets, font_config) o False si no hay WeasyPrint
+        self._weasy_err = None
+
+    @property
+    def template(self):
+        if self._template is None:
+            self._template = get_template(self.template_name)
+        return self._template
+
+    def _weasyprint(self):
+        if self._weasy is None:
+            try:
+                from weasyprint import CSS, HTML  # type: ignore
+
+                try:
+                    from weasyprint.text.fonts import FontConfiguration  # type: ignore
+                except ImportError:  # WeasyPrint < 53
+                    from weasyprint.fonts import FontConfiguration  # type: ignore
+
+                font_config = FontConfiguration()
+                # Márgenes A4 razonables para impresión (ajustable desde el template también)
+                self._weasy = (HTML, [CSS(string=_CSS_PAGINA, font_config=font_config)], font_config)
+            except Exception as e:
+                self._weasy_err = e
+                self._weasy = False
+        return self._weasy
+
+    @property
+    def motor(self) -> str:
+        return "weasyprint" if self._weasyprint() else "xhtml2pdf"
+
+    def calentar(self) -> "PdfRenderer":
+        """Carga template, CSS y fuentes por adelantado (p. ej. al arrancar un worker)."""
+        self.template
+        self._weasyprint()
+        return self
+
+    def render(self, context: dict) -> bytes:
+        if context.get("arca_qr_url") and "arca_qr_img" not in context:
+            # El QR se arma acá y no al armar el contexto: en el pool corre en el proceso hijo.
+            context = {**context, "arca_qr_img": _make_qr_png_data_uri(context["arca_qr_url"])}
+        html = self.template.render(context)
+
+        weasy = self._weasyprint()
+        if weasy:
+            HTML, stylesheets, font_config = weasy
+            base_url = (
+                getattr(settings, "WEASYPRINT_BASEURL", None)
+                or getattr(settings, "STATIC_ROOT", None)
+                or str(getattr(settings, "BASE_DIR", ""))
+            )
+            return HTML(string=html, base_url=base_url).write_pdf(
+                stylesheets=stylesheets, font_config=font_config
+            )
+
+        from xhtml2pdf import pisa  # type: ignore
+
+        out = BytesIO()
+        status = pisa.CreatePDF(src=html, dest=out, encoding="utf-8", link_callback=_link_callback)
+        if status.err:
+            extra = f" (WeasyPrint no disponible: {self._weasy_err})" if self._weasy_err else ""
+            raise ValueError(f"Error generando PDF con xhtml2pdf{extra}")
+        return out.getvalue()
+
+
+def _fmt_fecha_yyyymmdd(value) -> str:
+    value = str(value or "")
+    return f"{value[6:8]}/{value[4:6]}/{value[:4]}" if len(value) == 8 and value.isdigit() else value
+
+
+def _dibujar_factura_estandar(canvas, context: dict) -> None:
+    """Mismo layout que billing/invoice_template.html (título, cliente, CAE, importe) más el QR de ARCA."""
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+
+    inv, client = context["inv"], context["client"]
+    ancho, alto = A4
+    izq, der = 12 * mm, ancho - 12 * mm
+    y = alto - 12 * mm
+
+    canvas.setTitle(f"Factura {inv.cbte_tipo}-{inv.pto_vta}-{inv.cbte_nro}")
+    canvas.setFont("Helvetica-Bold", 18)
+    y -= 18
+    canvas.drawString(izq, y, f"Factura {inv.cbte_tipo} - {inv.pto_vta} - {inv.cbte_nro}")
+    if context.get("issue_date"):
+        canvas.setFont("Helvetica", 10)
+        canvas.drawRightString(der, y, f"Fecha: {context['issue_date'].strftime('%d/%m/%Y')}")
+
+    def caja(x, y_top, w, lineas):
+        h = 8 + 15 * len(lineas)
+        canvas.setStrokeColor(HexColor("#dddddd"))
+        canvas.roundRect(x, y_top - h, w, h, 4, stroke=1, fill=0)
+        for i, (etiqueta, valor) in enumerate(lineas):
+            base = y_top - 16 - 15 * i
+            canvas.setFont("Helvetica-Bold", 12)
+            canvas.drawString(x + 8, base, etiqueta)
+            canvas.setFont("Helvetica", 12)
+            canvas.drawString(x + 8 + canvas.stringWidth(etiqueta, "Helvetica-Bold", 12) + 4, base, str(valor or ""))
+        return y_top - h
+
+    y -= 14
+    medio = (der - izq - 12) / 2
+    fin_cliente = caja(izq, y, medio, [("Cliente:", client.name), ("Email:", client.email)])
+    fin_cae = caja(izq + medio + 12, y, medio, [("CAE:", inv.cae), ("Vto CAE:", _fmt_fecha_yyyymmdd(inv.cae_due))])
+    y = min(fin_cliente, fin_cae) - 8
+    y = caja(izq, y, der - izq, [("Importe:", f"$ {inv.amount}")])
+
+    qr_url = context.get("arca_qr_url")
+    if qr_url:
+        lado = 30 * mm
+        _dibujar_qr(canvas, qr_url, izq, y - 8 - lado, lado)
+        canvas.setFont("Helvetica-Bold", 10)
+        canvas.drawString(izq + lado + 8, y - 8 - lado / 2, "Comprobante autorizado por ARCA")
+
+
+@lru_cache(maxsize=512)
+def _qr_modulos(data: str) -> tuple[tuple[bool, ...], ...]:
+    """Matriz del QR (nivel M) armada por QrCodeWidget; _dibujar_qr la pasa a un solo path."""
+    from reportlab.graphics.barcode.qr import QrCodeWidget
+
+    qr = QrCodeWidget(data, barLevel="M").qr
+    qr.make()
+    return tuple(tuple(bool(m) for m in fila) for fila in qr.modules)
+
+
+def _dibujar_qr(canvas, data: str, x: float, y: float, lado: float) -> None:
+    """
+    QR como un único path: un rect por tramo oscuro de cada fila, en coordenadas de
+    módulo enteras escaladas con una sola transformación. Los operadores se escriben
+    directo (addLiteral): armarlos rect por rect con PDFPathObject costaba más que el resto del PDF.
+    """
+    modulos = _qr_modulos(data)
+    n = len(modulos)
+    total = n + 8  # margen de 4 módulos de cada lado
+    rects = []
+    for fila, valores in enumerate(modulos):
+        base = total - 5 - fila
+        col = 0
+        while col < n:
+            if not valores[col]:
+                col += 1
+                continue
+            inicio = col
+            while col < n and valores[col]:
+                col += 1
+            rects.append(f"{inicio + 4} {base} {col - inicio} 1 re")
+    canvas.saveState()
+    canvas.translate(x, y)
+    canvas.scale(lado / total, lado / total)
+    canvas.setFillColorRGB(0, 0, 0)
+    canvas.addLiteral("\n".join(rects) + "\nf")
+    canvas.restoreState()
+
+
+class DirectPdfRenderer:
+    """
+    Motor sin HTML/CSS: dibuja el layout fijo con reportlab. Milisegundos por
+    factura contra cientos del motor HTML;
+    sólo sirve para los templates que tienen un layout en _LAYOUTS_DIRECTOS.
+    """
 
-        base_url = (
-            getattr(settings, "WEASYPRINT_BASEURL", None)
-            or getattr(settings, "STATIC_ROOT", None)
-            or str(getattr(settings, "BASE_DIR", ""))
-        )
+    motor = "directo"
+
+    def __init__(self, template_name: str):
+        self.template_name = template_name
+        self._dibujar = _LAYOUTS_DIRECTOS[template_name]
+
+    def calentar(self) -> "DirectPdfRenderer":
+        """Carga reportlab y el encoder del QR por adelantado (p. ej. al arrancar un worker)."""
+        from reportlab.pdfgen import canvas
+
+        canvas.Canvas(BytesIO()).save()
+        _qr_modulos("https://www.arca.gob.ar/fe/qr/")
+        return self
 
-        # Márgenes A4 razonables para impresión (ajustable desde el template también)
-        default_css = CSS(string="""
-            @page { size: A4; margin: 12mm 12mm 14mm 12mm; }
-        """)
+    def render(self, context: dict) -> bytes:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
 
-        return HTML(string=html, base_url=base_url).write_pdf(stylesheets=[default_css])
-    except Exception as e:
-        weasy_err = e
+        out = BytesIO()
+        pdf = canvas.Canvas(out, pagesize=A4)
+        self._dibujar(pdf, context)
+        pdf.showPage()
+        pdf.save()
+        return out.getvalue()
 
-    # 2) Fallback xhtml2pdf
-    from xhtml2pdf import pisa  # type: ignore
 
-    def link_callback(uri: str, rel: str) -> str:
-        # Permitir recursos remotos (si los usás)
-        if uri.startswith(("http://", "https://")):
-            return uri
+# Layouts que el motor "directo" sabe dibujar, por template.
+_LAYOUTS_DIRECTOS = {
+    "billing/invoice_template.html": _dibujar_factura_estandar,
+}
+
+
+def motor_pdf(template_name: str) -> str:
+    """
+    "directo" o "html" según settings.FACTURACION_PDF_MOTORES ({template: motor});
+    un template sin layout directo usa siempre el motor HTML.
+    """
+    motor = getattr(settings, "FACTURACION_PDF_MOTORES", {}).get(template_name, "html")
+    if motor == "directo" and template_name in _LAYOUTS_DIRECTOS:
+        return "directo"
+    return "html"
 
-        static_url = getattr(settings, "STATIC_URL", "/static/")
-        media_url = getattr(settings, "MEDIA_URL", "/media/")
-        static_root = getattr(settings, "STATIC_ROOT", "")
-        media_root = getattr(settings, "MEDIA_ROOT", "")
 
-        if static_url and uri.startswith(static_url) and static_root:
-            path = os.path.join(static_root, uri.replace(static_url, "", 1))
-        elif media_url and uri.startswith(media_url) and media_root:
-            path = os.path.join(media_root, uri.replace(media_url, "", 1))
-        else:
-            # Intentar ruta absoluta
-            path = uri
+def crear_renderer(template_name: str, motor: str):
+    return DirectPdfRenderer(template_name) if motor == "directo" else PdfRenderer(template_name)
 
-        if not os.path.isfile(path):
-            raise FileNotFoundError(f"Recurso no encontrado para PDF: {uri} -> {path}")
 
-        return path
+@lru_cache(maxsize=None)
+def _renderer(template_name: str, motor: str):
+    return crear_renderer(template_name, motor)
 
-    out = BytesIO()
-    status = pisa.CreatePDF(src=html, dest=out, encoding="utf-8", link_callback=link_callback)
-    if status.err:
-        extra = f" (WeasyPrint no disponible: {weasy_err})" if weasy_err else ""
-        raise ValueError(f"Error generando PDF con xhtml2pdf{extra}")
-    return out.getvalue()
 
+def get_renderer(template_name: str):
+    """Renderer del template para el motor configurado, uno por proceso."""
+    return _renderer(template_name, motor_pdf(template_name))
 
-def emitir_y_guardar_factura(
+
+def _render_pdf_to_bytes(template_name: str, context: dict) -> bytes:
+    """
+    Render del template a PDF con el motor configurado (motor_pdf):
+    - "directo": layout fijo dibujado con reportlab, sin HTML/CSS
+    - "html": WeasyPrint preferido (A4, tipografías, layout consistente); fallback xhtml2pdf
+    """
+    return get_renderer(template_name).render(context)
+
+
+def _guardar_factura(
     *,
     client,
     amount,
@@ -167,39 +382,23 @@ def emitir_y_guardar_factura(
     cbte_tipo: int,
     doc_tipo: int,
     doc_nro: str,
-    condicion_iva_receptor_id: int | None = 5,
-    iva_rate=None,
+    cuit: str,
+    result: dict,
+    condicion_iva_receptor_id: int | None,
+    iva_rate_value,
     cbtes_asoc=None,
     periodo_asoc=None,
-):
-    iva_rate_value = iva_rate if iva_rate is not None else client.iva_rate
-    cae_kwargs = {
-        "cuit": "30716004720",
-        "pto_vta": pto_vta,
-        "importe": amount,
-        "cbte_tipo": cbte_tipo,
-        "concepto": 2,
-        "doc_tipo": doc_tipo,
-        "doc_nro": doc_nro,
-        "condicion_iva_receptor_id": condicion_iva_receptor_id,
-        "iva_rate": iva_rate_value,
-    }
-
-    tipos_validos = fe.obtener_tipos_comprobante_validos(cuit=cae_kwargs["cuit"], pto_vta=pto_vta)
-    if cbte_tipo not in tipos_validos:
-        raise ValueError(
-            f"El tipo de comprobante {cbte_tipo} no está habilitado para el punto de venta {pto_vta}."
-        )
-    if cbtes_asoc:
-        cae_kwargs["cbtes_asoc"] = cbtes_asoc
-    if periodo_asoc:
-        cae_kwargs["periodo_asoc"] = periodo_asoc
-
-    result = fe.solicitar_cae(**cae_kwargs)
-    # No Mocked result to bypass external CAE request
+    modo_autorizacion: str = Invoice.MODO_CAE,
+) -> Invoice:
+    """Persiste el comprobante autorizado; el PDF se genera aparte (afip.pdf_renderer)."""
     metadata = {
         "condicion_iva_receptor_id": condicion_iva_receptor_id,
         "iva_rate": str(iva_rate_value),
+        # Lo que el QR necesita y el modelo no guarda: el renderer arma el PDF sólo con la factura.
+        "cuit_emisor": str(cuit),
+        "doc_tipo": doc_tipo,
+        "doc_nro": str(doc_nro),
+        "fecha_emision": timezone.localdate().isoformat(),
     }
     if cbtes_asoc:
         metadata["cbtes_asoc"] = cbtes_asoc
@@ -209,6 +408,8 @@ def emitir_y_guardar_factura(
         metadata["observations"] = result["observations"]
     if result.get("events"):
         metadata["events"] = result["events"]
+    if result.get("caea_detalle"):
+        metadata["caea_detalle"] = result["caea_detalle"]
 
     inv = Invoice.objects.create(
         client=client,
@@ -220,37 +421,285 @@ def emitir_y_guardar_factura(
         cae_due=result.get("cae_due"),
         xml_raw=result.get("xml"),
         metadata=metadata,
+        modo_autorizacion=modo_autorizacion,
+        pdf_status=Invoice.PDF_PENDIENTE,
     )
+    encolar_pdf(inv.pk)
+    return inv
+
+
+def contexto_pdf(inv: Invoice) -> dict:
+    """Contexto del template de factura (datos + QR de ARCA) armado desde la factura guardada."""
+    metadata = inv.metadata or {}
+    client = inv.client
+    fecha = metadata.get("fecha_emision")
+    issue_date = date.fromisoformat(fecha) if fecha else timezone.localdate(inv.created_at)
+    doc_nro = metadata.get("doc_nro") or client.tax_id
 
     # QR ARCA (payload + URL + imagen)
     qr_payload = _build_arca_qr_payload(
         fecha_emision=issue_date,
-        cuit_emisor=cae_kwargs["cuit"],
-        pto_vta=pto_vta,
-        cbte_tipo=cbte_tipo,
+        cuit_emisor=metadata.get("cuit_emisor") or settings.AFIP_CUIT_EMISOR,
+        pto_vta=inv.pto_vta,
+        cbte_tipo=inv.cbte_tipo,
         cbte_nro=int(inv.cbte_nro),
-        importe_total=amount_dec,
+        importe_total=Decimal(str(inv.amount)),
         moneda="PES",
         cotizacion=Decimal("1"),
-        doc_tipo_rec=doc_tipo,
+        doc_tipo_rec=metadata.get("doc_tipo", 80 if doc_nro else None),
         doc_nro_rec=doc_nro,
-        tipo_cod_aut="E",
+        tipo_cod_aut="A" if inv.modo_autorizacion == Invoice.MODO_CAEA else "E",
         cod_aut=str(inv.cae),
     )
     arca_qr_url, arca_qr_p_b64 = _build_arca_qr_url(qr_payload)
-    arca_qr_img = _make_qr_png_data_uri(arca_qr_url)  # puede ser None si falta dependencia
 
-    # Contexto para que el template cumpla con QR + datos ARCA (el layout se termina de ajustar en HTML/CSS)
-    pdf_context = {
+    # Contexto para que el template cumpla con QR + datos ARCA (el layout se termina de ajustar en HTML/CSS).
+    # arca_qr_img (<img src="{{ arca_qr_img }}">) lo agrega PdfRenderer; puede ser None si falta qrcode.
+    return {
         "inv": inv,
         "client": client,
         "arca_qr_payload": qr_payload,
         "arca_qr_p_b64": arca_qr_p_b64,
         "arca_qr_url": arca_qr_url,
-        "arca_qr_img": arca_qr_img,  # en el template: <img src="{{ arca_qr_img }}">
         "issue_date": issue_date,
     }
 
-    pdf_bytes = _render_pdf_to_bytes("billing/invoice_template.html", pdf_context)
-    inv.pdf.save(f"cbte_{inv.cbte_tipo}_{inv.pto_vta}_{inv.cbte_nro}.pdf", ContentFile(pdf_bytes), save=True)
-    return inv 
+
+class TipoNoHabilitado(ValueError):
+    """El punto de venta no tiene habilitado el tipo de comprobante (error del campo cbte_tipo)."""
+
+
+class EmisionIncierta(RuntimeError):
+    """
+    FECAESolicitar falló después de enviarse (timeout, red, respuesta sin CAE): AFIP pudo
+    haber autorizado `cbte_nro` igual. No se reintenta sin antes consultarlo
+    (recuperar_factura_autorizada).
+    """
+
+    def __init__(self, cbte_nro: int, causa: Exception):
+        super().__init__(str(causa))
+        self.cbte_nro = cbte_nro
+
+
+def validar_tipo_habilitado(cuit: str, pto_vta: int, cbte_tipo: int) -> None:
+    tipos_validos = fe.obtener_tipos_comprobante_validos(cuit=cuit, pto_vta=pto_vta)
+    if cbte_tipo not in tipos_validos:
+        raise TipoNoHabilitado(
+            f"El tipo de comprobante {cbte_tipo} no está habilitado para el punto de venta {pto_vta}."
+        )
+
+
+def _preparar_emision(
+    *,
+    client,
+    amount,
+    pto_vta: int,
+    cbte_tipo: int,
+    doc_tipo: int,
+    doc_nro: str,
+    condicion_iva_receptor_id: int | None = 5,
+    iva_rate=None,
+    cbtes_asoc=None,
+    periodo_asoc=None,
+) -> tuple[dict, dict]:
+    """Arma los kwargs de fe.solicitar_cae y de _guardar_factura para un comprobante."""
+    iva_rate_value = iva_rate if iva_rate is not None else client.iva_rate
+    cae_kwargs = {
+        "cuit": settings.AFIP_CUIT_EMISOR,
+        "pto_vta": pto_vta,
+        "importe": amount,
+        "cbte_tipo": cbte_tipo,
+        "concepto": 2,
+        "doc_tipo": doc_tipo,
+        "doc_nro": doc_nro,
+        "condicion_iva_receptor_id": condicion_iva_receptor_id,
+        "iva_rate": iva_rate_value,
+    }
+    if cbtes_asoc:
+        cae_kwargs["cbtes_asoc"] = cbtes_asoc
+    if periodo_asoc:
+        cae_kwargs["periodo_asoc"] = periodo_asoc
+
+    guardar_kwargs = dict(
+        client=client,
+        amount=amount,
+        pto_vta=pto_vta,
+        cbte_tipo=cbte_tipo,
+        doc_tipo=doc_tipo,
+        doc_nro=doc_nro,
+        cuit=cae_kwargs["cuit"],
+        condicion_iva_receptor_id=condicion_iva_receptor_id,
+        iva_rate_value=iva_rate_value,
+        cbtes_asoc=cbtes_asoc,
+        periodo_asoc=periodo_asoc,
+    )
+    return cae_kwargs, guardar_kwargs
+
+
+def emitir_y_guardar_factura(**datos) -> Invoice:
+    """
+    Emite con CAE (o CAEA, ver modo_caea) y guarda la factura. Recibe los kwargs de
+    _preparar_emision. Si FECAESolicitar falla sin un rechazo claro levanta EmisionIncierta.
+    """
+    cae_kwargs, guardar_kwargs = _preparar_emision(**datos)
+    validar_tipo_habilitado(cae_kwargs["cuit"], cae_kwargs["pto_vta"], cae_kwargs["cbte_tipo"])
+    if modo_caea():
+        return _emitir_con_caea(cae_kwargs, guardar_kwargs)
+
+    with reservar_numero(cae_kwargs["cuit"], cae_kwargs["pto_vta"], cae_kwargs["cbte_tipo"]) as reserva:
+        cae_kwargs["cbte_nro"] = reserva.proximo
+        try:
+            result = fe.solicitar_cae(**cae_kwargs)
+        except ValueError:
+            raise
+        except Exception as exc:
+            raise EmisionIncierta(reserva.proximo, exc) from exc
+        reserva.usar(result.get("cbte_nro"))
+    # No Mocked result to bypass external CAE request
+    return _guardar_factura(result=result, **guardar_kwargs)
+
+
+# Cuántos números hacia atrás revisa recuperar_factura_autorizada cuando no sabe cuál se usó.
+MAX_COMPROBANTES_A_VERIFICAR = 50
+
+
+def recuperar_factura_autorizada(*, cbte_nro: int | None = None, desde=None, **datos) -> Invoice | None:
+    """
+    Busca con FECompConsultar un comprobante que AFIP autorizó para estos datos (mismo
+    receptor e importe) y que no tiene factura local; si lo encuentra lo guarda con ese CAE.
+
+    Con `cbte_nro` se consulta sólo ese número. Sin él (el proceso murió sin registrar cuál
+    pidió) se revisan hacia atrás desde FECompUltimoAutorizado los números posteriores a las
+    facturas guardadas antes de `desde`, hasta MAX_COMPROBANTES_A_VERIFICAR.
+    """
+    cae_kwargs, guardar_kwargs = _preparar_emision(**datos)
+    cuit, pto_vta, cbte_tipo = cae_kwargs["cuit"], cae_kwargs["pto_vta"], cae_kwargs["cbte_tipo"]
+    facturas = Invoice.objects.filter(pto_vta=pto_vta, cbte_tipo=cbte_tipo)
+
+    if cbte_nro is not None:
+        candidatos = [cbte_nro]
+    else:
+        ultimo = fe.ultimo_autorizado(cuit, pto_vta, cbte_tipo)
+        previas = facturas.filter(created_at__lt=desde) if desde is not None else facturas.none()
+        primero = (previas.aggregate(nro=Max("cbte_nro"))["nro"] or 0) + 1
+        primero = max(primero, ultimo - MAX_COMPROBANTES_A_VERIFICAR + 1)
+        candidatos = range(ultimo, primero - 1, -1)
+
+    guardados = set(facturas.filter(cbte_nro__in=list(candidatos)).values_list("cbte_nro", flat=True))
+    doc_nro = fe._only_digits(cae_kwargs["doc_nro"])
+    importe = fe._format_decimal(cae_kwargs["importe"])
+    for nro in candidatos:
+        if nro in guardados:
+            continue
+        result = fe.consultar_comprobante(cuit, pto_vta, cbte_tipo, nro)
+        if result and fe._only_digits(result["doc_nro"]) == doc_nro and result["importe"] == importe:
+            return _guardar_factura(result=result, **guardar_kwargs)
+    return None
+
+
+def _emitir_con_caea(cae_kwargs: dict, guardar_kwargs: dict) -> Invoice:
+    """
+    Emite con el CAEA vigente sin esperar a AFIP: número del numerador local y factura
+    en la misma transacción. Guarda el detalle para informarlo después (informar_caea).
+    """
+    cuit, pto_vta, cbte_tipo = cae_kwargs["cuit"], cae_kwargs["pto_vta"], cae_kwargs["cbte_tipo"]
+    caea = obtener_caea_vigente(cuit)
+    detalle = {k: v for k, v in cae_kwargs.items() if k not in ("cuit", "pto_vta", "cbte_tipo")}
+    detalle["importe"] = str(detalle["importe"])
+    detalle["iva_rate"] = str(detalle["iva_rate"])
+    detalle["issue_date"] = timezone.localdate().strftime("%Y%m%d")
+    # Lo que AFIP rechazaría al informar se rechaza ahora, antes de usar un número.
+    fe._armar_detalle(cuit, cbte_tipo, 1, caea=caea.caea, **detalle)
+
+    with reservar_numero(cuit, pto_vta, cbte_tipo, local=True) as reserva:
+        nro = reserva.proximo
+        result = {
+            "cae": caea.caea,
+            "cae_due": caea.vigente_hasta.strftime("%Y%m%d"),
+            "cbte_nro": nro,
+            "caea_detalle": detalle,
+        }
+        inv = _guardar_factura(result=result, modo_autorizacion=Invoice.MODO_CAEA, **guardar_kwargs)
+        reserva.usar(nro)
+    return inv
+
+
+def emitir_lote_y_guardar(*, pto_vta: int, cbte_tipo: int, comprobantes: list[dict]) -> list[dict]:
+    """
+    Emite varios comprobantes del mismo tipo y punto de venta con FECAESolicitar en lote.
+
+    Cada item de `comprobantes` trae client, amount, doc_tipo, doc_nro y opcionalmente
+    condicion_iva_receptor_id, iva_rate, cbtes_asoc, periodo_asoc. Devuelve, en el mismo
+    orden, {"invoice": Invoice | None, "resultado": "A"/"R", "observations": [...]}.
+    """
+    validar_tipo_habilitado(settings.AFIP_CUIT_EMISOR, pto_vta, cbte_tipo)
+
+    if modo_caea():
+        # Con CAEA no hay round-trip que agrupar: cada comprobante se emite local.
+        salida = []
+        for item in comprobantes:
+            inv = emitir_y_guardar_factura(pto_vta=pto_vta, cbte_tipo=cbte_tipo, **item)
+            salida.append({"invoice": inv, "resultado": "A", "observations": []})
+        return salida
+
+    pedidos = []
+    for item in comprobantes:
+        iva_rate_value = item.get("iva_rate")
+        if iva_rate_value is None:
+            iva_rate_value = item["client"].iva_rate
+        condicion = item.get("condicion_iva_receptor_id", 5)
+        pedido = {
+            "importe": item["amount"],
+            "concepto": 2,
+            "doc_tipo": item["doc_tipo"],
+            "doc_nro": item["doc_nro"],
+            "condicion_iva_receptor_id": condicion,
+            "iva_rate": iva_rate_value,
+        }
+        if item.get("cbtes_asoc"):
+            pedido["cbtes_asoc"] = item["cbtes_asoc"]
+        if item.get("periodo_asoc"):
+            pedido["periodo_asoc"] = item["periodo_asoc"]
+        pedidos.append((pedido, iva_rate_value, condicion))
+
+    with reservar_numero(settings.AFIP_CUIT_EMISOR, pto_vta, cbte_tipo) as reserva:
+        results = fe.solicitar_cae_lote(
+            settings.AFIP_CUIT_EMISOR,
+            pto_vta,
+            [pedido for pedido, _, _ in pedidos],
+            cbte_tipo=cbte_tipo,
+            cbte_nro_desde=reserva.proximo,
+        )
+        autorizados = [r["cbte_nro"] for r in results if r.get("cbte_nro")]
+        # Con rechazos no se sabe qué números quedaron usados: próxima emisión resincroniza.
+        reserva.usar(
+            max(autorizados) if autorizados else None,
+            resincronizar=len(autorizados) != len(results),
+        )
+
+    salida = []
+    for item, (pedido, iva_rate_value, condicion), result in zip(comprobantes, pedidos, results):
+        inv = None
+        if result.get("cae"):
+            inv = _guardar_factura(
+                client=item["client"],
+                amount=item["amount"],
+                pto_vta=pto_vta,
+                cbte_tipo=cbte_tipo,
+                doc_tipo=item["doc_tipo"],
+                doc_nro=item["doc_nro"],
+                cuit=settings.AFIP_CUIT_EMISOR,
+                result=result,
+                condicion_iva_receptor_id=condicion,
+                iva_rate_value=iva_rate_value,
+                cbtes_asoc=pedido.get("cbtes_asoc"),
+                periodo_asoc=pedido.get("periodo_asoc"),
+            )
+        salida.append(
+            {
+                "invoice": inv,
+                "resultado": result.get("resultado"),
+                "observations": result.get("observations") or [],
+            }
+        )
+    return salida
@@ -0,0 +1,132 @@
+import base64
+import time
+import xml.etree.ElementTree as ET
+
+from django.core.management.base import BaseCommand
+
+from afip import cpe_service as cpe
+
+CAMPOS = (
+    cpe.CLAVES_CUIT_CLIENTE,
+    cpe.CLAVES_CUIT_PROVEEDOR,
+    cpe.CLAVES_PRODUCTO,
+    cpe.CLAVES_COD_PRODUCTO,
+    cpe.CLAVES_PROCEDENCIA,
+    cpe.CLAVES_DESTINO,
+    cpe.CLAVES_PESO_BRUTO,
+    cpe.CLAVES_DOMINIO,
+    cpe.CLAVES_PESO_TARA,
+)
+
+
+def respuesta_cpe_de_muestra(transportes: int = 3, pdf_kb: int = 60) -> dict:
+    """<respuesta> de ConsultarCPEAutomotor con la forma y el tamaño de una real, ya pasada por _element_to_dict."""
+    tramos = "".join(
+        f"""
+        <transporte>
+          <cuitTransportista>2033333333{i}</cuitTransportista>
+          <dominio>AB{i:03d}CD</dominio><dominio>AC{i:03d}DE</dominio>
+          <fechaHoraPartida>2025-10-1{i}T08:00:00</fechaHoraPartida>
+          <kmRecorrer>{120 + i}</kmRecorrer>
+          <codigoTurno>T{i}</codigoTurno>
+          <cuitChofer>2044444444{i}</cuitChofer>
+          <tarifa>15000</tarifa>
+          <cuitPagadorFlete>3055555555{i}</cuitPagadorFlete>
+          <mercaderiaFumigada>false</mercaderiaFumigada>
+        </transporte>"""
+        for i in range(transportes)
+    )
+    pdf = base64.b64encode(b"%PDF" + b"x" * pdf_kb * 1024).decode()
+    xml = f"""
+    <respuesta>
+      <cabecera>
+        <tipoCartaPorte>74</tipoCartaPorte><sucursal>1</sucursal><nroOrden>123</nroOrden>
+        <nroCTG>10100000012</nroCTG><estado>AC</estado>
+        <fechaEmision>2025-10-15T10:00:00</fechaEmision>
+        <fechaInicioEstado>2025-10-15T10:00:00</fechaInicioEstado>
+        <fechaVencimiento>2025-10-20T10:00:00</fechaVencimiento>
+        <observaciones></observaciones>
+      </cabecera>
+      <origen>
+        <operador><codProvincia>1</codProvincia><codLocalidad>1234</codLocalidad><planta>111</planta></operador>
+        <productor><codProvincia>1</codProvincia><codLocalidad>1234</codLocalidad></productor>
+        <domicilioOrigen>Ruta 5 km 300</domicilioOrigen>
+      </origen>
+      <correspondeRetiroProductor>false</correspondeRetiroProductor>
+      <esSolicitanteCampo>true</esSolicitanteCampo>
+      <retiroProductor><certificadoCOE></certificadoCOE><cuitRemitenteComercialProductor></cuitRemitenteComercialProductor></retiroProductor>
+      <intervinientes>
+        <cuitIntermediario></cuitIntermediario>
+        <cuitRemitenteComercialVentaPrimaria>30111111111</cuitRemitenteComercialVentaPrimaria>
+        <cuitRemitenteComercialVentaSecundaria></cuitRemitenteComercialVentaSecundaria>
+        <cuitMercadoATermino></cuitMercadoATermino>
+        <cuitCorredorVentaPrimaria>30222222222</cuitCorredorVentaPrimaria>
+        <cuitCorredorVentaSecundaria></cuitCorredorVentaSecundaria>
+        <cuitRepresentanteEntregador>30333333333</cuitRepresentanteEntregador>
+        <cuitRepresentanteRecibidor></cuitRepresentanteRecibidor>
+      </intervinientes>
+      <datosCarga>
+        <codGrano>23</codGrano><cosecha>2425</cosecha>
+        <pesoBruto>30000</pesoBruto><pesoTara>12000</pesoTara>
+        <descripcionProducto>Soja</descripcionProducto>
+      </datosCarga>
+      <destino>
+        <cuit>30716004720</cuit><codProvincia>12</codProvincia><codLocalidad>5678</codLocalidad>
+        <planta>222</planta><esDestinoCampo>false</esDestinoCampo>
+        <descripcionDestino>Puerto San Martín</descripcionDestino>
+      </destino>
+      <destinatario><cuit>30716004720</cuit></destinatario>
+      <cuitSolicitante>20111111112</cuitSolicitante>
+      {tramos}
+      <pdf>{pdf}</pdf>
+    </respuesta>"""
+    return cpe._element_to_dict(ET.fromstring(xml))
+
+
+def extraer_con_find_first(data: dict) -> list:
+    """Lo que se hacía por respuesta: errores por contenedor + una pasada DFS por campo."""
+    error = []
+    for container in [data] + [v for v in data.values() if v and isinstance(v, (dict, list))]:
+        error.append(cpe._find_first(container, set(cpe.CLAVES_ERROR_CODIGO)))
+        error.append(cpe._find_first(container, set(cpe.CLAVES_ERROR_MENSAJE)))
+    return error + [cpe._find_first(data, set(keys)) for keys in CAMPOS]
+
+
+def extraer_con_indice(data: dict) -> list:
+    indice = cpe.IndiceRespuesta(data)
+    error = []
+    for container in [data] + [v for v in data.values() if v and isinstance(v, (dict, list))]:
+        error.append(indice.primero(cpe.CLAVES_ERROR_CODIGO, dentro=container))
+        error.append(indice.primero(cpe.CLAVES_ERROR_MENSAJE, dentro=container))
+    return error + [indice.primero(keys) for keys in CAMPOS]
+
+
+def _medir(funcion, data, repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(data)
+    return (time.perf_counter() - inicio) * 1_000_000 / repeticiones
+
+
+class Command(BaseCommand):
+    help = "Compara la extracción de campos de CPE con _find_first repetido contra IndiceRespuesta"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=2000)
+        parser.add_argument("--transportes", type=int, default=3, help="Tramos de transporte en la respuesta")
+
+    def handle(self, *args, **options):
+        data = respuesta_cpe_de_muestra(options["transportes"])
+        if extraer_con_find_first(data) != extraer_con_indice(data):
+            self.stderr.write(self.style.ERROR("El índice no devuelve lo mismo que _find_first"))
+            return
+
+        repeticiones = max(options["repeticiones"], 1)
+        antes = _medir(extraer_con_find_first, data, repeticiones)
+        ahora = _medir(extraer_con_indice, data, repeticiones)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"_find_first: {antes:.1f} µs/respuesta | IndiceRespuesta: {ahora:.1f} µs/respuesta"
+                f" | {antes / ahora:.1f}x"
+            )
+        )
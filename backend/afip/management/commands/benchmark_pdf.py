@@ -0,0 +1,84 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from afip.fe_service import contexto_pdf, crear_renderer, motor_pdf
+from afip.pdf_renderer import TEMPLATE_FACTURA, _render, crear_pool
+from billing.models import Client, Invoice
+
+
+def _facturas_de_prueba(cantidad: int) -> list[Invoice]:
+    """Facturas sin guardar con números distintos (el QR cambia en cada una, como en producción)."""
+    client = Client(pk=1, name="Cliente Benchmark", email="benchmark@example.com", tax_id="20123456789")
+    fecha = timezone.localdate().isoformat()
+    return [
+        Invoice(
+            pk=nro,
+            client=client,
+            amount=Decimal("12100.00"),
+            pto_vta=1,
+            cbte_tipo=11,
+            cbte_nro=nro,
+            cae="71234567890123",
+            cae_due="20991231",
+            metadata={"cuit_emisor": "30716004720", "doc_tipo": 80, "doc_nro": "20123456789", "fecha_emision": fecha},
+        )
+        for nro in range(1, cantidad + 1)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Mide cuántos PDF de factura por segundo genera el renderer (en el proceso o con el pool)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cantidad", type=int, default=50, help="PDFs a generar (default 50)")
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=0,
+            help="Procesos del pool como en FACTURACION_PDF_PROCESOS (default 0: en este proceso)",
+        )
+        parser.add_argument("--template", default=TEMPLATE_FACTURA)
+        parser.add_argument(
+            "--motor",
+            choices=("html", "directo"),
+            default=None,
+            help="Motor a medir (default: el de FACTURACION_PDF_MOTORES). Con --procesos se usa el configurado.",
+        )
+
+    def handle(self, *args, **options):
+        cantidad = max(options["cantidad"], 1)
+        procesos = options["procesos"]
+        template_name = options["template"]
+        motor = options["motor"] or motor_pdf(template_name)
+        if procesos > 0 and motor != motor_pdf(template_name):
+            raise CommandError("Con --procesos se mide el motor configurado en FACTURACION_PDF_MOTORES.")
+        contextos = [contexto_pdf(inv) for inv in _facturas_de_prueba(cantidad + 1)]
+
+        # Primer render en frío: template, CSS y fuentes se cargan acá y no en los siguientes.
+        renderer = crear_renderer(template_name, motor)
+        inicio = time.perf_counter()
+        renderer.render(contextos.pop())
+        primero = time.perf_counter() - inicio
+
+        if procesos > 0:
+            with crear_pool(procesos) as pool:
+                # Arranque de los hijos (spawn + django.setup + calentar) fuera de la medición.
+                list(pool.map(_render, [template_name] * procesos, contextos[:procesos]))
+                inicio = time.perf_counter()
+                total_bytes = sum(len(pdf) for pdf in pool.map(_render, [template_name] * cantidad, contextos))
+                total = time.perf_counter() - inicio
+        else:
+            inicio = time.perf_counter()
+            total_bytes = sum(len(renderer.render(ctx)) for ctx in contextos)
+            total = time.perf_counter() - inicio
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{renderer.motor} ({template_name}, procesos={procesos}): {cantidad} PDFs en {total:.2f} s"
+                f" -> {cantidad / total:.1f} PDFs/s ({total * 1000 / cantidad:.1f} ms/PDF,"
+                f" {total_bytes // cantidad} bytes/PDF, primer render {primero * 1000:.0f} ms)"
+            )
+        )
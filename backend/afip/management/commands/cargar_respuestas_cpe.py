@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import tarfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from afip.cpe_service import guardar_cpes
+from afip.cpe_worker import extraer_archivo, iniciar
+
+
+def leer_archivos(origen: Path):
+    """(nombre, bytes) de cada .xml de un directorio (recursivo), un tar / tar.gz o un .xml suelto."""
+    if origen.is_dir():
+        for path in sorted(origen.rglob("*.xml")):
+            yield str(path), path.read_bytes()
+    elif tarfile.is_tarfile(origen):
+        # Modo stream ("r|*"): el tar se lee de corrido, sin cargar el índice ni buscar hacia atrás.
+        with tarfile.open(origen, "r|*") as tar:
+            for miembro in tar:
+                if miembro.isfile() and miembro.name.endswith(".xml"):
+                    yield f"{origen.name}:{miembro.name}", tar.extractfile(miembro).read()
+    elif origen.suffix == ".xml":
+        yield str(origen), origen.read_bytes()
+    else:
+        raise CommandError(f"{origen} no es un directorio, un tar ni un .xml")
+
+
+def _lotes(iterable, tamano: int):
+    lote = []
+    for item in iterable:
+        lote.append(item)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga respuestas de ConsultarCPEAutomotor archivadas (directorio o tar de .xml) sin consultar "
+        "a AFIP: extrae en un pool de procesos y guarda con bulk_create/bulk_update por lote."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("origen", help="Directorio, tar / tar.gz o .xml con las respuestas")
+        parser.add_argument(
+            "--procesos", type=int, default=None, help="Procesos de extracción (0 = en este proceso). Default: CPUs"
+        )
+        parser.add_argument("--lote", type=int, default=2000, help="Respuestas por transacción")
+
+    def handle(self, *args, **options):
+        origen = Path(options["origen"])
+        if not origen.exists():
+            raise CommandError(f"No existe {origen}")
+        procesos = options["procesos"] if options["procesos"] is not None else (os.cpu_count() or 1)
+        lote = max(options["lote"], 1)
+
+        self._stats = Counter()
+        self._inicio = time.perf_counter()
+        archivos = _lotes(leer_archivos(origen), lote)
+        if procesos <= 0:
+            for archivos_lote in archivos:
+                self._guardar([extraer_archivo(nombre, contenido) for nombre, contenido in archivos_lote])
+        else:
+            # spawn como el pool de PDF; cpe_worker.iniciar hace el django.setup() del hijo.
+            with ProcessPoolExecutor(
+                max_workers=procesos, mp_context=multiprocessing.get_context("spawn"), initializer=iniciar
+            ) as pool:
+                # Mientras se guarda un lote, el pool ya extrae el siguiente.
+                anterior = None
+                for archivos_lote in archivos:
+                    futuros = [pool.submit(extraer_archivo, nombre, contenido) for nombre, contenido in archivos_lote]
+                    if anterior is not None:
+                        self._guardar([f.result() for f in anterior])
+                    anterior = futuros
+                if anterior is not None:
+                    self._guardar([f.result() for f in anterior])
+
+        stats = self._stats
+        segundos = time.perf_counter() - self._inicio
+        style = self.style.SUCCESS if not stats["errores"] else self.style.WARNING
+        self.stdout.write(
+            style(
+                f"{stats['archivos']} respuestas en {segundos:.1f}s "
+                f"({stats['archivos'] / segundos if segundos else 0:.0f} respuestas/s): "
+                f"{stats['cpe']} CPE guardadas, {stats['errores']} con error"
+            )
+        )
+
+    def _guardar(self, resultados) -> None:
+        extraidas = []
+        for nombre, extraida, error in resultados:
+            if error:
+                self._stats["errores"] += 1
+                self.stderr.write(f"{nombre}: {error}")
+            else:
+                extraidas.append(extraida)
+        self._stats["archivos"] += len(resultados)
+        self._stats["cpe"] += len(guardar_cpes(extraidas))
+        segundos = time.perf_counter() - self._inicio
+        self.stdout.write(f"{self._stats['archivos']} respuestas | {self._stats['archivos'] / segundos:.0f}/s")
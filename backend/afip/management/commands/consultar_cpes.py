@@ -0,0 +1,124 @@
+import csv
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from afip.cpe_service import consultar_cpes
+
+# Estados que no se vuelven a consultar al retomar; los CTG con error sí.
+ESTADOS_FINALES = {"ok", "no_encontrado"}
+
+
+def leer_ctgs(origen, columna: str = "nro_ctg"):
+    """
+    CTGs de un CSV (o de una lista, uno por línea). Si la primera fila es un
+    encabezado se usa la columna `columna`; si no, la primera.
+    """
+    indice = 0
+    for nro_fila, fila in enumerate(csv.reader(origen)):
+        if not fila:
+            continue
+        if nro_fila == 0 and not fila[0].strip().isdigit():
+            encabezado = [c.strip().lower() for c in fila]
+            if columna.lower() not in encabezado:
+                raise CommandError(f"El CSV no tiene la columna {columna!r}: {', '.join(encabezado)}")
+            indice = encabezado.index(columna.lower())
+            continue
+        if indice < len(fila) and fila[indice].strip():
+            yield fila[indice].strip()
+
+
+def leer_checkpoint(path: Path) -> set[str]:
+    if not path.exists():
+        return set()
+    hechos = set()
+    with path.open(encoding="utf-8") as f:
+        for linea in f:
+            nro, _, estado = linea.rstrip("\n").partition("\t")
+            if estado in ESTADOS_FINALES:
+                hechos.add(nro)
+    return hechos
+
+
+class Command(BaseCommand):
+    help = (
+        "Consulta en wscpe y guarda las CPE de una lista de CTG (CSV o stdin) con N consultas en "
+        "paralelo. Anota cada CTG terminado en un checkpoint para retomar una corrida interrumpida."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", nargs="?", default="-", help="CSV con los CTG ('-' o vacío: stdin)")
+        parser.add_argument("--columna", default="nro_ctg", help="Columna del CSV con el CTG si tiene encabezado")
+        parser.add_argument(
+            "--workers", type=int, default=None, help="Consultas simultáneas. Default: AFIP_CPE_CONCURRENCIA"
+        )
+        parser.add_argument("--lote", type=int, default=200, help="CTG por lote guardado (y por checkpoint)")
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help="Archivo de progreso. Default: <archivo>.checkpoint (con stdin no hay checkpoint salvo que se indique)",
+        )
+        parser.add_argument("--reiniciar", action="store_true", help="Ignora el checkpoint y consulta todo")
+
+    def handle(self, *args, **options):
+        workers = options["workers"] or int(getattr(settings, "AFIP_CPE_CONCURRENCIA", 4))
+        lote = max(options["lote"], 1)
+
+        archivo = options["archivo"]
+        checkpoint = options["checkpoint"] or (f"{archivo}.checkpoint" if archivo != "-" else None)
+        checkpoint = Path(checkpoint) if checkpoint else None
+        if checkpoint and options["reiniciar"] and checkpoint.exists():
+            checkpoint.unlink()
+        hechos = leer_checkpoint(checkpoint) if checkpoint else set()
+
+        if archivo == "-":
+            ctgs = list(dict.fromkeys(leer_ctgs(sys.stdin, options["columna"])))
+        else:
+            with open(archivo, newline="", encoding="utf-8") as f:
+                ctgs = list(dict.fromkeys(leer_ctgs(f, options["columna"])))
+        pendientes = [nro for nro in ctgs if nro not in hechos]
+        if hechos:
+            self.stdout.write(f"Retomando: {len(ctgs) - len(pendientes)} de {len(ctgs)} CTG ya procesados")
+
+        estados = Counter()
+        inicio = time.perf_counter()
+        salida_checkpoint = checkpoint.open("a", encoding="utf-8") if checkpoint else None
+        try:
+            for desde in range(0, len(pendientes), lote):
+                resultados = consultar_cpes(pendientes[desde : desde + lote], max_workers=workers)
+                for nro, resultado in resultados.items():
+                    estados[resultado["estado"]] += 1
+                    if resultado["estado"] != "ok":
+                        self.stderr.write(f"{nro}: {resultado['estado']} {resultado['detalle'] or ''}".rstrip())
+                if salida_checkpoint:
+                    # Se anota después de guardar el lote: si se corta antes, el lote se repite entero.
+                    salida_checkpoint.writelines(f"{nro}\t{r['estado']}\n" for nro, r in resultados.items())
+                    salida_checkpoint.flush()
+                procesados = sum(estados.values())
+                segundos = time.perf_counter() - inicio
+                self.stdout.write(
+                    f"{procesados}/{len(pendientes)} CTG | {procesados / segundos:.1f} CTG/s | "
+                    + " ".join(f"{estado}={n}" for estado, n in sorted(estados.items()))
+                )
+        finally:
+            if salida_checkpoint:
+                salida_checkpoint.close()
+
+        total = sum(estados.values())
+        segundos = time.perf_counter() - inicio
+        errores = total - estados["ok"]
+        style = self.style.SUCCESS if not errores else self.style.WARNING
+        self.stdout.write(
+            style(
+                f"{total} CTG en {segundos:.1f}s ({total / segundos if segundos else 0:.1f} CTG/s): "
+                f"{estados['ok']} ok, {estados['no_encontrado']} no encontrados, "
+                f"{estados['error_transitorio']} con error transitorio, {estados['error']} con error "
+                f"({100 * errores / total if total else 0:.1f}% sin guardar)"
+            )
+        )
+        if errores - estados["no_encontrado"] and checkpoint:
+            self.stdout.write(f"Los CTG con error se reintentan corriendo de nuevo con el mismo checkpoint ({checkpoint}).")
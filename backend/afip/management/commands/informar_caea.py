@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from afip.caea import asegurar_caea, informar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Pide los CAEA por quincena e informa a AFIP (FECAEARegInformativo) los comprobantes emitidos con CAEA"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--intervalo",
+            type=int,
+            default=None,
+            help="Segundos entre pasadas. Default: AFIP_CAEA_INTERVALO_INFORME",
+        )
+        parser.add_argument(
+            "--reintentar-rechazados",
+            action="store_true",
+            help="Vuelve a informar también los comprobantes que AFIP rechazó",
+        )
+        parser.add_argument("--once", action="store_true", help="Hace una sola pasada y termina")
+
+    def handle(self, *args, **options):
+        cuit = settings.AFIP_CUIT_EMISOR
+        intervalo = options["intervalo"] or settings.AFIP_CAEA_INTERVALO_INFORME
+        fallos = 0
+
+        while True:
+            fallo = False
+            try:
+                for caea in asegurar_caea(cuit):
+                    self.stdout.write(f"{caea} vigente {caea.vigente_desde} a {caea.vigente_hasta}")
+            except Exception as exc:
+                fallo = True
+                self.stdout.write(self.style.ERROR(f"No se pudo obtener el CAEA: {exc}"))
+
+            stats = informar_pendientes(cuit, reintentar_rechazados=options["reintentar_rechazados"])
+            fallo = fallo or bool(stats["errores"])
+            style = self.style.ERROR if fallo else self.style.SUCCESS
+            self.stdout.write(style(
+                f"Informados: {stats['informados']} Rechazados: {stats['rechazados']} "
+                f"Pendientes por error: {stats['errores']}"
+            ))
+            if options["once"]:
+                return
+            # Con AFIP caído se reintenta antes: 30s, 60s, ... hasta el intervalo normal.
+            fallos = fallos + 1 if fallo else 0
+            time.sleep(min(30 * 2 ** (fallos - 1), intervalo) if fallos else intervalo)
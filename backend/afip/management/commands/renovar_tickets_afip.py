@@ -0,0 +1,47 @@
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from afip.wsaa import renovar_tickets
+
+
+class Command(BaseCommand):
+    help = "Renueva los tickets WSAA antes de que venzan para que los requests nunca esperen a WSAA"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--servicio",
+            action="append",
+            dest="servicios",
+            help="Servicio a mantener (repetible). Default: AFIP_WSAA_SERVICIOS",
+        )
+        parser.add_argument(
+            "--margen",
+            type=int,
+            default=None,
+            help="Segundos antes del vencimiento en los que se renueva. Default: AFIP_WSAA_MARGEN_RENOVACION",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=int,
+            default=None,
+            help="Segundos entre pasadas. Default: AFIP_WSAA_INTERVALO_RENOVADOR",
+        )
+        parser.add_argument("--once", action="store_true", help="Hace una sola pasada y termina")
+
+    def handle(self, *args, **options):
+        servicios = tuple(options["servicios"] or ()) or None
+        margen = timedelta(seconds=options["margen"]) if options["margen"] is not None else None
+        intervalo = options["intervalo"] or settings.AFIP_WSAA_INTERVALO_RENOVADOR
+
+        while True:
+            metrics = renovar_tickets(servicios, margen)
+            for key, data in metrics.items():
+                style = self.style.ERROR if data.get("last_error") else self.style.SUCCESS
+                self.stdout.write(style(f"{key} {json.dumps(data, default=str)}"))
+            if options["once"]:
+                return
+            time.sleep(intervalo)
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AfipTicket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cuit', models.CharField(max_length=11)),
+                ('service', models.CharField(max_length=50)),
+                ('token', models.TextField(blank=True, default='')),
+                ('sign', models.TextField(blank=True, default='')),
+                ('expiration', models.DateTimeField(blank=True, null=True)),
+                ('ta_xml', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='afipticket',
+            constraint=models.UniqueConstraint(fields=('cuit', 'service'), name='afip_ticket_cuit_service'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('afip', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParametroAfip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=100, unique=True)),
+                ('valor', models.JSONField(blank=True, default=list)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('afip', '0002_parametroafip'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumeradorComprobante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cuit', models.CharField(max_length=11)),
+                ('pto_vta', models.IntegerField()),
+                ('cbte_tipo', models.IntegerField()),
+                ('ultimo_nro', models.IntegerField(default=0)),
+                ('requiere_sincronizar', models.BooleanField(default=True)),
+                ('sincronizado', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='numeradorcomprobante',
+            constraint=models.UniqueConstraint(fields=('cuit', 'pto_vta', 'cbte_tipo'), name='afip_numerador_cuit_pto_tipo'),
+        ),
+    ]
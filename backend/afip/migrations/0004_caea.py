@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('afip', '0003_numeradorcomprobante_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Caea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cuit', models.CharField(max_length=11)),
+                ('periodo', models.CharField(max_length=6)),
+                ('orden', models.PositiveSmallIntegerField()),
+                ('caea', models.CharField(max_length=14)),
+                ('vigente_desde', models.DateField()),
+                ('vigente_hasta', models.DateField()),
+                ('tope_informar', models.DateField(blank=True, null=True)),
+                ('obtenido', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='caea',
+            constraint=models.UniqueConstraint(fields=('cuit', 'periodo', 'orden'), name='afip_caea_cuit_periodo_orden'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('afip', '0004_caea'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContribuyenteCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cuit', models.CharField(max_length=11, unique=True)),
+                ('datos', models.JSONField()),
+                ('consultado', models.DateTimeField()),
+            ],
+        ),
+    ]
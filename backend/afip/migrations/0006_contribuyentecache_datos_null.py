@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('afip', '0005_contribuyentecache'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contribuyentecache',
+            name='datos',
+            field=models.JSONField(null=True),
+        ),
+    ]
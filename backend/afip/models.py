@@ -0,0 +1,91 @@
+from django.db import models
+
+
+class AfipTicket(models.Model):
+    """TA de WSAA compartido entre nodos (backend "db" de afip.credential_store)."""
+
+    cuit = models.CharField(max_length=11)
+    service = models.CharField(max_length=50)
+    token = models.TextField(blank=True, default="")
+    sign = models.TextField(blank=True, default="")
+    expiration = models.DateTimeField(null=True, blank=True)
+    ta_xml = models.TextField(blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cuit", "service"], name="afip_ticket_cuit_service"),
+        ]
+
+    def __str__(self):
+        return f"{self.service} ({self.cuit})"
+
+    def as_ticket(self):
+        from .credential_store import Ticket
+
+        return Ticket(token=self.token, sign=self.sign, expiration=self.expiration)
+
+
+class ParametroAfip(models.Model):
+    """Copia persistida de parámetros de AFIP que cambian muy poco (p. ej. FEParamGetTiposCbte)."""
+
+    clave = models.CharField(max_length=100, unique=True)
+    valor = models.JSONField(default=list, blank=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.clave
+
+
+class NumeradorComprobante(models.Model):
+    """Último número autorizado por (CUIT, pto_vta, tipo): numeración local sin FECompUltimoAutorizado."""
+
+    cuit = models.CharField(max_length=11)
+    pto_vta = models.IntegerField()
+    cbte_tipo = models.IntegerField()
+    ultimo_nro = models.IntegerField(default=0)
+    requiere_sincronizar = models.BooleanField(default=True)
+    sincronizado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cuit", "pto_vta", "cbte_tipo"], name="afip_numerador_cuit_pto_tipo"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.cuit} {self.pto_vta}-{self.cbte_tipo}: {self.ultimo_nro}"
+
+
+class Caea(models.Model):
+    """CAEA otorgado por AFIP para una quincena (periodo YYYYMM, orden 1 o 2)."""
+
+    cuit = models.CharField(max_length=11)
+    periodo = models.CharField(max_length=6)
+    orden = models.PositiveSmallIntegerField()
+    caea = models.CharField(max_length=14)
+    vigente_desde = models.DateField()
+    vigente_hasta = models.DateField()
+    tope_informar = models.DateField(null=True, blank=True)
+    obtenido = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cuit", "periodo", "orden"], name="afip_caea_cuit_periodo_orden"),
+        ]
+
+    def __str__(self):
+        return f"CAEA {self.caea} ({self.periodo}/{self.orden})"
+
+
+class ContribuyenteCache(models.Model):
+    """Última respuesta de Padrón A13 (getPersona) por CUIT."""
+
+    cuit = models.CharField(max_length=11, unique=True)
+    # NULL: AFIP no devolvió la persona (se cachea por AFIP_PADRON_TTL_NEGATIVO).
+    datos = models.JSONField(null=True)
+    consultado = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.cuit} ({self.consultado:%Y-%m-%d})"
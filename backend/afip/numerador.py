@@ -0,0 +1,153 @@
+"""
+Numeración local de comprobantes por (CUIT, pto_vta, cbte_tipo).
+
+En lugar de un FECompUltimoAutorizado antes de cada FECAESolicitar, el próximo número
+sale de la tabla NumeradorComprobante, bloqueada mientras dura la autorización: con
+SELECT ... FOR UPDATE o, en motores sin row locks (SQLite), con un lock de archivo por
+par (igual que DatabaseCredentialStore.lock) y sin transacción abierta mientras se
+espera a AFIP. Dos emisiones sobre el mismo par se serializan (no repiten número) y
+emisiones sobre pares distintos corren en paralelo.
+
+Se resincroniza con AFIP (FECompUltimoAutorizado) la primera vez que el proceso usa el
+par, después de un error y cuando la última sincronización es más vieja que
+AFIP_NUMERADOR_RESYNC_SEGUNDOS. La consulta se hace antes de tomar el lock (puede
+tardar hasta 60s); con el lock tomado sólo se compara con la fila y se incrementa.
+
+Con local=True (modo CAEA) la tabla es la fuente de verdad: AFIP solo conoce lo ya
+informado, así que únicamente se sincroniza un par que nunca se usó.
+"""
+import threading
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .credential_store import file_lock
+from .models import NumeradorComprobante
+
+# Pares ya sincronizados por este proceso (resync "al arrancar").
+_SINCRONIZADOS: set[tuple[str, int, int]] = set()
+_LOCK = threading.Lock()
+
+
+@dataclass
+class Reserva:
+    proximo: int
+    ultimo: int | None = None
+    resincronizar: bool = False
+
+    def usar(self, ultimo_autorizado: int | None, *, resincronizar: bool = False) -> None:
+        """Registra el último número que AFIP efectivamente autorizó."""
+        self.ultimo = ultimo_autorizado
+        self.resincronizar = resincronizar
+
+
+def _debe_sincronizar(num: NumeradorComprobante, key, local: bool = False) -> bool:
+    if num.sincronizado is None:
+        return True
+    if local:
+        return False
+    if num.requiere_sincronizar:
+        return True
+    with _LOCK:
+        if key not in _SINCRONIZADOS:
+            return True
+    intervalo = int(getattr(settings, "AFIP_NUMERADOR_RESYNC_SEGUNDOS", 3600))
+    return (timezone.now() - num.sincronizado).total_seconds() >= intervalo
+
+
+def _ultimo_autorizado(cuit: str, pto_vta: int, cbte_tipo: int) -> int:
+    from . import solicitar_cae
+
+    return solicitar_cae.ultimo_autorizado(cuit, pto_vta, cbte_tipo)
+
+
+@contextmanager
+def _bloquear(cuit: str, pto_vta: int, cbte_tipo: int, *, local: bool = False):
+    """
+    Numerador del par bloqueado mientras dura el bloque. Con row locks, SELECT ... FOR
+    UPDATE en una transacción. En SQLite sólo el lock de archivo y la fila leída en
+    autocommit: una transacción abierta durante el FECAESolicitar (hasta 60s) dejaría
+    tomada la base entera. En modo local no hay AFIP adentro y la transacción sí se abre,
+    para que la factura y el número se confirmen juntos.
+    """
+    filtro = dict(cuit=cuit, pto_vta=pto_vta, cbte_tipo=cbte_tipo)
+    if connection.features.has_select_for_update:
+        with transaction.atomic():
+            yield NumeradorComprobante.objects.select_for_update().get(**filtro)
+        return
+
+    from .wsaa import SECRETS
+
+    with file_lock(SECRETS / f".numerador_{cuit}_{pto_vta}_{cbte_tipo}.lock"):
+        with transaction.atomic() if local else nullcontext():
+            yield NumeradorComprobante.objects.get(**filtro)
+
+
+def marcar_para_sincronizar(cuit: str, pto_vta: int, cbte_tipo: int) -> None:
+    NumeradorComprobante.objects.filter(
+        cuit=str(cuit), pto_vta=pto_vta, cbte_tipo=cbte_tipo
+    ).update(requiere_sincronizar=True)
+
+
+@contextmanager
+def reservar_numero(cuit: str, pto_vta: int, cbte_tipo: int, *, local: bool = False):
+    """
+    Bloquea el numerador del par y entrega una Reserva con el próximo número.
+    El llamador autoriza el comprobante y confirma con reserva.usar(nro); si sale por
+    excepción no se consume ningún número y el par queda marcado para resincronizar.
+    """
+    cuit = str(cuit)
+    pto_vta, cbte_tipo = int(pto_vta), int(cbte_tipo)
+    key = (cuit, pto_vta, cbte_tipo)
+
+    try:
+        while True:
+            leido, _ = NumeradorComprobante.objects.get_or_create(cuit=cuit, pto_vta=pto_vta, cbte_tipo=cbte_tipo)
+            # Fuera del lock: el resto de las emisiones del par no esperan a esta consulta.
+            ultimo_afip = _ultimo_autorizado(*key) if _debe_sincronizar(leido, key, local) else None
+
+            with _bloquear(cuit, pto_vta, cbte_tipo, local=local) as num:
+                if ultimo_afip is None and _debe_sincronizar(num, key, local):
+                    # Otro proceso la marcó para resincronizar mientras leíamos: consultar de nuevo.
+                    continue
+                if ultimo_afip is None:
+                    base = num.ultimo_nro
+                elif local or num.ultimo_nro != leido.ultimo_nro:
+                    # CAEA: lo local puede ir adelante de AFIP. Si no, otra emisión autorizó
+                    # mientras consultábamos: lo suyo es más nuevo que la respuesta de AFIP.
+                    base = max(ultimo_afip, num.ultimo_nro)
+                else:
+                    # Recién sincronizado manda AFIP, aunque sea menor que lo local.
+                    base = ultimo_afip
+                reserva = Reserva(proximo=base + 1)
+
+                yield reserva
+
+                cambios = {
+                    "ultimo_nro": base if reserva.ultimo is None else max(reserva.ultimo, base),
+                    "requiere_sincronizar": reserva.resincronizar,
+                }
+                if ultimo_afip is not None:
+                    cambios["sincronizado"] = timezone.now()
+                with transaction.atomic():
+                    NumeradorComprobante.objects.filter(cuit=cuit, pto_vta=pto_vta, cbte_tipo=cbte_tipo).update(**cambios)
+                if ultimo_afip is not None:
+                    with _LOCK:
+                        _SINCRONIZADOS.add(key)
+            return
+    except ValueError:
+        # Error de validación local: no llegó a AFIP, la numeración sigue siendo válida.
+        raise
+    except Exception:
+        if not local:
+            marcar_para_sincronizar(cuit, pto_vta, cbte_tipo)
+        raise
+
+
+def reiniciar_sincronizacion() -> None:
+    """Olvida qué pares sincronizó este proceso (tests / forzar resync)."""
+    with _LOCK:
+        _SINCRONIZADOS.clear()
@@ -1,11 +1,16 @@
 from pathlib import Path
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from lxml import etree
-import subprocess, requests, base64
+from functools import lru_cache
+import os, subprocess, tempfile, base64
+
+from . import transport
 
 BASE_DIR = Path(__file__).resolve().parent
 
+WSAA_URL = "https://wsaa.afip.gov.ar/ws/services/LoginCms"
+WSAA_URL_HOMO = "https://wsaahomo.afip.gov.ar/ws/services/LoginCms"
+
 @dataclass
 class AfipPaths:
     certificate: Path
@@ -32,7 +37,29 @@ class AfipPaths:
     def ta_a13(self) -> Path: return self.credentials_dir / "ta_a13.xml"
 
 
-def crear_TRA(paths: AfipPaths, service="wsfe"):
+def escribir_atomico(path: Path, data: bytes | str) -> None:
+    """Escribe en un temporal del mismo directorio y renombra: nadie lee un archivo a medias."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def generar_TRA(service="wsfe") -> bytes:
+    """Arma el loginTicketRequest en memoria (sin escribir archivos)."""
+    from lxml import etree
+
     tra = etree.Element("loginTicketRequest", version="1.0")
     header = etree.SubElement(tra, "header")
     etree.SubElement(header, "uniqueId").text = str(int(datetime.now().timestamp()))
@@ -40,83 +67,81 @@ def crear_TRA(paths: AfipPaths, service="wsfe"):
     etree.SubElement(header, "expirationTime").text = (datetime.now() + timedelta(minutes=10)).isoformat()
     etree.SubElement(tra, "service").text = service
 
-    xml_string = etree.tostring(tra, pretty_print=True, xml_declaration=True, encoding="UTF-8")
+    return etree.tostring(tra, pretty_print=True, xml_declaration=True, encoding="UTF-8")
+
+
+def crear_TRA(paths: AfipPaths, service="wsfe"):
+    xml_string = generar_TRA(service)
     paths.tra.write_bytes(xml_string)
     print("=== TRA generado ===")
     print(xml_string.decode("utf-8"))
+    return xml_string
 
 
-def firmar_TRA(paths: AfipPaths):
-    subprocess.run(
+@lru_cache(maxsize=4)
+def _cargar_firmante(certificate: str, private_key: str, _mtimes: tuple[int, int]):
+    """Carga certificado y clave una sola vez por proceso (se invalida si cambian en disco)."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import serialization
+
+    cert = x509.load_pem_x509_certificate(Path(certificate).read_bytes())
+    key = serialization.load_pem_private_key(Path(private_key).read_bytes(), password=None)
+    return cert, key
+
+
+def _firmar_openssl(paths: AfipPaths, tra_xml: bytes) -> bytes:
+    """Fallback: openssl smime por stdin/stdout, sin archivos intermedios."""
+    result = subprocess.run(
         [
             "openssl", "smime", "-sign",
             "-signer", str(paths.certificate),
             "-inkey", str(paths.private_key),
-            "-in", str(paths.tra),
-            "-out", str(paths.cms),
             "-outform", "DER",
             "-nodetach"
         ],
+        input=tra_xml,
+        capture_output=True,
         check=True
     )
-    print("✔️ TRA firmado correctamente.")
-
-
-def obtener_token_sign(paths: AfipPaths):
-    cms = paths.cms.read_bytes()
-    cms_b64 = base64.b64encode(cms).decode("utf-8")
-
-    envelope = f"""<?xml version="1.0" encoding="UTF-8"?>
-    <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
-      <soapenv:Header/>
-      <soapenv:Body>
-        <loginCms xmlns="http://wsaa.view.sua.dvadac.desein.afip.gov.ar">
-          <in0>{cms_b64}</in0>
-        </loginCms>
-      </soapenv:Body>
-    </soapenv:Envelope>"""
-
-    headers = {"Content-Type": "text/xml; charset=utf-8", "SOAPAction": "loginCms"}
-    WSAA_URL = "https://wsaa.afip.gov.ar/ws/services/LoginCms"
+    return result.stdout
 
-    response = requests.post(WSAA_URL, data=envelope.encode("utf-8"), headers=headers, timeout=60)
 
-    ns = {"wsaa": "http://wsaa.view.sua.dvadac.desein.afip.gov.ar"}
-    tree = etree.fromstring(response.content)
-    login_return = tree.find(".//wsaa:loginCmsReturn", namespaces=ns)
-
-    inner_tree = etree.fromstring(login_return.text.encode("utf-8"))
-    token = inner_tree.find(".//token").text
-    sign = inner_tree.find(".//sign").text
-
-    paths.token.write_text(token)
-    paths.sign.write_text(sign)
-    paths.ta.write_bytes(etree.tostring(inner_tree, pretty_print=True, encoding="utf-8"))
+def firmar_TRA_cms(paths: AfipPaths, tra_xml: bytes) -> bytes:
+    """
+    Firma el TRA y devuelve el CMS (DER) en memoria.
+    - Preferido: cryptography (PKCS#7 SignedData, sin fork ni archivos temporales)
+    - Fallback: openssl smime
+    """
+    try:
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.serialization import pkcs7
+    except ImportError:
+        return _firmar_openssl(paths, tra_xml)
+
+    cert, key = _cargar_firmante(
+        str(paths.certificate),
+        str(paths.private_key),
+        (paths.certificate.stat().st_mtime_ns, paths.private_key.stat().st_mtime_ns),
+    )
+    return (
+        pkcs7.PKCS7SignatureBuilder()
+        .set_data(tra_xml)
+        .add_signer(cert, key, hashes.SHA256())
+        .sign(serialization.Encoding.DER, [])
+    )
 
-    print("✔️ Token y Sign guardados.")
-    return token, sign
 
+def firmar_TRA(paths: AfipPaths):
+    """Versión basada en archivos: lee login_ticket_request.xml y deja login.cms.der."""
+    paths.cms.write_bytes(firmar_TRA_cms(paths, paths.tra.read_bytes()))
+    print("✔️ TRA firmado correctamente.")
 
-def crear_TRA_a13(paths: AfipPaths):
-    """Convenience para A13 — llama a crear_TRA con el servicio correcto."""
-    return crear_TRA(paths, service="ws_sr_padron_a13")
 
+def _login_cms(cms: bytes, url: str):
+    """Intercambia el CMS en WSAA (loginCms). Devuelve (response, TA parseado o None)."""
+    from lxml import etree
 
-def obtener_token_sign_a13(paths: AfipPaths, homologacion: bool = False, wsaa_url: str | None = None):
-    """
-    Obtiene token/sign para ws_sr_padron_a13.
-    - Genera TRA para 'ws_sr_padron_a13'
-    - Firma con openssl
-    - Intercambia en WSAA (producción u homologación)
-    Retorna (token, sign) y guarda en token_a13.txt / sign_a13.txt / ta_a13.xml
-    """
-    # 1) TRA específica A13
-    crear_TRA(paths, service="ws_sr_padron_a13")
-    # 2) Firmar
-    firmar_TRA(paths)
-
-    # 3) Intercambio en WSAA
-    cms_b64 = base64.b64encode(paths.cms.read_bytes()).decode("utf-8")
+    cms_b64 = base64.b64encode(cms).decode("utf-8")
 
     envelope = f"""<?xml version="1.0" encoding="UTF-8"?>
 <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
@@ -129,15 +154,35 @@ def obtener_token_sign_a13(paths: AfipPaths, homologacion: bool = False, wsaa_ur
 </soapenv:Envelope>"""
 
     headers = {"Content-Type": "text/xml; charset=utf-8", "SOAPAction": "loginCms"}
+    resp = transport.post(url, data=envelope.encode("utf-8"), headers=headers, timeout=60)
+    if not resp.ok:
+        return resp, None
 
-    # Selección de endpoint
-    if wsaa_url:
-        url = wsaa_url
-    else:
-        url = "https://wsaa.afip.gov.ar/ws/services/LoginCms" if not homologacion \
-              else "https://wsaahomo.afip.gov.ar/ws/services/LoginCms"
+    ns = {"wsaa": "http://wsaa.view.sua.dvadac.desein.afip.gov.ar"}
+    root = etree.fromstring(resp.content)
+    login_ret = root.find(".//wsaa:loginCmsReturn", namespaces=ns)
+    if login_ret is None or not login_ret.text:
+        return resp, None
+    return resp, etree.fromstring(login_ret.text.encode("utf-8"))
+
+
+def solicitar_TA(
+    paths: AfipPaths,
+    service: str = "wsfe",
+    homologacion: bool = False,
+    wsaa_url: str | None = None,
+) -> bytes:
+    """
+    Pide un TA nuevo a WSAA para `service` (TRA + firma en memoria + loginCms)
+    y lo devuelve serializado, sin escribir token/sign en disco.
+    """
+    import requests
+    from lxml import etree
 
-    resp = requests.post(url, data=envelope.encode("utf-8"), headers=headers, timeout=60)
+    cms = firmar_TRA_cms(paths, generar_TRA(service))
+
+    url = wsaa_url or (WSAA_URL_HOMO if homologacion else WSAA_URL)
+    resp, ta_xml = _login_cms(cms, url)
 
     if not resp.ok:
         print(f"[WSAA] HTTP {resp.status_code} en {url}")
@@ -148,26 +193,68 @@ def obtener_token_sign_a13(paths: AfipPaths, homologacion: bool = False, wsaa_ur
         (paths.credentials_dir / "wsaa_response_err.xml").write_bytes(resp.content)
         raise requests.HTTPError(f"WSAA error HTTP {resp.status_code}", response=resp)
 
-    # Parseo de TA
-    ns = {"wsaa": "http://wsaa.view.sua.dvadac.desein.afip.gov.ar"}
-    root = etree.fromstring(resp.content)
-    login_ret = root.find(".//wsaa:loginCmsReturn", namespaces=ns)
-    if login_ret is None or not login_ret.text:
+    if ta_xml is None:
         (paths.credentials_dir / "wsaa_response_err.xml").write_bytes(resp.content)
         raise RuntimeError("WSAA no devolvió loginCmsReturn")
 
-    ta_xml = etree.fromstring(login_ret.text.encode("utf-8"))
-    token = ta_xml.findtext(".//token") or ""
-    sign  = ta_xml.findtext(".//sign") or ""
+    if not (ta_xml.findtext(".//token") and ta_xml.findtext(".//sign")):
+        (paths.credentials_dir / f"ta_{service}_err.xml").write_bytes(etree.tostring(ta_xml, pretty_print=True, encoding="utf-8"))
+        raise RuntimeError(f"Token/Sign vacíos en TA de {service}")
+
+    return etree.tostring(ta_xml, pretty_print=True, encoding="utf-8")
+
+
+def obtener_token_sign(paths: AfipPaths, service: str | None = "wsfe"):
+    """
+    Obtiene token/sign para wsfe/wscpe firmando el TRA en memoria.
+    Con service=None usa el login.cms.der ya generado por crear_TRA + firmar_TRA.
+    """
+    from lxml import etree
+
+    if service is None:
+        response, inner_tree = _login_cms(paths.cms.read_bytes(), WSAA_URL)
+        if inner_tree is None:
+            response.raise_for_status()
+            raise RuntimeError("WSAA no devolvió loginCmsReturn")
+    else:
+        inner_tree = etree.fromstring(solicitar_TA(paths, service))
+
+    token = inner_tree.find(".//token").text
+    sign = inner_tree.find(".//sign").text
+
+    # El TA va último: es el archivo que miran los lectores para decidir si hay ticket.
+    escribir_atomico(paths.token, token)
+    escribir_atomico(paths.sign, sign)
+    escribir_atomico(paths.ta, etree.tostring(inner_tree, pretty_print=True, encoding="utf-8"))
+
+    print("✔️ Token y Sign guardados.")
+    return token, sign
+
+
+def crear_TRA_a13(paths: AfipPaths):
+    """Convenience para A13 — llama a crear_TRA con el servicio correcto."""
+    return crear_TRA(paths, service="ws_sr_padron_a13")
+
+
+def obtener_token_sign_a13(paths: AfipPaths, homologacion: bool = False, wsaa_url: str | None = None):
+    """
+    Obtiene token/sign para ws_sr_padron_a13.
+    - Genera TRA para 'ws_sr_padron_a13'
+    - Firma en memoria (cryptography; openssl como fallback)
+    - Intercambia en WSAA (producción u homologación)
+    Retorna (token, sign) y guarda en token_a13.txt / sign_a13.txt / ta_a13.xml
+    """
+    from lxml import etree
 
-    if not token or not sign:
-        (paths.credentials_dir / "ta_a13_err.xml").write_bytes(etree.tostring(ta_xml, pretty_print=True, encoding="utf-8"))
-        raise RuntimeError("Token/Sign vacíos en TA de A13")
+    ta_bytes = solicitar_TA(paths, "ws_sr_padron_a13", homologacion=homologacion, wsaa_url=wsaa_url)
+    ta_xml = etree.fromstring(ta_bytes)
+    token = ta_xml.findtext(".//token")
+    sign = ta_xml.findtext(".//sign")
 
     # --- Guardar en archivos ESPECÍFICOS de A13 ---
-    paths.token_a13.write_text(token)
-    paths.sign_a13.write_text(sign)
-    paths.ta_a13.write_bytes(etree.tostring(ta_xml, pretty_print=True, encoding="utf-8"))
+    escribir_atomico(paths.token_a13, token)
+    escribir_atomico(paths.sign_a13, sign)
+    escribir_atomico(paths.ta_a13, ta_bytes)
 
     print("✔️ Token y Sign (A13) guardados en archivos dedicados.")
     return token, sign
@@ -195,9 +282,7 @@ if __name__ == "__main__":
     )
 
     # === Token/Sign para WSFE (sin cambios) ===
-    crear_TRA(paths, service="wsfe")
-    firmar_TRA(paths)
-    token, sign = obtener_token_sign(paths)
+    token, sign = obtener_token_sign(paths, service="wsfe")
     print("=== Token (wsfe) ===")
     print(token[:80], "...")
     print("=== Sign  (wsfe) ===")
@@ -0,0 +1,181 @@
+"""
+Cache de Padrón A13 (getPersona) por CUIT en la tabla ContribuyenteCache.
+
+- fresco (menos de AFIP_PADRON_TTL segundos): se responde desde la base.
+- vencido pero dentro de AFIP_PADRON_STALE: se responde desde la base y se revalida en
+  segundo plano (stale-while-revalidate).
+- más viejo o inexistente: se consulta a AFIP en el momento; si AFIP falla y hay una
+  copia vieja, se devuelve esa marcada como desactualizada.
+- getPersona sin datos (CUIT inexistente o SOAP Fault) también se guarda, con datos NULL,
+  y se responde "no_encontrado" sin volver a AFIP durante AFIP_PADRON_TTL_NEGATIVO. Si ya
+  había una copia con datos no se pisa y se devuelve esa, marcada como desactualizada.
+
+Las consultas en lote van a AFIP en paralelo con a lo sumo AFIP_PADRON_CONCURRENCIA
+requests simultáneos y se guardan con un único upsert.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from . import solicitar_cae as fe
+from .models import ContribuyenteCache
+
+LOGGER = logging.getLogger(__name__)
+
+SERVICIO_PADRON = "ws_sr_padron_a13"
+
+_LOCK = threading.Lock()
+_REVALIDANDO: set[str] = set()
+
+
+def normalizar_cuit(value) -> str:
+    cuit = "".join(ch for ch in str(value or "") if ch.isdigit())
+    if len(cuit) != 11:
+        raise ValueError(f"CUIT inválido: {value}")
+    return cuit
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "AFIP_PADRON_TTL", 7 * 86400))
+
+
+def _stale() -> int:
+    return int(getattr(settings, "AFIP_PADRON_STALE", 30 * 86400))
+
+
+def _ttl_negativo() -> int:
+    return int(getattr(settings, "AFIP_PADRON_TTL_NEGATIVO", 900))
+
+
+def _edad(row: ContribuyenteCache) -> float:
+    return (timezone.now() - row.consultado).total_seconds()
+
+
+def _entrada(cuit: str, row: ContribuyenteCache | None, *, error: str | None = None) -> dict:
+    if row is None or row.datos is None:
+        return {
+            "cuit": cuit,
+            "estado": "error" if error and row is None else "no_encontrado",
+            "datos": None,
+            "consultado": row.consultado.isoformat() if row is not None else None,
+            "desactualizado": False,
+            "error": error,
+        }
+    return {
+        "cuit": cuit,
+        "estado": "ok",
+        "datos": row.datos,
+        "consultado": row.consultado.isoformat(),
+        "desactualizado": _edad(row) >= _ttl(),
+        "error": error,
+    }
+
+
+def _consultar_afip(cuits: list[str], max_workers: int | None = None) -> dict[str, dict | None | Exception]:
+    """getPersona de cada CUIT con concurrencia acotada: datos, None (no existe) o la excepción."""
+    from .wsaa import get_token_sign
+
+    try:
+        token, sign = get_token_sign(service=SERVICIO_PADRON)
+    except Exception as exc:
+        return {cuit: exc for cuit in cuits}
+
+    max_workers = max_workers or int(getattr(settings, "AFIP_PADRON_CONCURRENCIA", 4))
+    salida: dict[str, dict | None | Exception] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(cuits)))) as executor:
+        futures = {executor.submit(fe.consultar_cliente, cuit, token, sign): cuit for cuit in cuits}
+        for future in as_completed(futures):
+            cuit = futures[future]
+            try:
+                salida[cuit] = future.result()
+            except Exception as exc:
+                salida[cuit] = exc
+    return salida
+
+
+def _guardar(datos_por_cuit: dict[str, dict | None]) -> dict[str, ContribuyenteCache]:
+    if not datos_por_cuit:
+        return {}
+    ahora = timezone.now()
+    rows = [ContribuyenteCache(cuit=cuit, datos=datos, consultado=ahora) for cuit, datos in datos_por_cuit.items()]
+    ContribuyenteCache.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=["cuit"], update_fields=["datos", "consultado"]
+    )
+    return {row.cuit: row for row in rows}
+
+
+def _revalidar(cuits: list[str]) -> None:
+    try:
+        consultados = _consultar_afip(cuits)
+        _guardar({cuit: datos for cuit, datos in consultados.items() if isinstance(datos, dict)})
+    except Exception:  # pragma: no cover - defensivo, corre en un hilo
+        LOGGER.exception("Error revalidando el padrón de %s", cuits)
+    finally:
+        with _LOCK:
+            _REVALIDANDO.difference_update(cuits)
+        connection.close()
+
+
+def revalidar_en_segundo_plano(cuits: list[str]) -> None:
+    """Refresca en un hilo los CUIT que no se estén revalidando ya."""
+    with _LOCK:
+        nuevos = [cuit for cuit in cuits if cuit not in _REVALIDANDO]
+        _REVALIDANDO.update(nuevos)
+    if nuevos:
+        threading.Thread(target=_revalidar, args=(nuevos,), name="padron-revalidar", daemon=True).start()
+
+
+def consultar_contribuyentes(cuits, *, forzar: bool = False, max_workers: int | None = None) -> dict[str, dict]:
+    """
+    Resuelve varios CUIT con una lectura a la base y, para los que falten, getPersona en
+    paralelo. Devuelve cuit -> {cuit, estado ("ok", "no_encontrado", "error"), datos,
+    consultado, desactualizado, error}. Lanza ValueError si algún CUIT es inválido.
+    """
+    cuits = list(dict.fromkeys(normalizar_cuit(c) for c in cuits))
+    rows = ContribuyenteCache.objects.in_bulk(cuits, field_name="cuit")
+
+    resultado: dict[str, dict] = {}
+    a_consultar, a_revalidar = [], []
+    for cuit in cuits:
+        row = rows.get(cuit)
+        edad = _edad(row) if row is not None else None
+        negativo = row is not None and row.datos is None
+        if forzar or edad is None or edad >= (_ttl_negativo() if negativo else _stale()):
+            a_consultar.append(cuit)
+            continue
+        resultado[cuit] = _entrada(cuit, row)
+        if not negativo and edad >= _ttl():
+            a_revalidar.append(cuit)
+
+    if a_revalidar:
+        revalidar_en_segundo_plano(a_revalidar)
+
+    if a_consultar:
+        consultados = _consultar_afip(a_consultar, max_workers)
+        # Sin datos se cachea sólo si no hay una respuesta buena que pisar (un Fault puede ser pasajero).
+        guardados = _guardar(
+            {
+                cuit: datos
+                for cuit, datos in consultados.items()
+                if isinstance(datos, dict) or (datos is None and (rows.get(cuit) is None or rows[cuit].datos is None))
+            }
+        )
+        for cuit in a_consultar:
+            datos = consultados.get(cuit)
+            if isinstance(datos, Exception):
+                LOGGER.warning("Padrón A13 no respondió para %s: %s", cuit, datos)
+                resultado[cuit] = _entrada(cuit, rows.get(cuit), error=str(datos))
+            else:
+                # None sobre una fila con datos no se guardó: se devuelve la copia vieja.
+                resultado[cuit] = _entrada(cuit, guardados.get(cuit) or rows.get(cuit))
+
+    return {cuit: resultado[cuit] for cuit in cuits}
+
+
+def consultar_contribuyente(cuit, *, forzar: bool = False) -> dict:
+    cuit = normalizar_cuit(cuit)
+    return consultar_contribuyentes([cuit], forzar=forzar)[cuit]
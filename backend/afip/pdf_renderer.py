@@ -0,0 +1,185 @@
+"""
+Renderizado de los PDF de facturas fuera del request.
+
+HTML -> PDF (WeasyPrint / xhtml2pdf) es CPU puro y no suelta el GIL: hecho inline
+bloqueaba la respuesta de la emisión. Ahora la factura se guarda con el CAE y
+pdf_status="pendiente"; al commitear se manda a renderizar a un pool de procesos
+y el PDF se guarda cuando vuelve.
+
+- encolar_pdf(invoice_id): dispara el render al commitear la transacción actual.
+- renderizar(invoice_id): dispara el render (o devuelve el que ya está en curso) -> Future.
+- asegurar_pdf(inv): espera el PDF (o lo genera si nadie lo hizo); para mail y descarga.
+
+settings.FACTURACION_PDF_PROCESOS fija el tamaño del pool (0 = renderiza en el hilo
+que lo pide, sin pool) y settings.FACTURACION_PDF_TIMEOUT cuánto espera asegurar_pdf.
+"""
+import logging
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from billing.models import Invoice
+
+LOGGER = logging.getLogger(__name__)
+
+TEMPLATE_FACTURA = "billing/invoice_template.html"
+
+_LOCK = threading.Lock()
+_EXECUTOR = None
+# Renders en curso en este proceso: invoice_id -> Future[Invoice]
+_EN_CURSO: dict[int, Future] = {}
+
+
+def _procesos() -> int:
+    return int(getattr(settings, "FACTURACION_PDF_PROCESOS", 2))
+
+
+def _timeout() -> float:
+    return float(getattr(settings, "FACTURACION_PDF_TIMEOUT", 60))
+
+
+def _render(template_name: str, context: dict) -> bytes:
+    """Corre en el proceso hijo: sólo HTML -> bytes, sin tocar la base."""
+    from .fe_service import _render_pdf_to_bytes
+
+    return _render_pdf_to_bytes(template_name, context)
+
+
+def crear_pool(procesos: int):
+    """ProcessPoolExecutor con los renderers ya calientes en cada proceso."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    from .pdf_worker import iniciar
+
+    # spawn: el proceso web tiene hilos (renovador WSAA, pools HTTP) y fork los copiaría a medias.
+    return ProcessPoolExecutor(
+        max_workers=procesos,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=iniciar,
+        initargs=((TEMPLATE_FACTURA,),),
+    )
+
+
+def _get_executor():
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = crear_pool(_procesos())
+        return _EXECUTOR
+
+
+def cerrar_pool() -> None:
+    """Apaga el pool (tests / cambio de settings); el próximo render lo vuelve a crear."""
+    global _EXECUTOR
+    with _LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _descartar_pool() -> None:
+    # Un hijo murió (OOM, segfault de la librería de PDF): el próximo render arma un pool nuevo.
+    global _EXECUTOR
+    with _LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def nombre_pdf(inv: Invoice) -> str:
+    return f"cbte_{inv.cbte_tipo}_{inv.pto_vta}_{inv.cbte_nro}.pdf"
+
+
+def _terminar(invoice_id: int, resultado: Future, render: Future, *, hilo_propio: bool) -> None:
+    """Guarda el PDF renderizado (o marca el error) y resuelve el Future de quien espera."""
+    from django.core.files.base import ContentFile
+
+    try:
+        pdf_bytes = render.result()
+        inv = Invoice.objects.select_related("client").get(pk=invoice_id)
+        inv.pdf.save(nombre_pdf(inv), ContentFile(pdf_bytes), save=False)
+        inv.pdf_status = Invoice.PDF_LISTO
+        inv.save(update_fields=["pdf", "pdf_status"])
+    except Exception as exc:
+        LOGGER.exception("No se pudo generar el PDF de la factura %s", invoice_id)
+        if isinstance(exc, BrokenProcessPool):
+            _descartar_pool()
+        Invoice.objects.filter(pk=invoice_id).update(pdf_status=Invoice.PDF_ERROR)
+        resultado.set_exception(exc)
+    else:
+        resultado.set_result(inv)
+    finally:
+        with _LOCK:
+            _EN_CURSO.pop(invoice_id, None)
+        if hilo_propio:
+            # Callback en el hilo del executor: no dejar la conexión abierta.
+            connection.close()
+
+
+def renderizar(invoice_id: int) -> Future:
+    """
+    Renderiza el PDF de la factura y devuelve un Future que resuelve con la Invoice ya
+    guardada. Si este proceso ya lo está generando, devuelve ese mismo Future.
+    """
+    with _LOCK:
+        resultado = _EN_CURSO.get(invoice_id)
+        if resultado is not None:
+            return resultado
+        resultado = Future()
+        _EN_CURSO[invoice_id] = resultado
+
+    from .fe_service import contexto_pdf
+
+    try:
+        inv = Invoice.objects.select_related("client").get(pk=invoice_id)
+        Invoice.objects.filter(pk=invoice_id).update(pdf_status=Invoice.PDF_GENERANDO)
+        context = contexto_pdf(inv)
+    except Exception as exc:
+        with _LOCK:
+            _EN_CURSO.pop(invoice_id, None)
+        resultado.set_exception(exc)
+        return resultado
+
+    if _procesos() <= 0:
+        render = Future()
+        try:
+            render.set_result(_render(TEMPLATE_FACTURA, context))
+        except Exception as exc:
+            render.set_exception(exc)
+        _terminar(invoice_id, resultado, render, hilo_propio=False)
+        return resultado
+
+    hilo = threading.get_ident()
+    render = _get_executor().submit(_render, TEMPLATE_FACTURA, context)
+    # Si ya terminó, el callback corre en este mismo hilo: ahí la conexión no se cierra.
+    render.add_done_callback(
+        lambda f: _terminar(invoice_id, resultado, f, hilo_propio=threading.get_ident() != hilo)
+    )
+    return resultado
+
+
+def encolar_pdf(invoice_id: int) -> None:
+    """Dispara el render cuando commitee la transacción actual (inmediato si no hay una)."""
+
+    def _disparar():
+        try:
+            renderizar(invoice_id)
+        except Exception:
+            # asegurar_pdf lo vuelve a intentar cuando alguien pida el PDF.
+            LOGGER.exception("No se pudo encolar el PDF de la factura %s", invoice_id)
+
+    transaction.on_commit(_disparar)
+
+
+def asegurar_pdf(inv: Invoice, timeout: float | None = None) -> Invoice:
+    """
+    Devuelve la factura con el PDF listo: espera el render en curso o lo dispara si
+    quedó pendiente o con error (p. ej. el proceso se reinició antes de terminarlo).
+    """
+    if inv.pdf_status == Invoice.PDF_LISTO and inv.pdf:
+        return inv
+    return renderizar(inv.pk).result(timeout=timeout if timeout is not None else _timeout())
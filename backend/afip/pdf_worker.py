@@ -0,0 +1,18 @@
+"""
+Arranque de los procesos del pool de PDF (afip.pdf_renderer).
+
+El initializer se desempaqueta en el hijo antes de django.setup(), así que este
+módulo no puede importar modelos (ni fe_service) a nivel módulo.
+"""
+
+
+def iniciar(templates: tuple[str, ...] = ()) -> None:
+    """django.setup() y renderers calientes: la primera factura no paga template ni fuentes."""
+    import django
+
+    django.setup()
+
+    from .fe_service import get_renderer
+
+    for template_name in templates:
+        get_renderer(template_name).calentar()
@@ -1,70 +1,22 @@
 import logging
-import ssl
-import sys
+import re
+import threading
+import time
 import xml.etree.ElementTree as ET
 from datetime import date, datetime, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 from typing import Final, List, Optional, Union
-from zeep import Client
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.poolmanager import PoolManager
-from zeep.helpers import serialize_object
-from zeep.transports import Transport
-
 
+from . import transport
 
 LOGGER = logging.getLogger(__name__)
 
+WSDL_PADRON = "https://aws.afip.gov.ar/sr-padron/webservices/personaServiceA13?WSDL"
 
-# ======================
-# Adaptador SSL
-# ======================
-class SSLAdapter(HTTPAdapter):
-    def init_poolmanager(self, *args, **kwargs):
-        ctx = ssl.create_default_context()
-        ctx.set_ciphers("DEFAULT:@SECLEVEL=1")  # baja seguridad para AFIP
-        kwargs["ssl_context"] = ctx
-        return super().init_poolmanager(*args, **kwargs)
-
-
-import re
-import requests
-from zeep import Client, Settings
-from zeep.transports import Transport
-from zeep.helpers import serialize_object
-from zeep.exceptions import Fault
 
 def _only_digits(value) -> str:
     return re.sub(r"\D+", "", str(value or ""))
 
-def _deep_get(d, key):
-    """Busca 'key' en cualquier nivel de un dict/list anidado."""
-    if isinstance(d, dict):
-        if key in d:
-            return d[key]
-        for v in d.values():
-            r = _deep_get(v, key)
-            if r is not None:
-                return r
-    elif isinstance(d, list):
-        for v in d:
-            r = _deep_get(v, key)
-            if r is not None:
-                return r
-    return None
-
-import re
-import requests
-from zeep import Client, Settings
-from zeep.transports import Transport
-from zeep.helpers import serialize_object
-from zeep.exceptions import Fault
-
-WSDL_PADRON = "https://aws.afip.gov.ar/sr-padron/webservices/personaServiceA13?WSDL"
-
-def _only_digits(value) -> str:
-    return re.sub(r"\D+", "", str(value or ""))
 
 def _deep_get(d, key):
     """Busca 'key' en cualquier nivel de un dict/list anidado."""
@@ -82,6 +34,7 @@ def _deep_get(d, key):
                 return r
     return None
 
+
 def _extract_id_condicion_iva(data):
     """
     Intenta extraer persona->datosRegimenGeneral->idCondicionIva
@@ -106,13 +59,6 @@ def _extract_id_condicion_iva(data):
     return _deep_get(persona, "idCondicionIva")
 
 
-
-import requests
-import xml.etree.ElementTree as ET
-
-import requests
-import xml.etree.ElementTree as ET
-
 def consultar_cliente(cuit_cliente, token, sign):
     """
     Consulta Padrón A13 (getPersona) y devuelve TODOS los datos organizados en un dict.
@@ -121,7 +67,9 @@ def consultar_cliente(cuit_cliente, token, sign):
     - No inventa otros datos: solo organiza lo que AFIP publica
     - Si hay Fault, retorna None
     """
-    CUIT_REP = ""  # tu CUIT emisor
+    from django.conf import settings
+
+    CUIT_REP = settings.AFIP_CUIT_EMISOR
     PADRON_A13_URL = "https://aws.afip.gov.ar/sr-padron/webservices/personaServiceA13"
 
     ns = {
@@ -145,7 +93,7 @@ def consultar_cliente(cuit_cliente, token, sign):
 </soapenv:Envelope>"""
 
     headers = {"Content-Type": "text/xml; charset=utf-8", "SOAPAction": "getPersona"}
-    r = requests.post(PADRON_A13_URL, data=soap_body.encode("utf-8"), headers=headers, timeout=60)
+    r = transport.post(PADRON_A13_URL, data=soap_body.encode("utf-8"), headers=headers, timeout=60)
 
     root = ET.fromstring(r.content)
 
@@ -346,10 +294,10 @@ def consultar_ultimo_comprobante(session, token, sign, cuit, pto_vta, cbte_tipo)
     return int(ultimo.text) if ultimo is not None else 0
 
 
-def _read_wsaa_credentials() -> tuple[str, str]:
+def _read_wsaa_credentials(cuit) -> tuple[str, str]:
     from .wsaa import get_token_sign
 
-    return get_token_sign(service="wsfe")
+    return get_token_sign(service="wsfe", cuit=cuit)
 
 
 def consultar_tipos_comprobante(session, token, sign, cuit, pto_vta) -> List[int]:
@@ -401,11 +349,91 @@ def consultar_tipos_comprobante(session, token, sign, cuit, pto_vta) -> List[int
     return tipos
 
 
-def obtener_tipos_comprobante_validos(*, cuit: str, pto_vta: int) -> List[int]:
-    token, sign = _read_wsaa_credentials()
-    session = requests.Session()
-    session.mount("https://", SSLAdapter())
-    return consultar_tipos_comprobante(session, token, sign, cuit, pto_vta)
+# Cache de FEParamGetTiposCbte: (cuit, pto_vta) -> (cargado_en monotonic, tipos)
+_TIPOS_CBTE_CACHE: dict = {}
+_TIPOS_CBTE_LOCK = threading.Lock()
+
+
+def _tipos_cbte_ttl() -> int:
+    from django.conf import settings
+
+    return int(getattr(settings, "AFIP_TIPOS_CBTE_TTL", 86400))
+
+
+def _tipos_cbte_clave(cuit, pto_vta) -> str:
+    return f"tipos_cbte:{cuit}:{pto_vta}"
+
+
+def obtener_tipos_comprobante_validos(*, cuit: str, pto_vta: int, use_cache: bool = True) -> List[int]:
+    """
+    Tipos de comprobante habilitados (FEParamGetTiposCbte), cacheados por (CUIT, pto_vta).
+    1) memoria del proceso, 2) copia persistida en la base si sigue dentro del TTL,
+    3) AFIP. Si AFIP falla se usa la última copia persistida aunque esté vencida.
+    """
+    import requests
+    from django.utils import timezone
+
+    from .models import ParametroAfip
+
+    key = (str(cuit), int(pto_vta))
+    ttl = _tipos_cbte_ttl()
+    if use_cache:
+        with _TIPOS_CBTE_LOCK:
+            cached = _TIPOS_CBTE_CACHE.get(key)
+        if cached and time.monotonic() - cached[0] < ttl:
+            return list(cached[1])
+
+        persistido = ParametroAfip.objects.filter(clave=_tipos_cbte_clave(*key)).first()
+        if persistido and (timezone.now() - persistido.actualizado).total_seconds() < ttl:
+            with _TIPOS_CBTE_LOCK:
+                _TIPOS_CBTE_CACHE[key] = (time.monotonic(), list(persistido.valor))
+            return list(persistido.valor)
+
+    try:
+        token, sign = _read_wsaa_credentials(cuit)
+        session = transport.get_session()
+        tipos = consultar_tipos_comprobante(session, token, sign, cuit, pto_vta)
+    except (requests.RequestException, ET.ParseError) as exc:
+        persistido = ParametroAfip.objects.filter(clave=_tipos_cbte_clave(*key)).first()
+        if persistido is None:
+            raise
+        LOGGER.warning(
+            "FEParamGetTiposCbte falló (%s); se usan los tipos persistidos el %s",
+            exc,
+            persistido.actualizado,
+        )
+        return list(persistido.valor)
+
+    ParametroAfip.objects.update_or_create(clave=_tipos_cbte_clave(*key), defaults={"valor": tipos})
+    with _TIPOS_CBTE_LOCK:
+        _TIPOS_CBTE_CACHE[key] = (time.monotonic(), list(tipos))
+    return tipos
+
+
+def invalidar_tipos_comprobante(cuit: Optional[str] = None, pto_vta: Optional[int] = None) -> None:
+    """Descarta el cache (memoria y copia persistida) de uno o de todos los (CUIT, pto_vta)."""
+    from .models import ParametroAfip
+
+    with _TIPOS_CBTE_LOCK:
+        for key in list(_TIPOS_CBTE_CACHE):
+            if (cuit is None or key[0] == str(cuit)) and (pto_vta is None or key[1] == int(pto_vta)):
+                del _TIPOS_CBTE_CACHE[key]
+
+    qs = ParametroAfip.objects.filter(clave__startswith="tipos_cbte:")
+    if cuit is not None:
+        qs = qs.filter(clave__startswith=f"tipos_cbte:{cuit}:")
+    if pto_vta is not None:
+        qs = qs.filter(clave__endswith=f":{int(pto_vta)}")
+    qs.delete()
+
+
+def precargar_tipos_comprobante(cuit: str, pto_vtas) -> None:
+    """Pre-calienta el cache al arrancar para que la primera emisión no pague el round-trip."""
+    for pto_vta in pto_vtas:
+        try:
+            obtener_tipos_comprobante_validos(cuit=cuit, pto_vta=pto_vta)
+        except Exception as exc:  # pragma: no cover - depende de AFIP
+            LOGGER.warning("No se pudieron precargar los tipos de comprobante del pto_vta %s: %s", pto_vta, exc)
 
 
 # ======================
@@ -507,13 +535,12 @@ def _calculate_iva_breakdown(
     return imp_neto, imp_iva, iva_xml, [imp_iva]
 
 
-def solicitar_cae(
+def _armar_detalle(
     cuit: str,
-    pto_vta: int,
+    cbte_tipo: int,
+    cbte_nro: int,
     importe: Union[str, float, Decimal],
     *,
-    # cbte_tipo soporta: 11 = Factura C; 2/3 = Nota Débito/Crédito A; 7/8 = Nota Débito/Crédito B; 12/13 = Nota Débito/Crédito C
-    cbte_tipo: int = 11,
     concepto: int = 2,
     doc_tipo: int = 80,
     doc_nro: Optional[Union[str, int]] = None,
@@ -523,31 +550,16 @@ def solicitar_cae(
     payment_due: Union[None, date, datetime, str] = None,
     moneda_id: str = "PES",
     moneda_cotiz: Union[str, float, Decimal] = "1.00",
-    cbte_nro: Optional[int] = None,
-    # NUEVO
     condicion_iva_receptor_id: Optional[int] = 5,
-    cbtes_asoc: Optional[Union[dict, List[dict]]] = None,   # {"tipo": 11, "pto_vta": 3, "nro": 8, "cuit": "...", "cbte_fch": "YYYYMMDD"}
-    periodo_asoc: Optional[dict] = None,                    # {"desde": "YYYYMMDD|YYYY-MM-DD", "hasta": "..."}
+    cbtes_asoc: Optional[Union[dict, List[dict]]] = None,
+    periodo_asoc: Optional[dict] = None,
     iva_rate: Union[str, float, Decimal] = "0.21",
-):
-    # Lee token/sign del WSAA previamente generados
-    token, sign = _read_wsaa_credentials()
-    url = "https://servicios1.afip.gov.ar/wsfev1/service.asmx"
-    headers = {
-        "Content-Type": "text/xml; charset=utf-8",
-        "SOAPAction": "http://ar.gov.afip.dif.FEV1/FECAESolicitar",
-    }
-
-    session = requests.Session()
-    session.mount("https://", SSLAdapter())
-
-    # Trae el último número del tipo elegido (11/12/13, etc.)
-    ultimo = consultar_ultimo_comprobante(session, token, sign, cuit, pto_vta, cbte_tipo)
-    if cbte_nro is None:
-        cbte_nro = ultimo + 1
-    LOGGER.debug("Último comprobante autorizado: %s", ultimo)
-    LOGGER.debug("Número de comprobante a solicitar: %s", cbte_nro)
-
+    caea: Optional[str] = None,
+) -> str:
+    """
+    Valida los importes/fechas de un comprobante y arma su <ar:FECAEDetRequest>
+    (o <ar:FECAEADetRequest> con el CAEA asignado, para FECAEARegInformativo).
+    """
     # ======================
     # Fechas automáticas
     # ======================
@@ -653,27 +665,10 @@ def solicitar_cae(
             f"pero ImpTotal es {total:.2f}."
         )
 
-    # ======================
-    # SOAP body
-    # ======================
-    soap_body = f"""<?xml version="1.0" encoding="UTF-8"?>
-<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ar="http://ar.gov.afip.dif.FEV1/">
-  <soapenv:Header/>
-  <soapenv:Body>
-    <ar:FECAESolicitar>
-      <ar:Auth>
-        <ar:Token>{token}</ar:Token>
-        <ar:Sign>{sign}</ar:Sign>
-        <ar:Cuit>{cuit}</ar:Cuit>
-      </ar:Auth>
-      <ar:FeCAEReq>
-        <ar:FeCabReq>
-          <ar:CantReg>1</ar:CantReg>
-          <ar:PtoVta>{pto_vta}</ar:PtoVta>
-          <ar:CbteTipo>{cbte_tipo}</ar:CbteTipo>
-        </ar:FeCabReq>
-        <ar:FeDetReq>
-          <ar:FECAEDetRequest>
+    tag = "FECAEADetRequest" if caea else "FECAEDetRequest"
+    caea_xml = f"<ar:CAEA>{caea}</ar:CAEA>" if caea else ""
+    return f"""
+          <ar:{tag}>
             <ar:Concepto>{concepto}</ar:Concepto>
             <ar:DocTipo>{doc_tipo}</ar:DocTipo>
             <ar:DocNro>{doc_nro_digits}</ar:DocNro>
@@ -695,14 +690,51 @@ def solicitar_cae(
             {iva_xml}
             {cbtes_asoc_xml}
             {periodo_asoc_xml}
-          </ar:FECAEDetRequest>
+            {caea_xml}
+          </ar:{tag}>"""
+
+
+# Operación -> elemento que envuelve cabecera + detalles
+_REQ_WRAPPER = {"FECAESolicitar": "FeCAEReq", "FECAEARegInformativo": "FeCAEARegInfReq"}
+
+
+def _enviar_fecaesolicitar(
+    session, token, sign, cuit, pto_vta, cbte_tipo, detalles: List[str], *, metodo: str = "FECAESolicitar"
+):
+    """
+    POST de FECAESolicitar (o FECAEARegInformativo) con CantReg = len(detalles).
+    Devuelve (response, tree, soap_body).
+    """
+    url = "https://servicios1.afip.gov.ar/wsfev1/service.asmx"
+    headers = {
+        "Content-Type": "text/xml; charset=utf-8",
+        "SOAPAction": f"http://ar.gov.afip.dif.FEV1/{metodo}",
+    }
+    wrapper = _REQ_WRAPPER[metodo]
+
+    soap_body = f"""<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ar="http://ar.gov.afip.dif.FEV1/">
+  <soapenv:Header/>
+  <soapenv:Body>
+    <ar:{metodo}>
+      <ar:Auth>
+        <ar:Token>{token}</ar:Token>
+        <ar:Sign>{sign}</ar:Sign>
+        <ar:Cuit>{cuit}</ar:Cuit>
+      </ar:Auth>
+      <ar:{wrapper}>
+        <ar:FeCabReq>
+          <ar:CantReg>{len(detalles)}</ar:CantReg>
+          <ar:PtoVta>{pto_vta}</ar:PtoVta>
+          <ar:CbteTipo>{cbte_tipo}</ar:CbteTipo>
+        </ar:FeCabReq>
+        <ar:FeDetReq>{''.join(detalles)}
         </ar:FeDetReq>
-      </ar:FeCAEReq>
-    </ar:FECAESolicitar>
+      </ar:{wrapper}>
+    </ar:{metodo}>
   </soapenv:Body>
 </soapenv:Envelope>"""
 
-    
     response = session.post(url, data=soap_body.encode("utf-8"), headers=headers, timeout=60)
     response.raise_for_status()
 
@@ -711,12 +743,85 @@ def solicitar_cae(
     fault = tree.find(".//faultstring")
     if fault is not None and fault.text:
         LOGGER.error(
-            "AFIP fault en FECAESolicitar. Request=%s Response=%s",
+            "AFIP fault en %s. Request=%s Response=%s",
+            metodo,
             _sanitize_payload(soap_body, [token, sign]),
             _sanitize_payload(response.text, [token, sign]),
         )
         raise RuntimeError(fault.text.strip())
 
+    return response, tree, soap_body
+
+
+def _extract_events(tt: ET.Element) -> List[str]:
+    ns = "{http://ar.gov.afip.dif.FEV1/}"
+    out: List[str] = []
+    for evt in tt.findall(f".//{ns}Evt"):
+        code = evt.findtext(f"{ns}Code") or ""
+        msg = (evt.findtext(f"{ns}Msg") or "").strip()
+        if code or msg:
+            out.append(f"{code}: {msg}" if code else msg)
+    return out
+
+
+def solicitar_cae(
+    cuit: str,
+    pto_vta: int,
+    importe: Union[str, float, Decimal],
+    *,
+    # cbte_tipo soporta: 11 = Factura C; 2/3 = Nota Débito/Crédito A; 7/8 = Nota Débito/Crédito B; 12/13 = Nota Débito/Crédito C
+    cbte_tipo: int = 11,
+    concepto: int = 2,
+    doc_tipo: int = 80,
+    doc_nro: Optional[Union[str, int]] = None,
+    issue_date: Union[None, date, datetime, str] = None,
+    service_start: Union[None, date, datetime, str] = None,
+    service_end: Union[None, date, datetime, str] = None,
+    payment_due: Union[None, date, datetime, str] = None,
+    moneda_id: str = "PES",
+    moneda_cotiz: Union[str, float, Decimal] = "1.00",
+    cbte_nro: Optional[int] = None,
+    # NUEVO
+    condicion_iva_receptor_id: Optional[int] = 5,
+    cbtes_asoc: Optional[Union[dict, List[dict]]] = None,   # {"tipo": 11, "pto_vta": 3, "nro": 8, "cuit": "...", "cbte_fch": "YYYYMMDD"}
+    periodo_asoc: Optional[dict] = None,                    # {"desde": "YYYYMMDD|YYYY-MM-DD", "hasta": "..."}
+    iva_rate: Union[str, float, Decimal] = "0.21",
+):
+    # Lee token/sign del WSAA previamente generados
+    token, sign = _read_wsaa_credentials(cuit)
+    session = transport.get_session()
+
+    # Sin número explícito (numerador local sin sincronizar) se pide el último a AFIP
+    if cbte_nro is None:
+        ultimo = consultar_ultimo_comprobante(session, token, sign, cuit, pto_vta, cbte_tipo)
+        cbte_nro = ultimo + 1
+        LOGGER.debug("Último comprobante autorizado: %s", ultimo)
+    LOGGER.debug("Número de comprobante a solicitar: %s", cbte_nro)
+
+    detalle = _armar_detalle(
+        cuit,
+        cbte_tipo,
+        cbte_nro,
+        importe,
+        concepto=concepto,
+        doc_tipo=doc_tipo,
+        doc_nro=doc_nro,
+        issue_date=issue_date,
+        service_start=service_start,
+        service_end=service_end,
+        payment_due=payment_due,
+        moneda_id=moneda_id,
+        moneda_cotiz=moneda_cotiz,
+        condicion_iva_receptor_id=condicion_iva_receptor_id,
+        cbtes_asoc=cbtes_asoc,
+        periodo_asoc=periodo_asoc,
+        iva_rate=iva_rate,
+    )
+
+    response, tree, soap_body = _enviar_fecaesolicitar(
+        session, token, sign, cuit, pto_vta, cbte_tipo, [detalle]
+    )
+
     errors = _extract_messages(tree, "Err")
     if errors:
         LOGGER.error(
@@ -729,16 +834,6 @@ def solicitar_cae(
     observations = _extract_messages(tree, "Obs")
 
     # (Opcional) extraer eventos informativos
-    def _extract_events(tt: ET.Element) -> List[str]:
-        ns = "{http://ar.gov.afip.dif.FEV1/}"
-        out: List[str] = []
-        for evt in tt.findall(f".//{ns}Evt"):
-            code = evt.findtext(f"{ns}Code") or ""
-            msg = (evt.findtext(f"{ns}Msg") or "").strip()
-            if code or msg:
-                out.append(f"{code}: {msg}" if code else msg)
-        return out
-
     events = _extract_events(tree)
 
     namespace = "{http://ar.gov.afip.dif.FEV1/}"
@@ -783,6 +878,352 @@ def solicitar_cae(
     }
 
 
+# ======================
+# Solicitar CAE en lote (CantReg > 1)
+# ======================
+# Tope por request cuando AFIP no responde FECompTotXRequest.
+MAX_REGISTROS_POR_LOTE_DEFAULT: Final = 250
+_MAX_REGISTROS_CACHE: dict = {}
+
+
+def consultar_max_registros_por_lote(session, token, sign, cuit) -> int:
+    """FECompTotXRequest: cantidad máxima de comprobantes por FECAESolicitar (se cachea por CUIT)."""
+    import requests
+
+    if cuit in _MAX_REGISTROS_CACHE:
+        return _MAX_REGISTROS_CACHE[cuit]
+
+    url = "https://servicios1.afip.gov.ar/wsfev1/service.asmx"
+    headers = {
+        "Content-Type": "text/xml; charset=utf-8",
+        "SOAPAction": "http://ar.gov.afip.dif.FEV1/FECompTotXRequest",
+    }
+    soap_body = f"""<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"
+               xmlns:ar="http://ar.gov.afip.dif.FEV1/">
+  <soap:Header/>
+  <soap:Body>
+    <ar:FECompTotXRequest>
+      <ar:Auth>
+        <ar:Token>{token}</ar:Token>
+        <ar:Sign>{sign}</ar:Sign>
+        <ar:Cuit>{cuit}</ar:Cuit>
+      </ar:Auth>
+    </ar:FECompTotXRequest>
+  </soap:Body>
+</soap:Envelope>"""
+
+    maximo = MAX_REGISTROS_POR_LOTE_DEFAULT
+    try:
+        response = session.post(url, data=soap_body.encode("utf-8"), headers=headers, timeout=60)
+        response.raise_for_status()
+        tree = ET.fromstring(response.text)
+        valor = tree.findtext(".//{http://ar.gov.afip.dif.FEV1/}RegXReq")
+        if valor and valor.strip().isdigit() and int(valor) > 0:
+            maximo = int(valor)
+    except (requests.RequestException, ET.ParseError) as exc:
+        LOGGER.warning("No se pudo consultar FECompTotXRequest, se usa %s: %s", maximo, exc)
+        return maximo
+
+    _MAX_REGISTROS_CACHE[cuit] = maximo
+    return maximo
+
+
+def _parse_detalles_lote(tree: ET.Element, tag: str = "FECAEDetResponse") -> dict:
+    """FECAEDetResponse por número de comprobante -> resultado, CAE y observaciones propias."""
+    ns = "{http://ar.gov.afip.dif.FEV1/}"
+    por_nro = {}
+    for det in tree.findall(f".//{ns}{tag}"):
+        try:
+            nro = int(det.findtext(f"{ns}CbteDesde") or "")
+        except ValueError:
+            continue
+        por_nro[nro] = {
+            "resultado": (det.findtext(f"{ns}Resultado") or "").strip(),
+            "cae": (det.findtext(f"{ns}CAE") or det.findtext(f"{ns}CAEA") or "").strip(),
+            "cae_due": (det.findtext(f"{ns}CAEFchVto") or "").strip(),
+            "observations": _extract_messages(det, "Obs"),
+        }
+    return por_nro
+
+
+def solicitar_cae_lote(
+    cuit: str,
+    pto_vta: int,
+    comprobantes: List[dict],
+    *,
+    cbte_tipo: int = 11,
+    max_por_request: Optional[int] = None,
+    cbte_nro_desde: Optional[int] = None,
+) -> List[dict]:
+    """
+    Autoriza varios comprobantes del mismo tipo y punto de venta empaquetando hasta
+    el máximo por request de AFIP en cada FECAESolicitar (un solo FECompUltimoAutorizado
+    por request en lugar de uno por comprobante).
+
+    `comprobantes` es una lista de kwargs como los de solicitar_cae (importe, doc_nro,
+    doc_tipo, iva_rate, cbtes_asoc, ...). Devuelve una lista en el mismo orden con, por
+    cada comprobante: cae, cae_due, cbte_nro, resultado ("A"/"R"), observations y events.
+    Los comprobantes rechazados vienen con cae=None y sus observaciones.
+
+    Con `cbte_nro_desde` (numerador local) se evita FECompUltimoAutorizado; si un bloque
+    tiene rechazos, el siguiente vuelve a consultar el último autorizado.
+    """
+    if not comprobantes:
+        return []
+
+    token, sign = _read_wsaa_credentials(cuit)
+    session = transport.get_session()
+    limite = max_por_request or consultar_max_registros_por_lote(session, token, sign, cuit)
+
+    resultados: List[dict] = []
+    siguiente = cbte_nro_desde
+    for inicio in range(0, len(comprobantes), limite):
+        bloque = comprobantes[inicio:inicio + limite]
+
+        if siguiente is None:
+            siguiente = consultar_ultimo_comprobante(session, token, sign, cuit, pto_vta, cbte_tipo) + 1
+        numeros = [siguiente + i for i in range(len(bloque))]
+        detalles = [
+            _armar_detalle(cuit, cbte_tipo, nro, **{k: v for k, v in comp.items() if k != "cbte_nro"})
+            for nro, comp in zip(numeros, bloque)
+        ]
+        LOGGER.debug("FECAESolicitar en lote: %s comprobantes desde %s", len(detalles), numeros[0])
+
+        response, tree, soap_body = _enviar_fecaesolicitar(
+            session, token, sign, cuit, pto_vta, cbte_tipo, detalles
+        )
+        por_nro = _parse_detalles_lote(tree)
+        if not por_nro:
+            errors = _extract_messages(tree, "Err")
+            LOGGER.error(
+                "AFIP errores en FECAESolicitar (lote). Request=%s Response=%s",
+                _sanitize_payload(soap_body, [token, sign]),
+                _sanitize_payload(response.text, [token, sign]),
+            )
+            raise RuntimeError("AFIP devolvió errores: " + "; ".join(errors or ["respuesta sin detalles"]))
+
+        events = _extract_events(tree)
+        siguiente = numeros[-1] + 1
+        for nro in numeros:
+            det = por_nro.get(nro) or {"resultado": "R", "cae": "", "cae_due": "", "observations": []}
+            aprobado = det["resultado"] == "A" and bool(det["cae"])
+            if not aprobado:
+                siguiente = None
+            if det["observations"]:
+                LOGGER.warning("AFIP devolvió observaciones para el comprobante %s: %s", nro, "; ".join(det["observations"]))
+            resultados.append(
+                {
+                    "cae": det["cae"] if aprobado else None,
+                    "cae_due": det["cae_due"] if aprobado else None,
+                    "cbte_nro": nro if aprobado else None,
+                    "pto_vta": pto_vta,
+                    "cbte_tipo": cbte_tipo,
+                    "resultado": det["resultado"] or "R",
+                    "xml": response.text,
+                    "observations": det["observations"],
+                    "events": events,
+                }
+            )
+
+    return resultados
+
+
+# ======================
+# CAEA (código de autorización anticipado)
+# ======================
+def _caea_desde_result(tree: ET.Element) -> Optional[dict]:
+    ns = "{http://ar.gov.afip.dif.FEV1/}"
+    caea = (tree.findtext(f".//{ns}ResultGet/{ns}CAEA") or "").strip()
+    if not caea:
+        return None
+    return {
+        "caea": caea,
+        "periodo": (tree.findtext(f".//{ns}ResultGet/{ns}Periodo") or "").strip(),
+        "orden": int(tree.findtext(f".//{ns}ResultGet/{ns}Orden") or 0),
+        "fch_vig_desde": (tree.findtext(f".//{ns}ResultGet/{ns}FchVigDesde") or "").strip(),
+        "fch_vig_hasta": (tree.findtext(f".//{ns}ResultGet/{ns}FchVigHasta") or "").strip(),
+        "fch_tope_inf": (tree.findtext(f".//{ns}ResultGet/{ns}FchTopeInf") or "").strip(),
+    }
+
+
+def _caea_request(session, token, sign, cuit, metodo: str, periodo: str, orden: int):
+    url = "https://servicios1.afip.gov.ar/wsfev1/service.asmx"
+    headers = {
+        "Content-Type": "text/xml; charset=utf-8",
+        "SOAPAction": f"http://ar.gov.afip.dif.FEV1/{metodo}",
+    }
+    soap_body = f"""<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"
+               xmlns:ar="http://ar.gov.afip.dif.FEV1/">
+  <soap:Header/>
+  <soap:Body>
+    <ar:{metodo}>
+      <ar:Auth>
+        <ar:Token>{token}</ar:Token>
+        <ar:Sign>{sign}</ar:Sign>
+        <ar:Cuit>{cuit}</ar:Cuit>
+      </ar:Auth>
+      <ar:Periodo>{periodo}</ar:Periodo>
+      <ar:Orden>{orden}</ar:Orden>
+    </ar:{metodo}>
+  </soap:Body>
+</soap:Envelope>"""
+
+    response = session.post(url, data=soap_body.encode("utf-8"), headers=headers, timeout=60)
+    response.raise_for_status()
+    return ET.fromstring(response.text)
+
+
+def solicitar_caea(cuit: str, periodo: str, orden: int) -> dict:
+    """
+    FECAEASolicitar para la quincena (periodo "YYYYMM", orden 1 = días 1-15, 2 = 16-fin).
+    Si AFIP ya lo había otorgado (pedido repetido) se recupera con FECAEAConsultar.
+    Devuelve caea, periodo, orden, fch_vig_desde, fch_vig_hasta y fch_tope_inf (YYYYMMDD).
+    """
+    token, sign = _read_wsaa_credentials(cuit)
+    session = transport.get_session()
+
+    tree = _caea_request(session, token, sign, cuit, "FECAEASolicitar", periodo, orden)
+    datos = _caea_desde_result(tree)
+    if datos:
+        return datos
+
+    errores = _extract_messages(tree, "Err")
+    tree = _caea_request(session, token, sign, cuit, "FECAEAConsultar", periodo, orden)
+    datos = _caea_desde_result(tree)
+    if datos:
+        return datos
+    raise RuntimeError(
+        "AFIP no otorgó el CAEA: " + "; ".join(errores + _extract_messages(tree, "Err") or ["sin detalle"])
+    )
+
+
+def informar_caea(
+    cuit: str,
+    pto_vta: int,
+    cbte_tipo: int,
+    caea: str,
+    comprobantes: List[dict],
+    *,
+    max_por_request: Optional[int] = None,
+) -> List[dict]:
+    """
+    FECAEARegInformativo: informa comprobantes ya emitidos con `caea`, en lotes del máximo
+    por request. Cada item trae cbte_nro y los kwargs de solicitar_cae con los que se emitió
+    (issue_date incluida). Devuelve, en el mismo orden, resultado ("A"/"R") y observations.
+    """
+    if not comprobantes:
+        return []
+
+    token, sign = _read_wsaa_credentials(cuit)
+    session = transport.get_session()
+    limite = max_por_request or consultar_max_registros_por_lote(session, token, sign, cuit)
+
+    resultados: List[dict] = []
+    for inicio in range(0, len(comprobantes), limite):
+        bloque = comprobantes[inicio:inicio + limite]
+        detalles = [
+            _armar_detalle(
+                cuit, cbte_tipo, comp["cbte_nro"], caea=caea, **{k: v for k, v in comp.items() if k != "cbte_nro"}
+            )
+            for comp in bloque
+        ]
+        response, tree, soap_body = _enviar_fecaesolicitar(
+            session, token, sign, cuit, pto_vta, cbte_tipo, detalles, metodo="FECAEARegInformativo"
+        )
+        por_nro = _parse_detalles_lote(tree, tag="FECAEADetResponse")
+        if not por_nro:
+            errors = _extract_messages(tree, "Err")
+            LOGGER.error(
+                "AFIP errores en FECAEARegInformativo. Request=%s Response=%s",
+                _sanitize_payload(soap_body, [token, sign]),
+                _sanitize_payload(response.text, [token, sign]),
+            )
+            raise RuntimeError("AFIP devolvió errores: " + "; ".join(errors or ["respuesta sin detalles"]))
+
+        for comp in bloque:
+            det = por_nro.get(comp["cbte_nro"]) or {"resultado": "R", "observations": []}
+            resultados.append(
+                {
+                    "cbte_nro": comp["cbte_nro"],
+                    "resultado": det["resultado"] or "R",
+                    "observations": det["observations"],
+                }
+            )
+    return resultados
+
+
+def ultimo_autorizado(cuit: str, pto_vta: int, cbte_tipo: int) -> int:
+    """FECompUltimoAutorizado con las credenciales del proceso."""
+    token, sign = _read_wsaa_credentials(cuit)
+    return consultar_ultimo_comprobante(transport.get_session(), token, sign, cuit, pto_vta, cbte_tipo)
+
+
+# AFIP responde este código cuando el comprobante consultado no existe.
+ERR_COMPROBANTE_INEXISTENTE: Final = "602"
+
+
+def consultar_comprobante(cuit: str, pto_vta: int, cbte_tipo: int, cbte_nro: int) -> Optional[dict]:
+    """
+    FECompConsultar: datos de un comprobante ya autorizado, o None si AFIP no lo tiene.
+    Devuelve las mismas claves que solicitar_cae más doc_nro e importe (ImpTotal).
+    """
+    token, sign = _read_wsaa_credentials(cuit)
+    url = "https://servicios1.afip.gov.ar/wsfev1/service.asmx"
+    headers = {
+        "Content-Type": "text/xml; charset=utf-8",
+        "SOAPAction": "http://ar.gov.afip.dif.FEV1/FECompConsultar",
+    }
+
+    soap_body = f"""<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"
+               xmlns:ar="http://ar.gov.afip.dif.FEV1/">
+  <soap:Header/>
+  <soap:Body>
+    <ar:FECompConsultar>
+      <ar:Auth>
+        <ar:Token>{token}</ar:Token>
+        <ar:Sign>{sign}</ar:Sign>
+        <ar:Cuit>{cuit}</ar:Cuit>
+      </ar:Auth>
+      <ar:FeCompConsReq>
+        <ar:CbteTipo>{cbte_tipo}</ar:CbteTipo>
+        <ar:CbteNro>{cbte_nro}</ar:CbteNro>
+        <ar:PtoVta>{pto_vta}</ar:PtoVta>
+      </ar:FeCompConsReq>
+    </ar:FECompConsultar>
+  </soap:Body>
+</soap:Envelope>"""
+
+    response = transport.get_session().post(url, data=soap_body.encode("utf-8"), headers=headers, timeout=60)
+    response.raise_for_status()
+    tree = ET.fromstring(response.text)
+
+    namespace = "{http://ar.gov.afip.dif.FEV1/}"
+    codigos = [(node.findtext(f"{namespace}Code") or "").strip() for node in tree.findall(f".//{namespace}Err")]
+    if ERR_COMPROBANTE_INEXISTENTE in codigos:
+        return None
+    if codigos:
+        raise RuntimeError("AFIP devolvió errores: " + "; ".join(_extract_messages(tree, "Err")))
+
+    resultado = tree.find(f".//{namespace}ResultGet")
+    if resultado is None or not resultado.findtext(f"{namespace}CodAutorizacion"):
+        return None
+    return {
+        "cae": resultado.findtext(f"{namespace}CodAutorizacion"),
+        "cae_due": resultado.findtext(f"{namespace}FchVto") or "",
+        "cbte_nro": int(resultado.findtext(f"{namespace}CbteDesde") or cbte_nro),
+        "pto_vta": pto_vta,
+        "cbte_tipo": cbte_tipo,
+        "doc_nro": resultado.findtext(f"{namespace}DocNro") or "",
+        "importe": _format_decimal(resultado.findtext(f"{namespace}ImpTotal") or "0"),
+        "xml": response.text,
+        "observations": _extract_messages(tree, "Obs"),
+        "events": _extract_events(tree),
+    }
+
+
 # ======================
 # Main
 # ======================
@@ -0,0 +1,147 @@
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+import requests
+from django.test import TestCase, override_settings
+
+from afip.caea import asegurar_caea, informar_pendientes, periodo_y_orden
+from afip.fe_service import emitir_y_guardar_factura
+from afip.numerador import reiniciar_sincronizacion
+from afip.solicitar_cae import informar_caea
+from billing.models import Client, Invoice
+
+CAEA_OK = {
+    "caea": "31234567890123",
+    "periodo": "202510",
+    "orden": 2,
+    "fch_vig_desde": "20251016",
+    "fch_vig_hasta": "20251031",
+    "fch_tope_inf": "20251108",
+}
+
+REG_INFORMATIVO_RESPONSE = """<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+  <soap:Body>
+    <FECAEARegInformativoResponse xmlns="http://ar.gov.afip.dif.FEV1/">
+      <FECAEARegInformativoResult>
+        <FeDetResp>
+          <FECAEADetResponse>
+            <CbteDesde>8</CbteDesde><CbteHasta>8</CbteHasta>
+            <Resultado>A</Resultado><CAEA>31234567890123</CAEA>
+          </FECAEADetResponse>
+        </FeDetResp>
+      </FECAEARegInformativoResult>
+    </FECAEARegInformativoResponse>
+  </soap:Body>
+</soap:Envelope>"""
+
+
+class CaeaTest(TestCase):
+    def setUp(self):
+        reiniciar_sincronizacion()
+        self.addCleanup(reiniciar_sincronizacion)
+        self.client_obj = Client.objects.create(name="Cliente", email="c@example.com")
+
+    def test_periodo_y_orden_por_quincena(self):
+        self.assertEqual(periodo_y_orden(date(2025, 10, 15)), ("202510", 1))
+        self.assertEqual(periodo_y_orden(date(2025, 10, 16)), ("202510", 2))
+
+    @patch("afip.caea.fe.solicitar_caea", return_value=CAEA_OK)
+    def test_asegurar_pide_la_siguiente_quincena_con_anticipo(self, mock_solicitar):
+        asegurar_caea("1", date(2025, 10, 28))
+
+        self.assertEqual(
+            [c.args for c in mock_solicitar.call_args_list], [("1", "202510", 2), ("1", "202511", 1)]
+        )
+        asegurar_caea("1", date(2025, 10, 28))
+        self.assertEqual(mock_solicitar.call_count, 2)  # ya guardados
+
+    @override_settings(AFIP_MODO_EMISION="CAEA")
+    @patch("afip.fe_service._render_pdf_to_bytes", return_value=b"PDF")
+    @patch("afip.fe_service.fe.obtener_tipos_comprobante_validos", return_value=[11])
+    @patch("afip.fe_service.fe.solicitar_cae")
+    @patch("afip.fe_service.fe.ultimo_autorizado", return_value=7)
+    @patch("afip.caea.fe.solicitar_caea", return_value=CAEA_OK)
+    def test_emision_local_sin_round_trip(self, _mock_caea, mock_ultimo, mock_cae, _mock_tipos, _mock_pdf):
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            facturas = [
+                emitir_y_guardar_factura(
+                    client=self.client_obj,
+                    amount=Decimal("121.00"),
+                    pto_vta=5,
+                    cbte_tipo=11,
+                    doc_tipo=80,
+                    doc_nro="20123456789",
+                )
+                for _ in range(2)
+            ]
+
+        mock_cae.assert_not_called()
+        mock_ultimo.assert_called_once()
+        self.assertEqual([f.cbte_nro for f in facturas], [8, 9])
+        self.assertEqual(facturas[0].cae, CAEA_OK["caea"])
+        self.assertEqual(facturas[0].modo_autorizacion, Invoice.MODO_CAEA)
+        self.assertEqual(facturas[0].metadata["caea_detalle"]["importe"], "121.00")
+
+    def _factura_caea(self, nro):
+        return Invoice.objects.create(
+            client=self.client_obj,
+            amount=Decimal("121.00"),
+            pto_vta=5,
+            cbte_tipo=11,
+            cbte_nro=nro,
+            cae=CAEA_OK["caea"],
+            modo_autorizacion=Invoice.MODO_CAEA,
+            metadata={"caea_detalle": {"importe": "121.00", "doc_nro": "1", "issue_date": "20251020"}},
+        )
+
+    @patch("afip.caea.fe.informar_caea")
+    def test_informar_marca_aprobados_y_rechazados(self, mock_informar):
+        aprobada, rechazada = self._factura_caea(8), self._factura_caea(9)
+        mock_informar.return_value = [
+            {"cbte_nro": 8, "resultado": "A", "observations": []},
+            {"cbte_nro": 9, "resultado": "R", "observations": ["10016: fecha"]},
+        ]
+
+        stats = informar_pendientes("1")
+
+        self.assertEqual(stats, {"informados": 1, "rechazados": 1, "errores": 0})
+        aprobada.refresh_from_db()
+        rechazada.refresh_from_db()
+        self.assertIsNotNone(aprobada.caea_informado)
+        self.assertEqual(rechazada.caea_rechazo, "10016: fecha")
+        self.assertEqual(informar_pendientes("1")["informados"], 0)  # rechazados no se reintentan solos
+
+    @patch("afip.caea.fe.informar_caea", side_effect=requests.ConnectionError("caído"))
+    def test_afip_caido_deja_pendiente_para_reintentar(self, _mock_informar):
+        factura = self._factura_caea(8)
+
+        stats = informar_pendientes("1")
+
+        self.assertEqual(stats["errores"], 1)
+        factura.refresh_from_db()
+        self.assertIsNone(factura.caea_informado)
+        self.assertEqual(factura.caea_rechazo, "")
+
+    @patch("afip.solicitar_cae.transport.get_session")
+    @patch("afip.solicitar_cae._read_wsaa_credentials", return_value=("token", "sign"))
+    def test_reg_informativo_envia_detalle_con_caea(self, _mock_wsaa, mock_session):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = REG_INFORMATIVO_RESPONSE.encode("utf-8")
+        mock_session.return_value.post.return_value = response
+
+        resultados = informar_caea(
+            "1", 5, 11, CAEA_OK["caea"],
+            [{"cbte_nro": 8, "importe": "121.00", "doc_nro": "1", "issue_date": "20251020"}],
+            max_por_request=250,
+        )
+
+        body = mock_session.return_value.post.call_args.kwargs["data"].decode("utf-8")
+        self.assertIn("<ar:FeCAEARegInfReq>", body)
+        self.assertIn("<ar:FECAEADetRequest>", body)
+        self.assertIn(f"<ar:CAEA>{CAEA_OK['caea']}</ar:CAEA>", body)
+        self.assertIn("<ar:CbteFch>20251020</ar:CbteFch>", body)
+        self.assertEqual(resultados, [{"cbte_nro": 8, "resultado": "A", "observations": []}])
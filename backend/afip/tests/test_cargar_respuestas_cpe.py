@@ -0,0 +1,84 @@
+import io
+import tarfile
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from afip import cpe_referencias
+from billing.models import Client
+from billing.tests.test_consultar_cpe_lote_api import XML_NO_EXISTE, XML_OK
+from trips.models import CPEAutomotor
+
+
+class CargarRespuestasCPETest(TestCase):
+    def setUp(self):
+        cpe_referencias.limpiar_cache()
+        self.addCleanup(cpe_referencias.limpiar_cache)
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.dir = Path(directorio.name)
+
+    def _archivar(self, nombre: str, cantidad: int) -> Path:
+        carpeta = self.dir / nombre
+        for i in range(1, cantidad + 1):
+            sub = carpeta / f"{i:05d}"
+            sub.mkdir(parents=True)
+            (sub / "response.xml").write_text(XML_OK.format(ctg=i), encoding="utf-8")
+        return carpeta
+
+    def _cargar(self, origen, **kwargs):
+        out, err = StringIO(), StringIO()
+        call_command("cargar_respuestas_cpe", str(origen), stdout=out, stderr=err, **kwargs)
+        return out.getvalue(), err.getvalue()
+
+    def test_las_queries_no_crecen_con_la_cantidad_de_filas(self):
+        chico, grande = self._archivar("chico", 2), self._archivar("grande", 40)
+        self._cargar(chico, procesos=0)  # crea cliente, producto y vehículo
+
+        def cargar_desde_cero(origen):
+            CPEAutomotor.objects.all().delete()
+            cpe_referencias.limpiar_cache()
+            with CaptureQueriesContext(connection) as queries:
+                salida, _ = self._cargar(origen, procesos=0)
+            return len(queries), salida
+
+        queries_chico, _ = cargar_desde_cero(chico)
+        queries_grande, salida = cargar_desde_cero(grande)
+
+        self.assertEqual(queries_grande, queries_chico)
+        self.assertIn("40 CPE guardadas, 0 con error", salida)
+        self.assertEqual(Client.objects.count(), 1)
+        cpe = CPEAutomotor.objects.get(nro_ctg="7")
+        self.assertEqual((cpe.peso_neto, cpe.vehicle_domain, cpe.estado), (Decimal("20000"), "AB123CD", "AC"))
+
+    def test_tar_con_pool_de_procesos(self):
+        tar_path = self.dir / "respuestas.tar.gz"
+        with tarfile.open(tar_path, "w:gz") as tar:
+            for nombre, xml in (("a/response.xml", XML_OK.format(ctg=1)), ("b/response.xml", XML_NO_EXISTE),
+                                ("c/response.xml", "<no-cierra>"), ("leeme.txt", "x")):
+                data = xml.encode()
+                info = tarfile.TarInfo(nombre)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+        salida, errores = self._cargar(tar_path, procesos=1, lote=2)
+
+        self.assertIn("3 respuestas", salida)
+        self.assertIn("1 CPE guardadas, 2 con error", salida)
+        self.assertIn("respuestas.tar.gz:b/response.xml: CPEConsultationError: CTG inexistente", errores)
+        self.assertIn("c/response.xml: ParseError", errores)
+        self.assertTrue(CPEAutomotor.objects.filter(nro_ctg="1").exists())
+
+    def test_actualiza_las_existentes(self):
+        CPEAutomotor.objects.create(nro_ctg="1", tariff=Decimal("3.00"))
+
+        self._cargar(self._archivar("una", 1), procesos=0)
+
+        cpe = CPEAutomotor.objects.get(nro_ctg="1")
+        self.assertEqual((cpe.estado, cpe.tariff, cpe.importe_total), ("AC", Decimal("3.00"), Decimal("60000.00")))
@@ -0,0 +1,54 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from rest_framework import status
+
+from afip import cpe_referencias
+from billing.tests.test_consultar_cpe_lote_api import XML_OK, _responder
+from billing.tests.test_consultar_cpe_api import _build_response
+from trips.models import CPEAutomotor
+
+
+@patch("afip.cpe_service.get_token_sign", return_value=("TOKEN", "SIGN"))
+class ConsultarCPEsCommandTest(TestCase):
+    def setUp(self):
+        cpe_referencias.limpiar_cache()
+        self.addCleanup(cpe_referencias.limpiar_cache)
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.csv = Path(directorio.name) / "ctgs.csv"
+        self.csv.write_text("fecha,nro_ctg\n2025-10-01,1\n2025-10-01,3\n2025-10-02,4\n2025-10-02,1\n", encoding="utf-8")
+
+    def _correr(self, **kwargs):
+        out = StringIO()
+        call_command("consultar_cpes", str(self.csv), lote=2, workers=2, stdout=out, stderr=StringIO(), **kwargs)
+        return out.getvalue()
+
+    def test_retoma_desde_el_checkpoint(self, _mock_token):
+        with patch("afip.cpe_service.transport.post", side_effect=_responder) as mock_post:
+            salida = self._correr()
+
+        self.assertEqual(mock_post.call_count, 3)  # el CTG repetido se consulta una vez
+        self.assertIn("1 ok, 1 no encontrados, 1 con error transitorio", salida)
+        self.assertIn("CTG/s", salida)
+        self.assertTrue(CPEAutomotor.objects.filter(nro_ctg="1").exists())
+        checkpoint = Path(f"{self.csv}.checkpoint").read_text(encoding="utf-8").splitlines()
+        self.assertEqual(sorted(checkpoint), ["1\tok", "3\tno_encontrado", "4\terror_transitorio"])
+
+        # Segunda corrida: sólo se reintenta el que falló por AFIP.
+        respuesta = _build_response(status.HTTP_200_OK, XML_OK.format(ctg="4"))
+        with patch("afip.cpe_service.transport.post", return_value=respuesta) as mock_post:
+            salida = self._correr()
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertIn("Retomando: 2 de 3", salida)
+        self.assertTrue(CPEAutomotor.objects.filter(nro_ctg="4").exists())
+
+    def test_columna_inexistente(self, _mock_token):
+        with self.assertRaises(CommandError):
+            self._correr(columna="ctg")
@@ -0,0 +1,64 @@
+import random
+from io import StringIO
+from itertools import combinations
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from afip.cpe_service import CLAVES_PESO_BRUTO, CLAVES_PESO_TARA, CLAVES_PRODUCTO, IndiceRespuesta, _find_first
+from afip.management.commands.benchmark_cpe import CAMPOS, respuesta_cpe_de_muestra
+
+CLAVES = ("a", "b", "c", "{urn:x}a", "pdf")
+
+
+def _contenedores(data):
+    stack = [data]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            yield current
+            stack.extend(current.values())
+        elif isinstance(current, list):
+            yield current
+            stack.extend(current)
+
+
+def _arbol(rnd, profundidad=0):
+    if profundidad > 3 or rnd.random() < 0.3:
+        return rnd.choice(["", "", "x", "y", "0", None, [], {}])
+    if rnd.random() < 0.3:
+        return [_arbol(rnd, profundidad + 1) for _ in range(rnd.randint(0, 3))]
+    return {rnd.choice(CLAVES) + str(i % 2 and i): _arbol(rnd, profundidad + 1) for i in range(rnd.randint(0, 4))}
+
+
+class IndiceRespuestaTest(SimpleTestCase):
+    def assertEquivalente(self, data, conjuntos):
+        indice = IndiceRespuesta(data)
+        for keys in conjuntos:
+            self.assertEqual(indice.primero(keys), _find_first(data, set(keys)), keys)
+            for container in _contenedores(data):
+                self.assertEqual(indice.primero(keys, dentro=container), _find_first(container, set(keys)), keys)
+
+    def test_respuesta_de_muestra(self):
+        data = respuesta_cpe_de_muestra()
+        indice = IndiceRespuesta(data)
+        self.assertEqual(indice.primero(CLAVES_PESO_BRUTO), "30000")
+        self.assertEqual(indice.primero(CLAVES_PESO_TARA), None)  # la muestra trae pesoTara, no pesoTaraDescarga
+        self.assertEqual(indice.primero(CLAVES_PRODUCTO), "Soja")
+        self.assertEquivalente(data, CAMPOS + tuple((k,) for k in ("cuit", "dominio", "pdf", "nroCTG", "nada")))
+
+    def test_arboles_aleatorios(self):
+        rnd = random.Random(20251017)
+        claves = [k + s for k in CLAVES for s in ("", "1")]
+        conjuntos = [c for n in (1, 2) for c in combinations(claves, n)]
+        for _ in range(300):
+            self.assertEquivalente({"raiz": _arbol(rnd)}, conjuntos)
+
+    def test_vacio(self):
+        self.assertIsNone(IndiceRespuesta({}).primero(("a",)))
+        self.assertIsNone(IndiceRespuesta({"a": {"b": ""}}).primero(("a",), dentro="texto"))
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command("benchmark_cpe", repeticiones=5, stdout=out)
+        self.assertIn("µs/respuesta", out.getvalue())
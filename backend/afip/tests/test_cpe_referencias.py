@@ -0,0 +1,70 @@
+from django.test import TestCase, override_settings
+
+from afip import cpe_referencias as ref
+from billing.models import Client, Product, Provider
+from trips.models import Vehicle
+
+
+class ReferenciasCPETest(TestCase):
+    def setUp(self):
+        ref.limpiar_cache()
+        self.addCleanup(ref.limpiar_cache)
+
+    def _resolver_todo(self):
+        return (
+            ref.resolver_cliente("30716004720"),
+            ref.resolver_proveedor("20111111112"),
+            ref.resolver_producto("23", "Soja"),
+            ref.resolver_vehiculo("AB123CD"),
+        )
+
+    def test_la_segunda_vez_sale_de_memoria(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            client, provider, product, vehicle = self._resolver_todo()
+        self.assertIsNone(provider)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._resolver_todo(), (client, None, product, vehicle))
+        self.assertEqual(Client.objects.count(), 1)
+        self.assertEqual(Vehicle.objects.count(), 1)
+
+    def test_sin_commit_no_se_cachea(self):
+        ref.resolver_vehiculo("AB123CD")  # on_commit nunca corre dentro del TestCase
+
+        with self.assertNumQueries(1):
+            ref.resolver_vehiculo("AB123CD")
+
+    def test_las_senales_invalidan(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = ref.resolver_producto("23", "Soja")
+            self.assertIsNone(ref.resolver_proveedor("20111111112"))
+
+        Product.objects.filter(pk=product.pk).update(default_tariff=5)  # sin señal: sigue el cacheado
+        self.assertEqual(ref.resolver_producto("23", "Soja").default_tariff, 0)
+
+        fresco = Product.objects.get(pk=product.pk)
+        fresco.default_tariff = 7
+        fresco.save()
+        self.assertEqual(ref.resolver_producto("23", "Soja").default_tariff, 7)
+
+        provider = Provider.objects.create(name="Proveedor", tax_id="20-11111111-2")
+        self.assertEqual(ref.resolver_proveedor("20111111112"), provider)
+
+    def test_renombre_por_descripcion_de_afip(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ref.resolver_producto("23", "Soja")
+            product = ref.resolver_producto("23", "Soja 1ra")
+
+        self.assertEqual(Product.objects.get(pk=product.pk).name, "Soja 1ra")
+        with self.assertNumQueries(0):
+            self.assertEqual(ref.resolver_producto("23", "Soja 1ra").name, "Soja 1ra")
+
+    @override_settings(CPE_REFERENCIAS_CACHE=2)
+    def test_el_cache_es_acotado(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for dominio in ("AAA111", "BBB222", "CCC333"):
+                ref.resolver_vehiculo(dominio)
+
+        self.assertEqual(ref.estadisticas_cache()["vehiculos"]["entradas"], 2)
+        with self.assertNumQueries(1):  # el más viejo salió del cache
+            ref.resolver_vehiculo("AAA111")
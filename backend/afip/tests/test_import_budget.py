@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Se cargan recién cuando se emite, se firma un TRA o se genera un PDF, nunca al arrancar.
+DEPENDENCIAS_PESADAS = ("zeep", "lxml", "weasyprint", "xhtml2pdf", "qrcode", "PIL", "reportlab", "cryptography")
+
+SCRIPT = """
+import json, resource
+import django
+django.setup()
+import server.urls
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    # ru_maxrss hereda el pico del proceso padre al hacer fork (el runner de tests); VmHWM se reinicia con exec.
+    with open("/proc/self/status") as fh:
+        rss_kb = next(int(line.split()[1]) for line in fh if line.startswith("VmHWM:"))
+except (OSError, StopIteration):
+    pass
+print(json.dumps({"rss_kb": rss_kb}))
+"""
+
+
+class ImportBudgetTest(SimpleTestCase):
+    """Arranque en frío del worker (`python -X importtime`): qué se importa, cuánto tarda y cuánta memoria."""
+
+    budget_ms = int(os.getenv("AFIP_IMPORT_BUDGET_MS", "1000"))
+    budget_rss_mb = int(os.getenv("AFIP_IMPORT_BUDGET_RSS_MB", "120"))
+
+    def test_arranque_del_worker(self):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SCRIPT],
+            capture_output=True,
+            text=True,
+            cwd=BACKEND_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "server.settings"},
+            check=True,
+        )
+
+        acumulado = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                acumulado[name.strip()] = int(cumulative)
+
+        cargadas = sorted({m.split(".")[0] for m in acumulado} & set(DEPENDENCIAS_PESADAS))
+        self.assertEqual(cargadas, [], "dependencias pesadas importadas al arrancar")
+        self.assertLess(acumulado["server.urls"] / 1000, self.budget_ms)
+        rss_mb = json.loads(proc.stdout.strip().splitlines()[-1])["rss_kb"] / 1024
+        self.assertLess(rss_mb, self.budget_rss_mb)
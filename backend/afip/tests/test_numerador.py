@@ -0,0 +1,158 @@
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import patch
+
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, skipIfDBFeature
+
+from afip.models import NumeradorComprobante
+from afip.numerador import reiniciar_sincronizacion, reservar_numero
+
+
+class NumeradorComprobanteTest(TestCase):
+    def setUp(self):
+        reiniciar_sincronizacion()
+        self.addCleanup(reiniciar_sincronizacion)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        secrets = patch("afip.wsaa.SECRETS", Path(tmp.name))
+        secrets.start()
+        self.addCleanup(secrets.stop)
+        # FECompUltimoAutorizado: último número que AFIP tiene autorizado por tipo.
+        self.afip = {11: 41, 13: 1}
+        ultimo = patch("afip.numerador._ultimo_autorizado", side_effect=lambda cuit, pto, tipo: self.afip[tipo])
+        self.mock_ultimo = ultimo.start()
+        self.addCleanup(ultimo.stop)
+
+    def test_primera_reserva_sincroniza_y_las_siguientes_son_locales(self):
+        with reservar_numero("1", 3, 11) as reserva:
+            self.assertEqual(reserva.proximo, 42)
+            reserva.usar(42)  # número que devolvió AFIP
+
+        with reservar_numero("1", 3, 11) as reserva:
+            self.assertEqual(reserva.proximo, 43)
+            reserva.usar(43)
+
+        self.mock_ultimo.assert_called_once_with("1", 3, 11)
+        num = NumeradorComprobante.objects.get(cuit="1", pto_vta=3, cbte_tipo=11)
+        self.assertEqual(num.ultimo_nro, 43)
+        self.assertFalse(num.requiere_sincronizar)
+
+    def test_pares_distintos_numeran_por_separado(self):
+        for tipo in (11, 13):
+            with reservar_numero("1", 3, tipo) as reserva:
+                reserva.usar(reserva.proximo)
+
+        with reservar_numero("1", 3, 13) as reserva:
+            self.assertEqual(reserva.proximo, 3)
+
+    def test_error_fuerza_resincronizar(self):
+        with reservar_numero("1", 3, 11) as reserva:
+            reserva.usar(42)
+
+        with self.assertRaises(RuntimeError):
+            with reservar_numero("1", 3, 11):
+                raise RuntimeError("AFIP caído")
+
+        self.afip[11] = 43  # AFIP llegó a autorizar el comprobante del error
+        with reservar_numero("1", 3, 11) as reserva:
+            self.assertEqual(reserva.proximo, 44)
+        self.assertEqual(self.mock_ultimo.call_count, 2)
+
+    def test_error_de_validacion_no_consume_ni_resincroniza(self):
+        with reservar_numero("1", 3, 11) as reserva:
+            reserva.usar(42)
+
+        with self.assertRaises(ValueError):
+            with reservar_numero("1", 3, 11):
+                raise ValueError("importe inválido")
+
+        with reservar_numero("1", 3, 11) as reserva:
+            self.assertEqual(reserva.proximo, 43)
+        self.mock_ultimo.assert_called_once()
+
+    def test_nuevo_proceso_resincroniza(self):
+        with reservar_numero("1", 3, 11) as reserva:
+            reserva.usar(42)
+
+        reiniciar_sincronizacion()
+        self.afip[11] = 42
+        with reservar_numero("1", 3, 11) as reserva:
+            self.assertEqual(reserva.proximo, 43)
+        self.assertEqual(self.mock_ultimo.call_count, 2)
+
+    def test_emision_autorizada_mientras_se_consultaba_a_afip(self):
+        with reservar_numero("1", 3, 11) as reserva:
+            reserva.usar(42)
+        reiniciar_sincronizacion()
+
+        def otro_proceso_autoriza(cuit, pto, tipo):
+            # La respuesta de AFIP ya quedó vieja cuando se toma el lock.
+            NumeradorComprobante.objects.filter(cuit=cuit, pto_vta=pto, cbte_tipo=tipo).update(ultimo_nro=43)
+            return 42
+
+        self.mock_ultimo.side_effect = otro_proceso_autoriza
+        with reservar_numero("1", 3, 11) as reserva:
+            self.assertEqual(reserva.proximo, 44)
+
+    def test_sin_select_for_update_serializa_con_lock_de_archivo_sin_afip_adentro(self):
+        tomados = []
+
+        @contextmanager
+        def lock(path):
+            tomados.append(path.name)
+            yield
+            tomados.append("liberado")
+
+        def ultimo(cuit, pto, tipo):
+            tomados.append("afip")
+            return 41
+
+        self.mock_ultimo.side_effect = ultimo
+        with patch("afip.numerador.connection.features.has_select_for_update", False), patch(
+            "afip.numerador.file_lock", side_effect=lock
+        ):
+            with reservar_numero("1", 3, 11) as reserva:
+                reserva.usar(reserva.proximo)
+
+        self.assertEqual(tomados, ["afip", ".numerador_1_3_11.lock", "liberado"])
+
+
+@skipIfDBFeature("has_select_for_update")
+class NumeradorConLockDeArchivoTest(TransactionTestCase):
+    def setUp(self):
+        reiniciar_sincronizacion()
+        self.addCleanup(reiniciar_sincronizacion)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        secrets = patch("afip.wsaa.SECRETS", Path(tmp.name))
+        secrets.start()
+        self.addCleanup(secrets.stop)
+        ultimo = patch("afip.numerador._ultimo_autorizado", return_value=41)
+        ultimo.start()
+        self.addCleanup(ultimo.stop)
+
+    def test_otra_conexion_escribe_mientras_se_espera_a_afip(self):
+        NumeradorComprobante.objects.create(cuit="1", pto_vta=4, cbte_tipo=11, ultimo_nro=7)
+        errores = []
+
+        def otra_emision():
+            try:
+                NumeradorComprobante.objects.filter(cuit="1", pto_vta=4).update(ultimo_nro=8)
+            except OperationalError as exc:
+                errores.append(exc)
+            finally:
+                connection.close()
+
+        with reservar_numero("1", 3, 11) as reserva:
+            # Acá se estaría esperando el FECAESolicitar: la base no puede quedar tomada.
+            hilo = threading.Thread(target=otra_emision)
+            hilo.start()
+            hilo.join()
+            reserva.usar(reserva.proximo)
+
+        self.assertEqual(errores, [])
+        self.assertEqual(NumeradorComprobante.objects.get(cuit="1", pto_vta=4).ultimo_nro, 8)
+        self.assertEqual(NumeradorComprobante.objects.get(cuit="1", pto_vta=3).ultimo_nro, 42)
@@ -0,0 +1,73 @@
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import pkcs7
+from cryptography.x509.oid import NameOID
+from django.test import SimpleTestCase
+
+from afip.obtener_token import AfipPaths, escribir_atomico, firmar_TRA_cms, generar_TRA
+
+
+class FirmarTRATest(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        base = Path(tmp.name)
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+        now = datetime.now(timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+        (base / "cert.pem").write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+        (base / "key.pem").write_bytes(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.TraditionalOpenSSL,
+                serialization.NoEncryption(),
+            )
+        )
+        self.cert = cert
+        self.paths = AfipPaths(
+            certificate=base / "cert.pem",
+            private_key=base / "key.pem",
+            credentials_dir=base,
+        )
+
+    def test_firma_en_memoria_sin_subproceso_ni_archivos(self):
+        tra = generar_TRA("wsfe")
+
+        with patch("afip.obtener_token.subprocess.run") as mock_run:
+            cms = firmar_TRA_cms(self.paths, tra)
+
+        mock_run.assert_not_called()
+        self.assertFalse(self.paths.tra.exists())
+        self.assertFalse(self.paths.cms.exists())
+        certs = pkcs7.load_der_pkcs7_certificates(cms)
+        self.assertEqual(certs, [self.cert])
+        self.assertIn(b"<service>wsfe</service>", cms)
+
+
+class EscribirAtomicoTest(SimpleTestCase):
+    def test_reemplaza_sin_dejar_temporales(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            destino = Path(tmp) / "ta.xml"
+            destino.write_text("viejo")
+
+            escribir_atomico(destino, b"nuevo")
+
+            self.assertEqual(destino.read_bytes(), b"nuevo")
+            self.assertEqual([p.name for p in Path(tmp).iterdir()], ["ta.xml"])
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import requests
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from afip.models import ContribuyenteCache
+from afip.padron import consultar_contribuyente, consultar_contribuyentes
+
+PERSONA = {"razon_social": "ACME SA", "summary": {"condition_id": 1}}
+
+
+@override_settings(AFIP_PADRON_TTL=3600, AFIP_PADRON_STALE=86400, AFIP_PADRON_TTL_NEGATIVO=600)
+@patch("afip.wsaa.get_token_sign", return_value=("token", "sign"))
+class PadronCacheTest(TestCase):
+    def _cachear(self, cuit, antiguedad):
+        return ContribuyenteCache.objects.create(
+            cuit=cuit, datos={"razon_social": "VIEJO"}, consultado=timezone.now() - antiguedad
+        )
+
+    @patch("afip.padron.fe.consultar_cliente", return_value=PERSONA)
+    def test_segunda_consulta_sale_de_la_base(self, mock_consulta, _mock_wsaa):
+        primera = consultar_contribuyente("30-71600472-0")
+        segunda = consultar_contribuyente("30716004720")
+
+        mock_consulta.assert_called_once_with("30716004720", "token", "sign")
+        self.assertEqual(primera["datos"], PERSONA)
+        self.assertEqual(segunda["estado"], "ok")
+        self.assertFalse(segunda["desactualizado"])
+
+    @patch("afip.padron.revalidar_en_segundo_plano")
+    @patch("afip.padron.fe.consultar_cliente")
+    def test_vencido_se_sirve_y_se_revalida_en_segundo_plano(self, mock_consulta, mock_revalidar, _mock_wsaa):
+        self._cachear("30716004720", timedelta(hours=2))
+
+        entrada = consultar_contribuyente("30716004720")
+
+        mock_consulta.assert_not_called()
+        mock_revalidar.assert_called_once_with(["30716004720"])
+        self.assertEqual(entrada["datos"], {"razon_social": "VIEJO"})
+        self.assertTrue(entrada["desactualizado"])
+
+    @patch("afip.padron.fe.consultar_cliente")
+    def test_lote_consulta_solo_los_faltantes(self, mock_consulta, _mock_wsaa):
+        self._cachear("20111111112", timedelta(minutes=5))
+        mock_consulta.side_effect = lambda cuit, *_: PERSONA if cuit == "20222222223" else None
+
+        resultados = consultar_contribuyentes(["20111111112", "20222222223", "20333333334"])
+
+        self.assertEqual(
+            sorted(c.args[0] for c in mock_consulta.call_args_list), ["20222222223", "20333333334"]
+        )
+        self.assertEqual(
+            [r["estado"] for r in resultados.values()], ["ok", "ok", "no_encontrado"]
+        )
+        self.assertTrue(ContribuyenteCache.objects.filter(cuit="20222222223").exists())
+
+    @patch("afip.padron.fe.consultar_cliente", side_effect=requests.ConnectionError("caído"))
+    def test_afip_caido_devuelve_copia_vieja(self, _mock_consulta, _mock_wsaa):
+        self._cachear("30716004720", timedelta(days=2))
+
+        entrada = consultar_contribuyente("30716004720")
+
+        self.assertEqual(entrada["estado"], "ok")
+        self.assertTrue(entrada["desactualizado"])
+        self.assertEqual(entrada["error"], "caído")
+
+    @patch("afip.padron.fe.consultar_cliente", return_value=None)
+    def test_no_encontrado_se_cachea_por_poco_tiempo(self, mock_consulta, _mock_wsaa):
+        primera = consultar_contribuyente("20333333334")
+        segunda = consultar_contribuyente("20333333334")
+
+        mock_consulta.assert_called_once()
+        self.assertEqual(primera["estado"], "no_encontrado")
+        self.assertEqual(segunda["estado"], "no_encontrado")
+        self.assertIsNotNone(segunda["consultado"])
+
+        ContribuyenteCache.objects.update(consultado=timezone.now() - timedelta(minutes=11))
+        mock_consulta.return_value = PERSONA
+        self.assertEqual(consultar_contribuyente("20333333334")["datos"], PERSONA)
+        self.assertEqual(mock_consulta.call_count, 2)
+
+    @patch("afip.padron.fe.consultar_cliente", return_value=None)
+    def test_fault_sobre_copia_vencida_devuelve_la_copia_desactualizada(self, _mock_consulta, _mock_wsaa):
+        self._cachear("30716004720", timedelta(days=2))
+
+        entrada = consultar_contribuyente("30716004720")
+
+        self.assertEqual(entrada["estado"], "ok")
+        self.assertEqual(entrada["datos"], {"razon_social": "VIEJO"})
+        self.assertTrue(entrada["desactualizado"])
+        self.assertEqual(ContribuyenteCache.objects.get(cuit="30716004720").datos, {"razon_social": "VIEJO"})
+
+    def test_cuit_invalido(self, _mock_wsaa):
+        with self.assertRaises(ValueError):
+            consultar_contribuyente("123")
@@ -0,0 +1,159 @@
+import base64
+import json
+import tempfile
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.template.loader import get_template
+from django.test import TestCase, override_settings
+
+from afip import pdf_renderer
+from afip.fe_service import (
+    DirectPdfRenderer,
+    PdfRenderer,
+    contexto_pdf,
+    emitir_y_guardar_factura,
+    get_renderer,
+    motor_pdf,
+)
+from afip.numerador import reiniciar_sincronizacion
+from billing.models import Client, Invoice
+
+CAE_OK = {"cae": "71234567890123", "cae_due": "20251231", "cbte_nro": 9, "xml": "<xml/>"}
+
+
+@override_settings(FACTURACION_PDF_PROCESOS=0, AFIP_MODO_EMISION="CAE")
+class PdfRendererTest(TestCase):
+    def setUp(self):
+        # El numerador consulta FECompUltimoAutorizado antes de reservar.
+        ultimo = patch("afip.solicitar_cae.ultimo_autorizado", return_value=0)
+        ultimo.start()
+        self.addCleanup(ultimo.stop)
+        reiniciar_sincronizacion()
+        self.addCleanup(reiniciar_sincronizacion)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_media = override_settings(MEDIA_ROOT=media.name)
+        settings_media.enable()
+        self.addCleanup(settings_media.disable)
+        self.client_obj = Client.objects.create(name="Cliente", email="c@example.com", tax_id="20-12345678-9")
+
+    def _emitir(self):
+        with patch("afip.fe_service.fe.obtener_tipos_comprobante_validos", return_value=[11]), patch(
+            "afip.fe_service.fe.solicitar_cae", return_value=CAE_OK
+        ):
+            return emitir_y_guardar_factura(
+                client=self.client_obj, amount="121.00", pto_vta=3, cbte_tipo=11, doc_tipo=80, doc_nro="20123456789"
+            )
+
+    @patch("afip.fe_service._render_pdf_to_bytes", return_value=b"%PDF-1.4")
+    def test_la_emision_no_renderiza_hasta_el_commit(self, mock_render):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            inv = self._emitir()
+
+        self.assertEqual(inv.pdf_status, Invoice.PDF_PENDIENTE)
+        mock_render.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+
+        callbacks[0]()
+        inv.refresh_from_db()
+        self.assertEqual(inv.pdf_status, Invoice.PDF_LISTO)
+        self.assertTrue(inv.pdf.name.endswith("cbte_11_3_9.pdf"))
+
+        template, context = mock_render.call_args.args
+        self.assertEqual(template, pdf_renderer.TEMPLATE_FACTURA)
+        payload = json.loads(base64.b64decode(context["arca_qr_p_b64"]))
+        self.assertEqual(payload["codAut"], 71234567890123)
+        self.assertEqual(payload["nroDocRec"], 20123456789)
+        self.assertEqual(payload["tipoCodAut"], "E")
+
+    @patch("afip.fe_service._render_pdf_to_bytes", return_value=b"%PDF-1.4")
+    def test_asegurar_pdf_renderiza_si_quedo_pendiente(self, mock_render):
+        inv = self._emitir()  # sin ejecutar el on_commit: como si el proceso se hubiera reiniciado
+
+        inv = pdf_renderer.asegurar_pdf(inv)
+        self.assertEqual(inv.pdf_status, Invoice.PDF_LISTO)
+        pdf_renderer.asegurar_pdf(inv)
+        self.assertEqual(mock_render.call_count, 1)  # ya listo: no vuelve a renderizar
+
+    @patch("afip.fe_service._render_pdf_to_bytes", side_effect=ValueError("template roto"))
+    def test_error_de_render_queda_registrado(self, _mock_render):
+        inv = self._emitir()
+
+        with self.assertRaises(ValueError):
+            pdf_renderer.asegurar_pdf(inv)
+        inv.refresh_from_db()
+        self.assertEqual(inv.pdf_status, Invoice.PDF_ERROR)
+        self.assertFalse(pdf_renderer._EN_CURSO)
+
+
+@override_settings(FACTURACION_PDF_PROCESOS=1)
+class PdfPoolTest(TestCase):
+    def tearDown(self):
+        pdf_renderer.cerrar_pool()
+
+    def test_el_pool_renderiza_en_otro_proceso(self):
+        client = Client.objects.create(name="Cliente", email="c@example.com")
+        inv = Invoice(pk=1, client=client, amount="10.00", pto_vta=1, cbte_tipo=11, cbte_nro=1, cae="1")
+
+        future = pdf_renderer._get_executor().submit(pdf_renderer._render, pdf_renderer.TEMPLATE_FACTURA, {"inv": inv, "client": client})
+
+        self.assertTrue(future.result(timeout=120).startswith(b"%PDF"))
+
+
+class PdfRendererCacheTest(TestCase):
+    def test_el_template_se_compila_una_sola_vez(self):
+        renderer = PdfRenderer(pdf_renderer.TEMPLATE_FACTURA)
+        client = Client(name="Cliente", email="c@example.com")
+        inv = Invoice(client=client, amount="10.00", pto_vta=1, cbte_tipo=11, cbte_nro=1, cae="1")
+
+        with patch("afip.fe_service.get_template", wraps=get_template) as mock_get_template:
+            for _ in range(3):
+                self.assertTrue(renderer.render({"inv": inv, "client": client}).startswith(b"%PDF"))
+
+        mock_get_template.assert_called_once_with(pdf_renderer.TEMPLATE_FACTURA)
+
+    def test_el_qr_se_arma_en_el_renderer(self):
+        renderer = PdfRenderer(pdf_renderer.TEMPLATE_FACTURA)
+        client = Client(name="Cliente", email="c@example.com")
+        inv = Invoice(client=client, amount="10.00", pto_vta=1, cbte_tipo=11, cbte_nro=1, cae="1")
+        context = {"inv": inv, "client": client, "arca_qr_url": "https://www.arca.gob.ar/fe/qr/?p=abc"}
+
+        with patch("afip.fe_service._make_qr_png_data_uri", return_value=None) as mock_qr:
+            renderer.render(context)
+        mock_qr.assert_called_once_with("https://www.arca.gob.ar/fe/qr/?p=abc")
+
+    def test_benchmark_informa_pdfs_por_segundo(self):
+        out = StringIO()
+        call_command("benchmark_pdf", cantidad=2, stdout=out)
+        self.assertIn("PDFs/s", out.getvalue())
+
+
+class MotorDirectoTest(TestCase):
+    def test_dibuja_el_layout_estandar_con_qr(self):
+        from pypdf import PdfReader
+
+        client = Client(name="Cliente Directo", email="directo@example.com")
+        inv = Invoice(
+            client=client, amount="121.50", pto_vta=3, cbte_tipo=11, cbte_nro=9, cae="71234567890123",
+            cae_due="20251231", metadata={"cuit_emisor": "30716004720", "fecha_emision": "2025-10-17"},
+        )
+
+        pdf = DirectPdfRenderer(pdf_renderer.TEMPLATE_FACTURA).render(contexto_pdf(inv))
+
+        pagina = PdfReader(BytesIO(pdf)).pages[0]
+        texto = pagina.extract_text()
+        for esperado in ("Factura 11 - 3 - 9", "Cliente Directo", "71234567890123", "31/12/2025", "$ 121.50", "ARCA"):
+            self.assertIn(esperado, texto)
+        self.assertGreater(pagina.get_contents().get_data().count(b" 1 re"), 100)  # módulos del QR
+
+    @override_settings(FACTURACION_PDF_MOTORES={pdf_renderer.TEMPLATE_FACTURA: "directo", "otro.html": "directo"})
+    def test_motor_por_template(self):
+        self.assertEqual(motor_pdf(pdf_renderer.TEMPLATE_FACTURA), "directo")
+        self.assertIsInstance(get_renderer(pdf_renderer.TEMPLATE_FACTURA), DirectPdfRenderer)
+        # Sin layout directo se queda con el motor HTML aunque se pida "directo".
+        self.assertEqual(motor_pdf("otro.html"), "html")
+
+        with self.settings(FACTURACION_PDF_MOTORES={}):
+            self.assertIsInstance(get_renderer(pdf_renderer.TEMPLATE_FACTURA), PdfRenderer)
@@ -1,7 +1,16 @@
-from django.test import SimpleTestCase
+import requests
+from django.test import SimpleTestCase, TestCase
 from unittest.mock import patch
 
-from afip.solicitar_cae import NOTE_CBTE_TIPOS, solicitar_cae
+from afip.models import ParametroAfip
+from afip.solicitar_cae import (
+    NOTE_CBTE_TIPOS,
+    consultar_comprobante,
+    invalidar_tipos_comprobante,
+    obtener_tipos_comprobante_validos,
+    solicitar_cae,
+    solicitar_cae_lote,
+)
 
 
 class SolicitarCaeNotasTest(SimpleTestCase):
@@ -23,3 +32,182 @@ class SolicitarCaeNotasTest(SimpleTestCase):
                         doc_tipo=80,
                         doc_nro="20-12345678-9",
                     )
+
+
+FECAE_LOTE_RESPONSE = """<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+  <soap:Body>
+    <FECAESolicitarResponse xmlns="http://ar.gov.afip.dif.FEV1/">
+      <FECAESolicitarResult>
+        <FeCabResp><Cuit>20123456789</Cuit><PtoVta>1</PtoVta><CbteTipo>11</CbteTipo>
+          <CantReg>2</CantReg><Resultado>P</Resultado></FeCabResp>
+        <FeDetResp>
+          <FECAEDetResponse>
+            <CbteDesde>11</CbteDesde><CbteHasta>11</CbteHasta>
+            <Resultado>A</Resultado><CAE>71000000000001</CAE><CAEFchVto>20250110</CAEFchVto>
+          </FECAEDetResponse>
+          <FECAEDetResponse>
+            <CbteDesde>12</CbteDesde><CbteHasta>12</CbteHasta>
+            <Resultado>R</Resultado><CAE></CAE>
+            <Observaciones><Obs><Code>10015</Code><Msg>DocNro invalido</Msg></Obs></Observaciones>
+          </FECAEDetResponse>
+        </FeDetResp>
+      </FECAESolicitarResult>
+    </FECAESolicitarResponse>
+  </soap:Body>
+</soap:Envelope>"""
+
+
+class SolicitarCaeLoteTest(SimpleTestCase):
+    @patch("afip.solicitar_cae.transport.get_session")
+    @patch("afip.solicitar_cae.consultar_ultimo_comprobante", return_value=10)
+    @patch("afip.solicitar_cae._read_wsaa_credentials", return_value=("token", "sign"))
+    def test_un_request_con_numeros_consecutivos_y_resultado_por_detalle(self, _mock_wsaa, mock_ultimo, mock_session):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = FECAE_LOTE_RESPONSE.encode("utf-8")
+        mock_session.return_value.post.return_value = response
+
+        resultados = solicitar_cae_lote(
+            "20123456789",
+            1,
+            [
+                {"importe": "121.00", "doc_nro": "20-12345678-9"},
+                {"importe": "242.00", "doc_nro": "1"},
+            ],
+            cbte_tipo=11,
+            max_por_request=250,
+        )
+
+        mock_ultimo.assert_called_once()
+        mock_session.return_value.post.assert_called_once()
+        body = mock_session.return_value.post.call_args.kwargs["data"].decode("utf-8")
+        self.assertIn("<ar:CantReg>2</ar:CantReg>", body)
+        self.assertIn("<ar:CbteDesde>11</ar:CbteDesde>", body)
+        self.assertIn("<ar:CbteDesde>12</ar:CbteDesde>", body)
+
+        self.assertEqual(resultados[0]["cae"], "71000000000001")
+        self.assertEqual(resultados[0]["cbte_nro"], 11)
+        self.assertEqual(resultados[0]["resultado"], "A")
+        self.assertIsNone(resultados[1]["cae"])
+        self.assertEqual(resultados[1]["resultado"], "R")
+        self.assertEqual(resultados[1]["observations"], ["10015: DocNro invalido"])
+
+    @patch("afip.solicitar_cae.transport.get_session")
+    @patch("afip.solicitar_cae.consultar_ultimo_comprobante")
+    @patch("afip.solicitar_cae._read_wsaa_credentials", return_value=("token", "sign"))
+    def test_numero_desde_numerador_local_no_consulta_ultimo(self, _mock_wsaa, mock_ultimo, mock_session):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = FECAE_LOTE_RESPONSE.encode("utf-8")
+        mock_session.return_value.post.return_value = response
+
+        solicitar_cae_lote(
+            "20123456789",
+            1,
+            [{"importe": "121.00", "doc_nro": "1"}, {"importe": "242.00", "doc_nro": "1"}],
+            cbte_tipo=11,
+            max_por_request=250,
+            cbte_nro_desde=11,
+        )
+
+        mock_ultimo.assert_not_called()
+        body = mock_session.return_value.post.call_args.kwargs["data"].decode("utf-8")
+        self.assertIn("<ar:CbteDesde>11</ar:CbteDesde>", body)
+
+
+@patch("afip.solicitar_cae._read_wsaa_credentials", return_value=("token", "sign"))
+@patch("afip.solicitar_cae.consultar_tipos_comprobante", return_value=[11, 12, 13])
+class TiposComprobanteCacheTest(TestCase):
+    def setUp(self):
+        invalidar_tipos_comprobante()
+        self.addCleanup(invalidar_tipos_comprobante)
+
+    def test_segunda_consulta_no_va_a_afip(self, mock_consulta, _mock_wsaa):
+        self.assertEqual(obtener_tipos_comprobante_validos(cuit="1", pto_vta=3), [11, 12, 13])
+        self.assertEqual(obtener_tipos_comprobante_validos(cuit="1", pto_vta=3), [11, 12, 13])
+
+        mock_consulta.assert_called_once()
+        self.assertEqual(ParametroAfip.objects.get().valor, [11, 12, 13])
+
+    def test_invalidar_fuerza_nueva_consulta(self, mock_consulta, _mock_wsaa):
+        obtener_tipos_comprobante_validos(cuit="1", pto_vta=3)
+        invalidar_tipos_comprobante(cuit="1", pto_vta=3)
+        obtener_tipos_comprobante_validos(cuit="1", pto_vta=3)
+
+        self.assertEqual(mock_consulta.call_count, 2)
+
+    def test_ttl_vencido_y_afip_caido_usa_copia_persistida(self, mock_consulta, _mock_wsaa):
+        obtener_tipos_comprobante_validos(cuit="1", pto_vta=3)
+        mock_consulta.side_effect = requests.ConnectionError("AFIP caído")
+
+        with self.settings(AFIP_TIPOS_CBTE_TTL=0):
+            self.assertEqual(obtener_tipos_comprobante_validos(cuit="1", pto_vta=3), [11, 12, 13])
+
+        self.assertEqual(mock_consulta.call_count, 2)
+
+
+class CredencialesWsaaTest(SimpleTestCase):
+    @patch("afip.wsaa.get_token_sign", return_value=("token", "sign"))
+    def test_pide_el_ticket_del_cuit_que_emite(self, mock_token_sign):
+        from afip.solicitar_cae import _read_wsaa_credentials
+
+        self.assertEqual(_read_wsaa_credentials("20123456789"), ("token", "sign"))
+        mock_token_sign.assert_called_once_with(service="wsfe", cuit="20123456789")
+
+
+FECOMP_CONSULTAR_RESPONSE = """<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+  <soap:Body>
+    <FECompConsultarResponse xmlns="http://ar.gov.afip.dif.FEV1/">
+      <FECompConsultarResult>
+        <ResultGet>
+          <DocNro>20123456789</DocNro>
+          <CbteDesde>42</CbteDesde>
+          <ImpTotal>121</ImpTotal>
+          <Resultado>A</Resultado>
+          <CodAutorizacion>71000000000042</CodAutorizacion>
+          <FchVto>20251231</FchVto>
+        </ResultGet>
+      </FECompConsultarResult>
+    </FECompConsultarResponse>
+  </soap:Body>
+</soap:Envelope>"""
+
+FECOMP_CONSULTAR_INEXISTENTE = """<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+  <soap:Body>
+    <FECompConsultarResponse xmlns="http://ar.gov.afip.dif.FEV1/">
+      <FECompConsultarResult>
+        <Errors><Err><Code>602</Code><Msg>No existen datos en nuestros registros para los parametros ingresados.</Msg></Err></Errors>
+      </FECompConsultarResult>
+    </FECompConsultarResponse>
+  </soap:Body>
+</soap:Envelope>"""
+
+
+@patch("afip.solicitar_cae.transport.get_session")
+@patch("afip.solicitar_cae._read_wsaa_credentials", return_value=("token", "sign"))
+class ConsultarComprobanteTest(SimpleTestCase):
+    def _responder(self, mock_session, xml):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = xml.encode("utf-8")
+        mock_session.return_value.post.return_value = response
+
+    def test_comprobante_autorizado(self, _mock_wsaa, mock_session):
+        self._responder(mock_session, FECOMP_CONSULTAR_RESPONSE)
+
+        result = consultar_comprobante("20123456789", 1, 11, 42)
+
+        body = mock_session.return_value.post.call_args.kwargs["data"].decode("utf-8")
+        self.assertIn("<ar:CbteNro>42</ar:CbteNro>", body)
+        self.assertEqual(result["cae"], "71000000000042")
+        self.assertEqual(result["cbte_nro"], 42)
+        self.assertEqual(result["doc_nro"], "20123456789")
+        self.assertEqual(str(result["importe"]), "121.00")
+
+    def test_comprobante_inexistente_devuelve_none(self, _mock_wsaa, mock_session):
+        self._responder(mock_session, FECOMP_CONSULTAR_INEXISTENTE)
+
+        self.assertIsNone(consultar_comprobante("20123456789", 1, 11, 43))
@@ -0,0 +1,60 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from afip import transport
+
+
+class _SoapHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b"<ok/>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TransportTest(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _SoapHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/ws"
+        transport.reset_transport()
+        self.addCleanup(transport.reset_transport)
+
+    def test_requests_sucesivos_reutilizan_la_conexion(self):
+        for _ in range(3):
+            response = transport.post(self.url, data=b"<x/>", headers={"Content-Type": "text/xml"})
+            self.assertEqual(response.content, b"<ok/>")
+
+        stats = transport.get_transport_stats()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["new_connections"], 1)
+        self.assertEqual(stats["reused_connections"], 2)
+
+    def test_hilos_comparten_el_pool(self):
+        sessions = []
+
+        def worker():
+            sessions.append(transport.get_session())
+            transport.post(self.url, data=b"<x/>")
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len({id(s) for s in sessions}), 4)
+        self.assertEqual(len({id(s.get_adapter(self.url)) for s in sessions}), 1)
+        self.assertEqual(transport.get_transport_stats()["requests"], 4)
@@ -0,0 +1,239 @@
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from afip import wsaa
+from afip.credential_store import CredentialStore, DatabaseCredentialStore, FileCredentialStore
+from afip.models import AfipTicket
+
+
+def _ta_xml(expiration: datetime, token: str = "TOKEN", sign: str = "SIGN") -> bytes:
+    return (
+        "<loginTicketResponse><header>"
+        f"<expirationTime>{expiration.isoformat()}</expirationTime>"
+        "</header><credentials>"
+        f"<token>{token}</token><sign>{sign}</sign>"
+        "</credentials></loginTicketResponse>"
+    ).encode("utf-8")
+
+
+def _en(**kwargs) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(**kwargs)
+
+
+@override_settings(AFIP_CUIT_EMISOR="1", AFIP_CREDENTIAL_STORE="file")
+class TicketCacheTest(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.secrets = Path(tmp.name)
+        patcher = patch("afip.wsaa.SECRETS", self.secrets)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        wsaa.clear_ticket_cache()
+        self.addCleanup(wsaa.clear_ticket_cache)
+
+    def _guardar_ta(self, service: str, ta_xml: bytes):
+        (self.secrets / f"ta_1_{service}.xml").write_bytes(ta_xml)
+
+    def test_ticket_vigente_se_lee_del_store_una_sola_vez(self):
+        self._guardar_ta("wsfe", _ta_xml(_en(hours=6)))
+
+        with patch.object(FileCredentialStore, "load", autospec=True, side_effect=FileCredentialStore.load) as mock_load:
+            for _ in range(5):
+                self.assertEqual(wsaa.get_token_sign("wsfe"), ("TOKEN", "SIGN"))
+
+        mock_load.assert_called_once()
+        stats = wsaa.get_ticket_cache_stats()
+        self.assertEqual(stats["hits"], 4)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["refreshes"], 0)
+
+    def test_ticket_vencido_se_renueva(self):
+        self._guardar_ta("wscpe", _ta_xml(_en(minutes=-1), token="OLD"))
+
+        with patch("afip.wsaa._renovar", return_value=_ta_xml(_en(hours=12), "NEW", "NEWSIGN")) as mock_renovar:
+            self.assertEqual(wsaa.get_token_sign("wscpe"), ("NEW", "NEWSIGN"))
+            self.assertEqual(wsaa.get_token_sign("wscpe"), ("NEW", "NEWSIGN"))
+
+        mock_renovar.assert_called_once()
+        self.assertEqual(wsaa.get_ticket_cache_stats()["refreshes"], 1)
+        self.assertIn(b"NEW", (self.secrets / "ta_1_wscpe.xml").read_bytes())
+
+    def test_ticket_proximo_a_vencer_no_se_sirve_de_memoria(self):
+        self._guardar_ta("wsfe", _ta_xml(datetime.now(timezone.utc) + wsaa.MARGEN_VENCIMIENTO / 2))
+
+        with patch("afip.wsaa._renovar", return_value=_ta_xml(_en(hours=12), "NEW", "NEWSIGN")):
+            self.assertEqual(wsaa.get_token_sign("wsfe"), ("NEW", "NEWSIGN"))
+
+    def test_wsfe_y_wscpe_tienen_tickets_independientes(self):
+        self._guardar_ta("wsfe", _ta_xml(_en(hours=6), token="FE"))
+
+        with patch("afip.wsaa._renovar", return_value=_ta_xml(_en(hours=12), "CPE", "SIGN")) as mock_renovar:
+            self.assertEqual(wsaa.get_token_sign("wscpe"), ("CPE", "SIGN"))
+            self.assertEqual(wsaa.get_token_sign("wsfe"), ("FE", "SIGN"))
+
+        mock_renovar.assert_called_once()
+        self.assertIn(b"FE", (self.secrets / "ta_1_wsfe.xml").read_bytes())
+
+    def test_renovacion_espera_al_proceso_que_tiene_el_lock(self):
+        self._guardar_ta("wsfe", _ta_xml(_en(minutes=-1), token="OLD"))
+        real_lock = FileCredentialStore.lock
+
+        @contextmanager
+        def lock_de_otro_proceso(store, cuit, service):
+            with real_lock(store, cuit, service):
+                # Mientras esperábamos el lock, otro worker renovó el TA.
+                self._guardar_ta("wsfe", _ta_xml(_en(hours=12), token="OTRO"))
+                yield
+
+        with patch.object(FileCredentialStore, "lock", lock_de_otro_proceso), patch("afip.wsaa._renovar") as mock_renovar:
+            self.assertEqual(wsaa.get_token_sign("wsfe"), ("OTRO", "SIGN"))
+
+        mock_renovar.assert_not_called()
+        self.assertEqual(wsaa.get_ticket_cache_stats()["refreshes"], 0)
+
+    def test_renovador_renueva_dentro_del_margen_y_registra_metricas(self):
+        self._guardar_ta("wsfe", _ta_xml(_en(minutes=10), token="OLD"))
+
+        with patch("afip.wsaa._renovar", return_value=_ta_xml(_en(hours=12), "NEW", "NEWSIGN")) as mock_renovar:
+            metrics = wsaa.renovar_tickets(("wsfe",), margen=timedelta(minutes=30))
+
+        mock_renovar.assert_called_once()
+        self.assertEqual(metrics["wsfe:1"]["renewals"], 1)
+        self.assertIsNotNone(metrics["wsfe:1"]["last_renewal_seconds"])
+        self.assertGreater(metrics["wsfe:1"]["seconds_to_expiry"], 11 * 3600)
+        # El request path ya encuentra el ticket nuevo en memoria.
+        self.assertEqual(wsaa.get_token_sign("wsfe"), ("NEW", "NEWSIGN"))
+
+    def test_renovador_registra_error_y_conserva_ticket_vigente(self):
+        self._guardar_ta("wsfe", _ta_xml(_en(minutes=10), token="OLD"))
+        wsaa.get_token_sign("wsfe")
+
+        with patch("afip.wsaa._renovar", side_effect=RuntimeError("alreadyAuthenticated")):
+            metrics = wsaa.renovar_tickets(("wsfe",), margen=timedelta(minutes=30))
+
+        self.assertEqual(metrics["wsfe:1"]["errors"], 1)
+        self.assertEqual(metrics["wsfe:1"]["last_error"], "alreadyAuthenticated")
+        self.assertEqual(wsaa.get_token_sign("wsfe"), ("OLD", "SIGN"))
+
+
+class DatabaseCredentialStoreTest(TestCase):
+    def test_guarda_y_lee_el_ticket_por_cuit_y_servicio(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DatabaseCredentialStore(Path(tmp))
+            self.assertIsNone(store.load("1", "wsfe"))
+
+            with store.lock("1", "wsfe"):
+                store.save("1", "wsfe", _ta_xml(_en(hours=12), token="DB"))
+
+            ticket = store.load("1", "wsfe")
+            self.assertEqual(ticket.token, "DB")
+            self.assertTrue(ticket.vigente())
+            self.assertIsNone(store.load("1", "wscpe"))
+            self.assertEqual(AfipTicket.objects.count(), 1)
+
+
+class CredentialStoreInterfazTest(SimpleTestCase):
+    def test_backend_incompleto_falla_al_instanciarse(self):
+        class SinLock(CredentialStore):
+            def load(self, cuit, service):
+                return None
+
+            def save(self, cuit, service, ta_xml):
+                raise AssertionError
+
+        with self.assertRaisesMessage(TypeError, "lock"):
+            SinLock()
+
+
+class ArranqueRenovadorTest(SimpleTestCase):
+    @override_settings(AFIP_WSAA_RENOVADOR_AUTOMATICO=True)
+    def test_cargar_las_apps_no_arranca_el_renovador(self):
+        from django.apps import apps
+
+        with patch("afip.wsaa.iniciar_renovador") as mock_iniciar:
+            apps.get_app_config("afip").ready()
+        mock_iniciar.assert_not_called()
+
+    def test_el_servidor_lo_arranca_solo_si_esta_habilitado(self):
+        from afip.arranque import iniciar_servidor
+
+        with patch("afip.wsaa.iniciar_renovador") as mock_iniciar:
+            with override_settings(AFIP_WSAA_RENOVADOR_AUTOMATICO=False):
+                iniciar_servidor()
+            mock_iniciar.assert_not_called()
+            with override_settings(AFIP_WSAA_RENOVADOR_AUTOMATICO=True):
+                iniciar_servidor()
+        mock_iniciar.assert_called_once_with()
+
+
+class ArranquePrecargaTest(SimpleTestCase):
+    @override_settings(AFIP_PRECARGAR_PTO_VTAS=[3, 4], AFIP_CUIT_EMISOR="1")
+    def test_solo_el_servidor_precarga_los_tipos_de_comprobante(self):
+        from django.apps import apps
+
+        from afip.arranque import iniciar_precarga_tipos_comprobante
+
+        with patch("afip.solicitar_cae.precargar_tipos_comprobante") as mock_precargar:
+            apps.get_app_config("afip").ready()
+            mock_precargar.assert_not_called()
+
+            iniciar_precarga_tipos_comprobante().join(timeout=5)
+        mock_precargar.assert_called_once_with("1", [3, 4])
+
+    @override_settings(AFIP_PRECARGAR_PTO_VTAS=[])
+    def test_sin_pto_vtas_no_arranca_el_hilo(self):
+        from afip.arranque import iniciar_precarga_tipos_comprobante
+
+        self.assertIsNone(iniciar_precarga_tipos_comprobante())
+
+
+@override_settings(AFIP_CUIT_EMISOR="1")
+class FileCredentialStoreLegacyTest(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.secrets = Path(tmp.name)
+        self.store = FileCredentialStore(self.secrets)
+
+    def _tra(self, service: str):
+        (self.secrets / "login_ticket_request.xml").write_text(
+            f"<loginTicketRequest><header/><service>{service}</service></loginTicketRequest>"
+        )
+
+    def test_lee_ta_xml_del_servicio_del_ultimo_tra_y_lo_migra(self):
+        self._tra("wscpe")
+        (self.secrets / "ta.xml").write_bytes(_ta_xml(_en(hours=6), token="VIEJO"))
+
+        self.assertEqual(self.store.load("1", "wscpe").token, "VIEJO")
+        self.assertTrue(self.store.ta_path("1", "wscpe").exists())
+        # ta.xml era del último login (wscpe): no se usa para wsfe ni para otro CUIT.
+        self.assertIsNone(self.store.load("1", "wsfe"))
+        self.assertIsNone(self.store.load("2", "wscpe"))
+
+    def test_ta_xml_sin_tra_es_de_wsfe_y_ta_a13_del_padron(self):
+        (self.secrets / "ta.xml").write_bytes(_ta_xml(_en(hours=6), token="FE"))
+        (self.secrets / "ta_a13.xml").write_bytes(_ta_xml(_en(hours=6), token="A13"))
+
+        self.assertEqual(self.store.load("1", "wsfe").token, "FE")
+        self.assertEqual(self.store.load("1", "ws_sr_padron_a13").token, "A13")
+
+    def test_el_archivo_nuevo_tiene_prioridad(self):
+        (self.secrets / "ta.xml").write_bytes(_ta_xml(_en(hours=6), token="VIEJO"))
+        self.store.save("1", "wsfe", _ta_xml(_en(hours=12), token="NUEVO"))
+
+        self.assertEqual(self.store.load("1", "wsfe").token, "NUEVO")
+
+    def test_get_token_sign_usa_el_ta_vigente_sin_pedir_otro(self):
+        (self.secrets / "ta.xml").write_bytes(_ta_xml(_en(hours=6), token="VIEJO"))
+        wsaa.clear_ticket_cache()
+        self.addCleanup(wsaa.clear_ticket_cache)
+
+        with patch("afip.wsaa.SECRETS", self.secrets), patch("afip.wsaa._renovar") as mock_renovar:
+            self.assertEqual(wsaa.get_token_sign("wsfe"), ("VIEJO", "SIGN"))
+        mock_renovar.assert_not_called()
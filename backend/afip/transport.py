@@ -0,0 +1,128 @@
+"""
+Transporte HTTP compartido para todo el tráfico SOAP con AFIP (wsaa, wsfe, wscpe, padrón).
+
+Un único HTTPAdapter por proceso mantiene pools keep-alive por host, así que cada
+llamada reutiliza la conexión TLS en lugar de pagar un handshake nuevo (SECLEVEL=1).
+Cada hilo usa su propia requests.Session (cookies/headers no se comparten entre hilos),
+pero todas montan el mismo adapter y por lo tanto los mismos pools.
+
+Tamaños configurables con settings.AFIP_HTTP_POOL_CONNECTIONS (hosts cacheados)
+y settings.AFIP_HTTP_POOL_MAXSIZE (conexiones por host).
+
+requests/urllib3 se importan recién con la primera sesión: importar este módulo
+(y los servicios que lo usan) no los carga en el arranque del worker.
+"""
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+
+if TYPE_CHECKING:
+    import requests
+
+_LOCK = threading.Lock()
+_STATS = {"requests": 0, "new_connections": 0}
+_ADAPTER = None
+_LOCAL = threading.local()
+
+
+def _contar_conexion_nueva():
+    with _LOCK:
+        _STATS["new_connections"] += 1
+
+
+# ======================
+# Adaptador SSL
+# ======================
+@lru_cache(maxsize=None)
+def _ssl_adapter_class():
+    import ssl
+
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class _CountingHTTPConnectionPool(HTTPConnectionPool):
+        def _new_conn(self):
+            _contar_conexion_nueva()
+            return super()._new_conn()
+
+    class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        def _new_conn(self):
+            _contar_conexion_nueva()
+            return super()._new_conn()
+
+    class SSLAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            ctx = ssl.create_default_context()
+            ctx.set_ciphers("DEFAULT:@SECLEVEL=1")  # baja seguridad para AFIP
+            kwargs["ssl_context"] = ctx
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": _CountingHTTPConnectionPool,
+                "https": _CountingHTTPSConnectionPool,
+            }
+
+        def send(self, request, **kwargs):
+            with _LOCK:
+                _STATS["requests"] += 1
+            return super().send(request, **kwargs)
+
+    return SSLAdapter
+
+
+def __getattr__(name):
+    # transport.SSLAdapter sigue disponible para quien lo importaba directamente.
+    if name == "SSLAdapter":
+        return _ssl_adapter_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _get_adapter():
+    global _ADAPTER
+    with _LOCK:
+        if _ADAPTER is None:
+            _ADAPTER = _ssl_adapter_class()(
+                pool_connections=int(getattr(settings, "AFIP_HTTP_POOL_CONNECTIONS", 10)),
+                pool_maxsize=int(getattr(settings, "AFIP_HTTP_POOL_MAXSIZE", 10)),
+            )
+        return _ADAPTER
+
+
+def get_session() -> "requests.Session":
+    """Session del hilo actual, montada sobre el adapter (y los pools) del proceso."""
+    session = getattr(_LOCAL, "session", None)
+    if session is None:
+        import requests
+
+        adapter = _get_adapter()
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _LOCAL.session = session
+    return session
+
+
+def post(url: str, *, data=None, headers=None, timeout=60) -> "requests.Response":
+    return get_session().post(url, data=data, headers=headers, timeout=timeout)
+
+
+def get_transport_stats() -> dict:
+    """requests enviados, conexiones abiertas y cuántos requests reutilizaron una conexión."""
+    with _LOCK:
+        return {
+            **_STATS,
+            "reused_connections": max(_STATS["requests"] - _STATS["new_connections"], 0),
+        }
+
+
+def reset_transport() -> None:
+    """Cierra los pools y reinicia contadores (tests / cambio de settings)."""
+    global _ADAPTER
+    with _LOCK:
+        if _ADAPTER is not None:
+            _ADAPTER.close()
+        _ADAPTER = None
+        for k in _STATS:
+            _STATS[k] = 0
+    _LOCAL.__dict__.clear()
@@ -1,11 +1,34 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
 from pathlib import Path
-from datetime import datetime
-from lxml import etree
-from .obtener_token import AfipPaths, crear_TRA, firmar_TRA, obtener_token_sign
+
+from django.conf import settings
+from .credential_store import Ticket, get_credential_store
+from .obtener_token import AfipPaths, solicitar_TA
+
+LOGGER = logging.getLogger(__name__)
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 SECRETS = BASE_DIR / "secrets"
 
+# Margen antes del vencimiento a partir del cual el ticket en memoria deja de usarse
+# y se vuelve a mirar el store (o se renueva contra WSAA).
+MARGEN_VENCIMIENTO = timedelta(seconds=60)
+
+
+# Cache de proceso: (service, cuit) -> Ticket
+_CACHE: dict[tuple[str, str], Ticket] = {}
+_CACHE_LOCK = threading.Lock()
+_RENEW_LOCKS: dict[tuple[str, str], threading.Lock] = {}
+_STATS = {"hits": 0, "misses": 0, "refreshes": 0}
+# Métricas del renovador en segundo plano: "service:cuit" -> dict
+_RENEWAL_METRICS: dict[str, dict] = {}
+
+SERVICIOS_DEFAULT = ("wsfe", "wscpe", "ws_sr_padron_a13")
+
+
 def _paths():
     return AfipPaths(
         certificate=SECRETS / "afip_certificado.pem",
@@ -13,35 +36,167 @@ def _paths():
         credentials_dir=SECRETS,
     )
 
-def _ta_valid(ta_path: Path) -> bool:
-    if not ta_path.exists():
-        return False
-    try:
-        root = etree.fromstring(ta_path.read_bytes())
-        exp = root.findtext(".//expirationTime")
-        if not exp:
-            return False
-        exp_dt = datetime.fromisoformat(exp.replace("Z",""))
-        return exp_dt > datetime.utcnow()
-    except Exception:
-        return False
-
-def get_token_sign(service="wsfe"):
-    paths = _paths()
-    if service in ("wsfe", "wscpe"):
-        ta = paths.ta
-        token_file, sign_file = paths.token, paths.sign
-    else:
-        ta = paths.ta_a13
-        token_file, sign_file = paths.token_a13, paths.sign_a13
-
-    if _ta_valid(ta):
-        return token_file.read_text().strip(), sign_file.read_text().strip()
-
-    if service in ("wsfe", "wscpe"):
-        crear_TRA(paths, service=service)
-        firmar_TRA(paths)
-        return obtener_token_sign(paths)
-    else:
-        from .obtener_token import obtener_token_sign_a13
-        return obtener_token_sign_a13(paths, homologacion=False)
+
+def _cuit_emisor() -> str:
+    return str(getattr(settings, "AFIP_CUIT_EMISOR", "30716004720"))
+
+
+def _renovar(paths: AfipPaths, service: str) -> bytes:
+    """Pide un TA nuevo a WSAA para el servicio; el store se encarga de persistirlo."""
+    return solicitar_TA(paths, service)
+
+
+def _obtener_ticket(service: str, cuit: str, margen: timedelta = MARGEN_VENCIMIENTO) -> Ticket:
+    key = (service, cuit)
+    with _CACHE_LOCK:
+        ticket = _CACHE.get(key)
+        if ticket is not None and ticket.vigente(margen):
+            _STATS["hits"] += 1
+            return ticket
+        _STATS["misses"] += 1
+        renew_lock = _RENEW_LOCKS.setdefault(key, threading.Lock())
+
+    # Un solo hilo por (service, cuit) va al store / WSAA; el resto espera y reutiliza.
+    with renew_lock:
+        with _CACHE_LOCK:
+            ticket = _CACHE.get(key)
+        if ticket is not None and ticket.vigente(margen):
+            return ticket
+
+        store = get_credential_store(SECRETS)
+        ticket = store.load(cuit, service)
+        if ticket is None or not ticket.vigente(margen):
+            # Single-flight entre workers/nodos: uno renueva, los demás esperan el lock
+            # y leen el TA que dejó guardado (WSAA rechaza logins duplicados).
+            with store.lock(cuit, service):
+                ticket = store.load(cuit, service)
+                if ticket is None or not ticket.vigente(margen):
+                    ticket = store.save(cuit, service, _renovar(_paths(), service))
+                    with _CACHE_LOCK:
+                        _STATS["refreshes"] += 1
+
+        with _CACHE_LOCK:
+            _CACHE[key] = ticket
+        return ticket
+
+
+def get_token_sign(service="wsfe", cuit: str | None = None):
+    ticket = _obtener_ticket(service, str(cuit or _cuit_emisor()))
+    return ticket.token, ticket.sign
+
+
+def get_ticket_cache_stats() -> dict:
+    """Contadores del cache de tickets (hits/misses/refreshes) y vencimientos en memoria."""
+    with _CACHE_LOCK:
+        return {
+            **_STATS,
+            "tickets": {
+                f"{service}:{cuit}": ticket.expiration.isoformat()
+                for (service, cuit), ticket in _CACHE.items()
+            },
+        }
+
+
+def clear_ticket_cache() -> None:
+    with _CACHE_LOCK:
+        _CACHE.clear()
+        _RENEWAL_METRICS.clear()
+        for k in _STATS:
+            _STATS[k] = 0
+
+
+def _margen_renovacion() -> timedelta:
+    return timedelta(seconds=int(getattr(settings, "AFIP_WSAA_MARGEN_RENOVACION", 1800)))
+
+
+def _servicios_en_uso() -> tuple[str, ...]:
+    return tuple(getattr(settings, "AFIP_WSAA_SERVICIOS", SERVICIOS_DEFAULT))
+
+
+def renovar_tickets(
+    servicios: tuple[str, ...] | None = None,
+    margen: timedelta | None = None,
+    cuit: str | None = None,
+) -> dict[str, dict]:
+    """
+    Renueva los tickets que vencen dentro de `margen` y actualiza las métricas
+    (segundos hasta el vencimiento y duración de la última renovación).
+    Un error en un servicio no corta el resto: se registra y se reintenta en la próxima pasada.
+    """
+    margen = margen if margen is not None else _margen_renovacion()
+    cuit = str(cuit or _cuit_emisor())
+    resultado = {}
+    for service in servicios or _servicios_en_uso():
+        key = f"{service}:{cuit}"
+        with _CACHE_LOCK:
+            metrics = _RENEWAL_METRICS.setdefault(
+                key,
+                {"renewals": 0, "errors": 0, "last_renewal_seconds": None, "last_error": None},
+            )
+            refreshes_before = _STATS["refreshes"]
+
+        started = time.monotonic()
+        try:
+            ticket = _obtener_ticket(service, cuit, margen=margen)
+        except Exception as exc:
+            LOGGER.warning("No se pudo renovar el ticket WSAA de %s: %s", service, exc)
+            with _CACHE_LOCK:
+                metrics["errors"] += 1
+                metrics["last_error"] = str(exc)
+                ticket = _CACHE.get((service, cuit))
+        else:
+            elapsed = time.monotonic() - started
+            with _CACHE_LOCK:
+                if _STATS["refreshes"] > refreshes_before:
+                    metrics["renewals"] += 1
+                    metrics["last_renewal_seconds"] = round(elapsed, 3)
+                metrics["last_error"] = None
+
+        with _CACHE_LOCK:
+            if ticket is not None:
+                metrics["expiration"] = ticket.expiration.isoformat()
+                metrics["seconds_to_expiry"] = int(
+                    (ticket.expiration - datetime.now(dt_timezone.utc)).total_seconds()
+                )
+            resultado[key] = dict(metrics)
+    return resultado
+
+
+def get_renewal_metrics() -> dict[str, dict]:
+    with _CACHE_LOCK:
+        return {key: dict(metrics) for key, metrics in _RENEWAL_METRICS.items()}
+
+
+class TicketRenewer(threading.Thread):
+    """Hilo daemon que mantiene los tickets renovados antes de que venzan."""
+
+    def __init__(self, intervalo: float | None = None, servicios=None, margen: timedelta | None = None):
+        super().__init__(name="wsaa-ticket-renewer", daemon=True)
+        self.intervalo = intervalo or float(getattr(settings, "AFIP_WSAA_INTERVALO_RENOVADOR", 60))
+        self.servicios = tuple(servicios) if servicios else None
+        self.margen = margen
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                renovar_tickets(self.servicios, self.margen)
+            except Exception:  # pragma: no cover - defensivo, el hilo no debe morir
+                LOGGER.exception("Error inesperado en el renovador de tickets WSAA")
+            self._stop_event.wait(self.intervalo)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_RENEWER: TicketRenewer | None = None
+
+
+def iniciar_renovador() -> TicketRenewer:
+    """Arranca (una sola vez por proceso) el renovador en segundo plano."""
+    global _RENEWER
+    with _CACHE_LOCK:
+        if _RENEWER is None or not _RENEWER.is_alive():
+            _RENEWER = TicketRenewer()
+            _RENEWER.start()
+        return _RENEWER
@@ -0,0 +1,187 @@
+"""
+Cola de emisión de facturas respaldada en la base (tabla EmisionJob).
+
+El endpoint facturas/emitir encola y responde 202; uno o más workers
+(manage.py procesar_emisiones) toman trabajos con un UPDATE condicional sobre el estado
+(también en SQLite, que no tiene SKIP LOCKED), así que cada job lo procesa un solo worker
+y el throughput escala agregando procesos.
+Errores de validación (ValueError) terminan el job; errores de AFIP / red se reintentan
+con backoff hasta FACTURACION_EMISION_MAX_INTENTOS. Si el FECAESolicitar ya había salido
+(EmisionIncierta) o el worker murió a mitad de camino, antes de volver a emitir se consulta
+a AFIP (FECompConsultar) y, si el comprobante quedó autorizado, se adopta ese CAE.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from billing.models import Client, EmisionJob, Invoice
+from billing.serializers import EmitirFacturaSerializer
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _max_intentos() -> int:
+    return int(getattr(settings, "FACTURACION_EMISION_MAX_INTENTOS", 3))
+
+
+def _datos_emision(data: dict) -> dict:
+    """kwargs de emitir_y_guardar_factura a partir de los datos validados de EmitirFacturaSerializer."""
+    return dict(
+        client=Client.objects.get(pk=data["client_id"]),
+        amount=data["amount"],
+        pto_vta=data["pto_vta"],
+        cbte_tipo=data["cbte_tipo"],
+        doc_tipo=data["doc_tipo"],
+        doc_nro=data["doc_nro"],
+        condicion_iva_receptor_id=data.get("condicion_iva_receptor_id", 5),
+        iva_rate=data.get("iva_rate"),
+        cbtes_asoc=data.get("cbtes_asoc"),
+        periodo_asoc=data.get("periodo_asoc"),
+    )
+
+
+def emitir_desde_datos(data: dict) -> Invoice:
+    """Emite con los datos validados de EmitirFacturaSerializer (camino sync y worker)."""
+    from afip.fe_service import emitir_y_guardar_factura
+
+    return emitir_y_guardar_factura(**_datos_emision(data))
+
+
+def error_de_validacion(exc: ValueError) -> dict:
+    """Errores de emisión con la forma de los del serializer: el campo si se sabe cuál es."""
+    from afip.fe_service import TipoNoHabilitado
+
+    campo = "cbte_tipo" if isinstance(exc, TipoNoHabilitado) else "non_field_errors"
+    return {campo: [str(exc)]}
+
+
+def encolar_emision(serializer: EmitirFacturaSerializer) -> EmisionJob:
+    """Guarda el pedido ya validado (serializer.data es JSON) como job pendiente."""
+    return EmisionJob.objects.create(payload=serializer.data)
+
+
+# Candidatos leídos por vuelta en tomar_siguiente.
+_CANDIDATOS = 20
+
+
+def _candidatos(despues_de: int) -> list[int]:
+    return list(
+        EmisionJob.objects.filter(
+            estado=EmisionJob.PENDIENTE, disponible_desde__lte=timezone.now(), id__gt=despues_de
+        )
+        .order_by("id")
+        .values_list("id", flat=True)[:_CANDIDATOS]
+    )
+
+
+def tomar_siguiente() -> EmisionJob | None:
+    """
+    Reserva el próximo job disponible. Lo toma quien cambia el estado de pendiente a
+    procesando; si otro worker ganó (0 filas actualizadas) se prueba con el siguiente.
+    """
+    ultimo = 0
+    while ids := _candidatos(ultimo):
+        for pk in ids:
+            tomados = EmisionJob.objects.filter(pk=pk, estado=EmisionJob.PENDIENTE).update(
+                estado=EmisionJob.PROCESANDO, intentos=F("intentos") + 1, iniciado=timezone.now()
+            )
+            if tomados:
+                return EmisionJob.objects.get(pk=pk)
+        ultimo = ids[-1]
+    return None
+
+
+def procesar_job(job: EmisionJob) -> EmisionJob:
+    from afip.fe_service import EmisionIncierta
+
+    s = EmitirFacturaSerializer(data=job.payload)
+    if not s.is_valid():
+        return _terminar(job, EmisionJob.ERROR, error=s.errors)
+    try:
+        if job.verificar_desde is not None:
+            inv = _recuperar_autorizada(job, s.validated_data)
+            if inv is not None:
+                return _terminar(job, EmisionJob.COMPLETADO, invoice=inv)
+            if job.intentos > _max_intentos():
+                # El último intento ya se había agotado; AFIP confirmó que no quedó autorizado.
+                return _terminar(job, EmisionJob.ERROR, error=job.error)
+        inv = emitir_desde_datos(s.validated_data)
+    except Client.DoesNotExist:
+        return _terminar(job, EmisionJob.ERROR, error={"client_id": ["El cliente no existe."]})
+    except ValueError as exc:
+        return _terminar(job, EmisionJob.ERROR, error=error_de_validacion(exc))
+    except Exception as exc:
+        LOGGER.warning("Falló la emisión del job %s (intento %s): %s", job.pk, job.intentos, exc)
+        incierta = isinstance(exc, EmisionIncierta)
+        # Si no se sabe si AFIP autorizó no se termina en error: el próximo paso lo verifica.
+        if job.intentos >= _max_intentos() and not incierta and job.verificar_desde is None:
+            return _terminar(job, EmisionJob.ERROR, error={"detail": str(exc)})
+        if incierta:
+            job.cbte_nro = exc.cbte_nro
+            job.verificar_desde = job.iniciado
+        job.estado = EmisionJob.PENDIENTE
+        job.error = {"detail": str(exc)}
+        job.disponible_desde = timezone.now() + timedelta(seconds=min(30 * 2 ** (job.intentos - 1), 3600))
+        job.save(update_fields=["estado", "error", "cbte_nro", "verificar_desde", "disponible_desde"])
+        return job
+
+    return _terminar(job, EmisionJob.COMPLETADO, invoice=inv)
+
+
+def _recuperar_autorizada(job: EmisionJob, data: dict) -> Invoice | None:
+    """
+    Consulta a AFIP si el intento anterior llegó a autorizarse. Si AFIP no responde la
+    excepción sube y el job se reprograma sin emitir; si no lo encuentra se limpia la
+    marca y se puede emitir de nuevo.
+    """
+    from afip.fe_service import recuperar_factura_autorizada
+
+    inv = recuperar_factura_autorizada(cbte_nro=job.cbte_nro, desde=job.verificar_desde, **_datos_emision(data))
+    if inv is None:
+        job.cbte_nro = None
+        job.verificar_desde = None
+        job.save(update_fields=["cbte_nro", "verificar_desde"])
+    else:
+        LOGGER.info("Job %s: AFIP ya había autorizado el comprobante %s", job.pk, inv.cbte_nro)
+    return inv
+
+
+def _terminar(job: EmisionJob, estado: str, *, error=None, invoice=None) -> EmisionJob:
+    job.estado = estado
+    job.error = error
+    job.invoice = invoice
+    job.finalizado = timezone.now()
+    job.save(update_fields=["estado", "error", "invoice", "finalizado"])
+    return job
+
+
+def procesar_pendientes(limite: int | None = None) -> int:
+    """Procesa jobs hasta vaciar la cola (o `limite`). Devuelve cuántos procesó."""
+    procesados = 0
+    while limite is None or procesados < limite:
+        job = tomar_siguiente()
+        if job is None:
+            break
+        procesar_job(job)
+        procesados += 1
+    return procesados
+
+
+def recuperar_colgados(timeout: timedelta) -> int:
+    """
+    Devuelve a la cola los jobs 'procesando' de un worker que murió hace más de `timeout`.
+    El timeout tiene que superar con holgura lo que tarda una emisión (varios timeouts de AFIP).
+    El worker pudo morir con el FECAESolicitar ya enviado, así que quedan marcados para
+    verificar con AFIP antes de emitir (ver procesar_job).
+    """
+    return EmisionJob.objects.filter(
+        estado=EmisionJob.PROCESANDO, iniciado__lt=timezone.now() - timeout
+    ).update(
+        estado=EmisionJob.PENDIENTE,
+        disponible_desde=timezone.now(),
+        verificar_desde=Coalesce(F("verificar_desde"), F("iniciado")),
+    )
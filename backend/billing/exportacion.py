@@ -0,0 +1,114 @@
+"""
+Exportación de PDFs de facturas en un ZIP armado sobre la marcha.
+
+El ZIP nunca está entero en memoria: zipfile escribe sobre un buffer sin seek (usa
+data descriptors en lugar de volver atrás a completar tamaños y CRC) y cada bloque
+escrito se entrega a StreamingHttpResponse y se descarta. Los PDF se copian en
+bloques de BLOQUE bytes y las facturas se leen con .iterator(), así que la memoria
+no depende de cuántas facturas entren en el export.
+
+Los PDF que faltan se generan antes de empezar a responder (preparar_pdfs), en
+paralelo en el pool de render; mientras se escribe el ZIP no se renderiza nada.
+"""
+import logging
+import zipfile
+from concurrent.futures import wait
+
+from django.db.models import Q
+
+from billing.models import Invoice
+
+LOGGER = logging.getLogger(__name__)
+
+BLOQUE = 64 * 1024
+
+
+class _BufferZip:
+    """Destino de zipfile: acumula lo escrito hasta que el generador lo entrega. Sin seek()."""
+
+    def __init__(self):
+        self._partes: list[bytes] = []
+        self._posicion = 0
+
+    def write(self, data) -> int:
+        self._partes.append(bytes(data))
+        self._posicion += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._posicion
+
+    def flush(self) -> None:
+        pass
+
+    def vaciar(self) -> bytes:
+        data = b"".join(self._partes)
+        self._partes.clear()
+        return data
+
+
+def filtrar_facturas(*, desde=None, hasta=None, client=None):
+    qs = Invoice.objects.select_related("client").filter(cae__isnull=False).order_by("created_at", "id")
+    if desde:
+        qs = qs.filter(created_at__date__gte=desde)
+    if hasta:
+        qs = qs.filter(created_at__date__lte=hasta)
+    if client:
+        qs = qs.filter(client_id=client)
+    return qs
+
+
+def preparar_pdfs(facturas) -> dict[int, str]:
+    """
+    Dispara juntos los renders de las facturas sin PDF y espera hasta FACTURACION_PDF_TIMEOUT.
+    Devuelve {id: error} de las que fallaron o no terminaron a tiempo.
+    """
+    from afip.pdf_renderer import _timeout, renderizar
+
+    faltantes = facturas.filter(~Q(pdf_status=Invoice.PDF_LISTO) | Q(pdf="")).values_list("id", flat=True)
+    renders = {renderizar(pk): pk for pk in faltantes.iterator()}
+    if not renders:
+        return {}
+    listos, sin_terminar = wait(renders, timeout=_timeout())
+    errores = {renders[f]: "el PDF no se terminó de generar a tiempo" for f in sin_terminar}
+    for render in listos:
+        if render.exception() is not None:
+            errores[renders[render]] = str(render.exception())
+    return errores
+
+
+def iterar_zip_facturas(facturas, errores: dict[int, str] | None = None):
+    """
+    Genera el ZIP de los PDF de `facturas` en bloques. Las que no tienen PDF (ver
+    preparar_pdfs y sus `errores`) quedan listadas en errores.txt.
+    """
+    return (parte for parte in _escribir_zip(facturas, errores or {}) if parte)
+
+
+def _escribir_zip(facturas, errores: dict[int, str]):
+    from afip.pdf_renderer import nombre_pdf
+
+    buffer = _BufferZip()
+    faltantes = []
+    # PDFs ya comprimidos: guardarlos tal cual no pierde tamaño y no gasta CPU.
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archivo:
+        for inv in facturas.iterator(chunk_size=200):
+            try:
+                if inv.pk in errores:
+                    raise RuntimeError(errores[inv.pk])
+                if inv.pdf_status != Invoice.PDF_LISTO or not inv.pdf:
+                    raise RuntimeError("sin PDF generado")
+                origen = inv.pdf.open("rb")
+            except Exception as exc:
+                LOGGER.warning("Factura %s sin PDF en el export: %s", inv.pk, exc)
+                faltantes.append(f"{nombre_pdf(inv)}: {exc}")
+                continue
+            with origen, archivo.open(nombre_pdf(inv), "w") as destino:
+                while bloque := origen.read(BLOQUE):
+                    destino.write(bloque)
+                    yield buffer.vaciar()
+            yield buffer.vaciar()
+        if faltantes:
+            archivo.writestr("errores.txt", "\n".join(faltantes) + "\n")
+    # Al cerrar se escribe el directorio central.
+    yield buffer.vaciar()
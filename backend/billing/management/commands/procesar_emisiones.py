@@ -0,0 +1,61 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from billing.emision import procesar_pendientes, recuperar_colgados
+
+
+class Command(BaseCommand):
+    help = "Worker de la cola de emisión de facturas (correr uno o más procesos en paralelo)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Vacía la cola una vez y termina")
+        parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos de espera con la cola vacía")
+        parser.add_argument("--max-jobs", type=int, default=None, help="Termina después de N jobs")
+        parser.add_argument(
+            "--timeout-colgados",
+            type=int,
+            default=900,
+            help="Segundos tras los que un job 'procesando' se considera de un worker caído",
+        )
+
+    def handle(self, *args, **options):
+        timeout = timedelta(seconds=options["timeout_colgados"])
+        restantes = options["max_jobs"]
+        total = 0
+        if settings.AFIP_PRECARGAR_PTO_VTAS:
+            # El worker es quien emite: que el primer job no pague FEParamGetTiposCbte.
+            from afip.solicitar_cae import precargar_tipos_comprobante
+
+            precargar_tipos_comprobante(settings.AFIP_CUIT_EMISOR, settings.AFIP_PRECARGAR_PTO_VTAS)
+        bloqueos = 0
+        while True:
+            try:
+                recuperados = recuperar_colgados(timeout)
+                if recuperados:
+                    self.stdout.write(self.style.WARNING(f"{recuperados} job(s) colgados vueltos a la cola"))
+
+                procesados = procesar_pendientes(limite=restantes)
+            except OperationalError as exc:
+                # SQLite con otro worker escribiendo ("database is locked"): esperar y seguir.
+                bloqueos += 1
+                espera = min(options["intervalo"] * 2 ** (bloqueos - 1), 60)
+                self.stderr.write(f"Base ocupada ({exc}); reintento en {espera:.1f}s")
+                connection.close()
+                time.sleep(espera)
+                continue
+            bloqueos = 0
+            total += procesados
+            if restantes is not None:
+                restantes -= procesados
+                if restantes <= 0:
+                    break
+            if options["once"]:
+                break
+            if not procesados:
+                time.sleep(options["intervalo"])
+
+        self.stdout.write(self.style.SUCCESS(f"Jobs procesados: {total}"))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0005_merge_0004_client_iva_rate_0004_invoice_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmisionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=12)),
+                ('payload', models.JSONField()),
+                ('error', models.JSONField(blank=True, null=True)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('disponible_desde', models.DateTimeField(auto_now_add=True)),
+                ('iniciado', models.DateTimeField(blank=True, null=True)),
+                ('finalizado', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='emision_jobs', to='billing.invoice')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'disponible_desde'], name='emision_job_cola')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0006_emisionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='caea_informado',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='caea_rechazo',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='modo_autorizacion',
+            field=models.CharField(choices=[('CAE', 'CAE'), ('CAEA', 'CAEA')], default='CAE', max_length=4),
+        ),
+    ]
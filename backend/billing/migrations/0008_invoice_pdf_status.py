@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:30
+
+from django.db import migrations, models
+
+
+def marcar_pdfs_existentes(apps, schema_editor):
+    Invoice = apps.get_model("billing", "Invoice")
+    Invoice.objects.exclude(pdf="").exclude(pdf__isnull=True).update(pdf_status="listo")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0007_invoice_caea'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='pdf_status',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('generando', 'Generando'), ('listo', 'Listo'), ('error', 'Error')], default='pendiente', max_length=10),
+        ),
+        migrations.RunPython(marcar_pdfs_existentes, migrations.RunPython.noop),
+    ]
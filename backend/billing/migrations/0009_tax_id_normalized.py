@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:48
+
+import logging
+
+from django.db import migrations, models
+
+LOGGER = logging.getLogger(__name__)
+
+
+def normalizar_cuits(apps, schema_editor):
+    # Si hay CUIT repetidos se queda con el registro más viejo, que es el que ya
+    # devolvía la búsqueda por CUIT. Los demás no se fusionan (pueden tener facturas):
+    # quedan con tax_id_normalized NULL, que los marca como duplicados, y se listan en el log.
+    for modelo in ("Client", "Provider"):
+        Model = apps.get_model("billing", modelo)
+        canonicos = {}
+        pendientes = []
+        for obj in Model.objects.order_by("id").only("id", "tax_id").iterator():
+            cuit = "".join(ch for ch in (obj.tax_id or "") if ch.isdigit())
+            if not cuit:
+                continue
+            if cuit in canonicos:
+                LOGGER.warning(
+                    "%s %s tiene el CUIT %s del %s %s: queda sin normalizar", modelo, obj.id, cuit, modelo, canonicos[cuit]
+                )
+                continue
+            canonicos[cuit] = obj.id
+            obj.tax_id_normalized = cuit
+            pendientes.append(obj)
+        Model.objects.bulk_update(pendientes, ["tax_id_normalized"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0008_invoice_pdf_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='tax_id_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='provider',
+            name='tax_id_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True, unique=True),
+        ),
+        migrations.RunPython(normalizar_cuits, migrations.RunPython.noop),
+    ]
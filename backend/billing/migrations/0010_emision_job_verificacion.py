@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0009_tax_id_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emisionjob',
+            name='cbte_nro',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emisionjob',
+            name='verificar_desde',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,29 @@
 from django.db import models
 
 
+def normalizar_cuit(value) -> str:
+    """Sólo los dígitos del CUIT/CUIL: "20-12345678-9" -> "20123456789"."""
+    if not value:
+        return ""
+    return "".join(ch for ch in str(value) if ch.isdigit())
+
+
+def _guardar_con_cuit_normalizado(obj, save, *args, **kwargs):
+    # tax_id es texto libre; tax_id_normalized es la clave única e indexada para buscar por CUIT.
+    normalizado = normalizar_cuit(obj.tax_id) or None
+    if obj.pk is not None and normalizado and normalizado != obj.tax_id_normalized:
+        # Duplicado de antes de la restricción (migración 0009): el CUIT ya lo tiene el
+        # registro canónico y éste sigue sin normalizar en vez de romper con IntegrityError.
+        otros = type(obj)._default_manager.filter(tax_id_normalized=normalizado).exclude(pk=obj.pk)
+        if otros.exists():
+            normalizado = None
+    obj.tax_id_normalized = normalizado
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "tax_id" in update_fields:
+        kwargs["update_fields"] = {*update_fields, "tax_id_normalized"}
+    save(*args, **kwargs)
+
+
 class Client(models.Model):
     CONDICION_IVA_CHOICES = (
         (4, "Responsable Inscripto"),
@@ -11,6 +34,7 @@ class Client(models.Model):
     name = models.CharField(max_length=120)
     email = models.EmailField()
     tax_id = models.CharField(max_length=20, default="", blank=True)
+    tax_id_normalized = models.CharField(max_length=20, unique=True, null=True, blank=True, editable=False)
     fiscal_address = models.CharField(max_length=255, default="", blank=True)
     tax_condition = models.PositiveSmallIntegerField(
         choices=CONDICION_IVA_CHOICES,
@@ -21,16 +45,23 @@ class Client(models.Model):
     def __str__(self):
         return f"{self.name} <{self.email}>"
 
+    def save(self, *args, **kwargs):
+        _guardar_con_cuit_normalizado(self, super().save, *args, **kwargs)
+
 
 class Provider(models.Model):
     name = models.CharField(max_length=120)
     email = models.EmailField(blank=True, default="")
     tax_id = models.CharField(max_length=20, default="", blank=True)
+    tax_id_normalized = models.CharField(max_length=20, unique=True, null=True, blank=True, editable=False)
     fiscal_address = models.CharField(max_length=255, default="", blank=True)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        _guardar_con_cuit_normalizado(self, super().save, *args, **kwargs)
+
 
 class Product(models.Model):
     name = models.CharField(max_length=120)
@@ -41,6 +72,20 @@ class Product(models.Model):
         return self.name
 
 class Invoice(models.Model):
+    MODO_CAE = "CAE"
+    MODO_CAEA = "CAEA"
+    MODO_AUTORIZACION_CHOICES = ((MODO_CAE, "CAE"), (MODO_CAEA, "CAEA"))
+    PDF_PENDIENTE = "pendiente"
+    PDF_GENERANDO = "generando"
+    PDF_LISTO = "listo"
+    PDF_ERROR = "error"
+    PDF_STATUS_CHOICES = (
+        (PDF_PENDIENTE, "Pendiente"),
+        (PDF_GENERANDO, "Generando"),
+        (PDF_LISTO, "Listo"),
+        (PDF_ERROR, "Error"),
+    )
+
     client = models.ForeignKey(Client, on_delete=models.PROTECT, related_name="invoices")
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     pto_vta = models.IntegerField()
@@ -50,9 +95,52 @@ class Invoice(models.Model):
     cae_due = models.CharField(max_length=8, blank=True, null=True)  # YYYYMMDD
     xml_raw = models.TextField(blank=True, null=True)
     pdf = models.FileField(upload_to="invoices/", blank=True, null=True)
+    # El PDF se genera después de guardar el CAE (afip.pdf_renderer)
+    pdf_status = models.CharField(max_length=10, choices=PDF_STATUS_CHOICES, default=PDF_PENDIENTE)
     metadata = models.JSONField(default=dict, blank=True)
+    # CAEA: el comprobante se emite local y se informa después (FECAEARegInformativo)
+    modo_autorizacion = models.CharField(max_length=4, choices=MODO_AUTORIZACION_CHOICES, default=MODO_CAE)
+    caea_informado = models.DateTimeField(null=True, blank=True)
+    caea_rechazo = models.TextField(blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         nro = self.cbte_nro if self.cbte_nro is not None else "s/n"
         return f"Cbte {self.cbte_tipo}-{self.pto_vta}-{nro}"
+
+
+class EmisionJob(models.Model):
+    """Emisión de factura encolada: la toma un worker (procesar_emisiones) fuera del request."""
+
+    PENDIENTE = "pendiente"
+    PROCESANDO = "procesando"
+    COMPLETADO = "completado"
+    ERROR = "error"
+    ESTADO_CHOICES = (
+        (PENDIENTE, "Pendiente"),
+        (PROCESANDO, "Procesando"),
+        (COMPLETADO, "Completado"),
+        (ERROR, "Error"),
+    )
+
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default=PENDIENTE)
+    payload = models.JSONField()
+    invoice = models.ForeignKey(
+        Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name="emision_jobs"
+    )
+    error = models.JSONField(null=True, blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    disponible_desde = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    finalizado = models.DateTimeField(null=True, blank=True)
+    # Número pedido a AFIP en un intento que falló sin saber si quedó autorizado.
+    cbte_nro = models.IntegerField(null=True, blank=True)
+    # Inicio del intento a verificar con AFIP antes de volver a emitir (ver billing.emision).
+    verificar_desde = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["estado", "disponible_desde"], name="emision_job_cola")]
+
+    def __str__(self):
+        return f"EmisionJob {self.pk} ({self.estado})"
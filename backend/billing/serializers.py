@@ -3,8 +3,7 @@ from decimal import Decimal
 
 from rest_framework import serializers
 
-from afip.cpe_service import _find_first, _to_decimal
-from billing.models import Client, Invoice, Product, Provider
+from billing.models import Client, EmisionJob, Invoice, Product, Provider, normalizar_cuit
 from trips.models import CPEAutomotor
 
 class CPERequestSerializer(serializers.Serializer):
@@ -17,28 +16,11 @@ class CPERequestSerializer(serializers.Serializer):
         min_value=0,
     )
 
-def _calculate_net_weight(cpe: CPEAutomotor) -> Decimal | None:
-    raw = cpe.raw_response or {}
-    gross = _to_decimal(
-        _find_first(
-            raw,
-            {"pesoBrutoDescarga", "pesoBruto", "pesoBrutoTotal"},
-        )
-    )
-    tare = _to_decimal(_find_first(raw, {"pesoTaraDescarga"}))
-
-    if gross is None:
-        gross = cpe.peso_bruto_descarga
-
-    if gross is None:
-        return None
 
-    if tare not in (None, Decimal("0")):
-        net = gross - tare
-        if net > 0:
-            return net
-
-    return gross
+class CPELoteSerializer(serializers.Serializer):
+    ctgs = serializers.ListField(
+        child=serializers.CharField(max_length=14), allow_empty=False, max_length=500
+    )
 
 
 class CPESerializer(serializers.ModelSerializer):
@@ -50,7 +32,7 @@ class CPESerializer(serializers.ModelSerializer):
         fields = "__all__"
 
     def get_net_weight(self, obj: CPEAutomotor):
-        return _calculate_net_weight(obj)
+        return obj.peso_neto
 
     def get_vehicle_domain(self, obj: CPEAutomotor):
         return obj.vehicle_domain
@@ -191,6 +173,53 @@ class EmitirFacturaSerializer(serializers.Serializer):
 
         return attrs
 
+class ComprobanteLoteSerializer(serializers.Serializer):
+    client_id = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    doc_tipo = serializers.IntegerField(default=80)  # 80 CUIT
+    doc_nro = serializers.CharField()
+    condicion_iva_receptor_id = serializers.IntegerField(required=False, allow_null=True)
+    iva_rate = serializers.DecimalField(
+        max_digits=5,
+        decimal_places=4,
+        required=False,
+        allow_null=True,
+        min_value=0,
+    )
+    cbtes_asoc = CbtesAsocField(required=False)
+    periodo_asoc = PeriodoAsocField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get("cbtes_asoc") and attrs.get("periodo_asoc"):
+            raise serializers.ValidationError(
+                "No podés enviar cbtes_asoc y periodo_asoc al mismo tiempo."
+            )
+        return attrs
+
+
+class EmitirLoteSerializer(serializers.Serializer):
+    pto_vta = serializers.IntegerField()
+    cbte_tipo = serializers.IntegerField(default=11)
+    comprobantes = ComprobanteLoteSerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        if attrs.get("cbte_tipo") in (12, 13):
+            for idx, item in enumerate(attrs["comprobantes"]):
+                if not (item.get("cbtes_asoc") or item.get("periodo_asoc")):
+                    raise serializers.ValidationError({
+                        "comprobantes": f"El comprobante en la posición {idx} es una Nota de Débito/Crédito y requiere cbtes_asoc o periodo_asoc."
+                    })
+
+        client_ids = {item["client_id"] for item in attrs["comprobantes"]}
+        clients = Client.objects.in_bulk(client_ids)
+        faltantes = sorted(client_ids - set(clients))
+        if faltantes:
+            raise serializers.ValidationError({"comprobantes": f"Clientes inexistentes: {faltantes}"})
+        for item in attrs["comprobantes"]:
+            item["client"] = clients[item.pop("client_id")]
+        return attrs
+
+
 class InvoiceSerializer(serializers.ModelSerializer):
     client_name = serializers.CharField(source="client.name", read_only=True)
     client_email = serializers.EmailField(source="client.email", read_only=True)
@@ -209,11 +238,61 @@ class InvoiceSerializer(serializers.ModelSerializer):
             "cae",
             "cae_due",
             "pdf",
+            "pdf_status",
             "created_at",
             "metadata",
         ]
 
 
+class EmisionJobSerializer(serializers.ModelSerializer):
+    invoice = InvoiceSerializer(read_only=True)
+
+    class Meta:
+        model = EmisionJob
+        fields = [
+            "id",
+            "estado",
+            "intentos",
+            "error",
+            "invoice",
+            "created_at",
+            "iniciado",
+            "finalizado",
+        ]
+
+
+class PadronLoteSerializer(serializers.Serializer):
+    cuits = serializers.ListField(
+        child=serializers.CharField(), allow_empty=False, max_length=200
+    )
+    forzar = serializers.BooleanField(default=False)
+
+
+class ExportarFacturasSerializer(serializers.Serializer):
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    client = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        if attrs.get("desde") and attrs.get("hasta") and attrs["desde"] > attrs["hasta"]:
+            raise serializers.ValidationError({"hasta": "Debe ser posterior a 'desde'."})
+        return attrs
+
+
+def _validar_cuit_unico(model, tax_id: str, instance, mensaje: str) -> None:
+    normalizado = normalizar_cuit(tax_id)
+    if not normalizado:
+        return
+    if instance is not None and normalizar_cuit(instance.tax_id) == normalizado:
+        # Sin cambio de CUIT: los duplicados previos a la restricción se pueden seguir editando.
+        return
+    qs = model.objects.filter(tax_id_normalized=normalizado)
+    if instance is not None:
+        qs = qs.exclude(pk=instance.pk)
+    if qs.exists():
+        raise serializers.ValidationError(mensaje)
+
+
 class ClientSerializer(serializers.ModelSerializer):
     tax_condition_display = serializers.CharField(
         source="get_tax_condition_display", read_only=True
@@ -254,6 +333,7 @@ class ClientSerializer(serializers.ModelSerializer):
         value = value.strip()
         if not value:
             raise serializers.ValidationError("Ingresá el número de CUIT/CUIL del cliente.")
+        _validar_cuit_unico(Client, value, self.instance, "Ya existe un cliente con ese CUIT/CUIL.")
         return value
 
     def validate_fiscal_address(self, value: str) -> str:
@@ -291,6 +371,11 @@ class ProviderSerializer(serializers.ModelSerializer):
         model = Provider
         fields = ["id", "name", "email", "tax_id", "fiscal_address"]
 
+    def validate_tax_id(self, value: str) -> str:
+        value = value.strip()
+        _validar_cuit_unico(Provider, value, self.instance, "Ya existe un proveedor con ese CUIT.")
+        return value
+
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
@@ -371,15 +456,10 @@ class CPEInvoiceSerializer(serializers.ModelSerializer):
         ]
 
     def get_total_amount(self, obj: CPEAutomotor):
-        if obj.tariff is None:
-            return None
-        net_weight = self.get_net_weight(obj)
-        if net_weight in (None, 0):
-            return obj.tariff
-        return obj.tariff * net_weight
+        return obj.importe_total
 
     def get_net_weight(self, obj: CPEAutomotor):
-        return _calculate_net_weight(obj)
+        return obj.peso_neto
 
     def get_client_id(self, obj: CPEAutomotor):
         return obj.client_id
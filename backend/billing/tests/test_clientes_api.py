@@ -1,9 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from billing.models import Client
+from billing.models import Client, Provider
 
 
 class ClientesAPITestCase(APITestCase):
@@ -50,3 +52,68 @@ class ClientesAPITestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("name", response.data)
+
+    def test_cuit_repetido_con_otro_formato(self):
+        otro = Client.objects.create(name="Otro", email="otro@ejemplo.com", tax_id="27-11111111-1")
+        self.assertEqual(self.cliente.tax_id_normalized, "20123456789")
+
+        response = self.client.patch(
+            f"/api/clientes/{otro.id}/", {"tax_id": "20 12345678 9"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("tax_id", response.data)
+        otro.refresh_from_db()
+        self.assertEqual(otro.tax_id_normalized, "27111111111")
+
+
+class MigracionCuitDuplicadoTest(APITransactionTestCase):
+    antes = [("billing", "0008_invoice_pdf_status")]
+
+    def _migrar(self, destino):
+        executor = MigrationExecutor(connection)
+        executor.migrate(destino or executor.loader.graph.leaf_nodes())
+
+    def setUp(self):
+        self._migrar(self.antes)
+        self.addCleanup(self._migrar, None)
+        apps = MigrationExecutor(connection).loader.project_state(self.antes).apps
+        ClientViejo = apps.get_model("billing", "Client")
+        ProviderViejo = apps.get_model("billing", "Provider")
+        self.ids = [
+            ClientViejo.objects.create(name=f"Cliente {n}", email="c@ejemplo.com", tax_id=cuit).id
+            for n, cuit in enumerate(("20-12345678-9", "20123456789"))
+        ]
+        self.proveedores = [ProviderViejo.objects.create(name=f"Prov {n}", tax_id="30-71600472-0").id for n in range(2)]
+        self._migrar(None)
+
+    def test_duplicados_previos_se_pueden_seguir_actualizando(self):
+        canonico, duplicado = (Client.objects.get(pk=pk) for pk in self.ids)
+        self.assertEqual(canonico.tax_id_normalized, "20123456789")
+        self.assertIsNone(duplicado.tax_id_normalized)
+
+        for cliente in (canonico, duplicado):
+            cliente.name += " editado"
+            cliente.save()
+        for pk in self.proveedores:
+            Provider.objects.get(pk=pk).save()
+
+        user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        response = self.client.put(
+            f"/api/clientes/{duplicado.id}/",
+            {
+                "name": "Duplicado",
+                "email": "d@ejemplo.com",
+                "tax_id": "20123456789",
+                "fiscal_address": "Calle 1",
+                "tax_condition": 5,
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        duplicado.refresh_from_db()
+        self.assertIsNone(duplicado.tax_id_normalized)
+        self.assertEqual(Client.objects.get(tax_id_normalized="20123456789").pk, canonico.pk)
+        self.assertEqual(Provider.objects.filter(tax_id_normalized="30716004720").count(), 1)
@@ -36,7 +36,7 @@ class ConsultarCPEAPITestCase(APITestCase):
         )
 
     @patch("afip.cpe_service.get_token_sign", return_value=("TOKEN", "SIGN"))
-    @patch("afip.cpe_service.requests.post")
+    @patch("afip.cpe_service.transport.post")
     def test_consultar_cpe_ok(self, mock_post: Mock, _mock_token):
         xml = """
         <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
@@ -60,7 +60,7 @@ class ConsultarCPEAPITestCase(APITestCase):
         mock_post.assert_called_once()
 
     @patch("afip.cpe_service.get_token_sign", return_value=("TOKEN", "SIGN"))
-    @patch("afip.cpe_service.requests.post")
+    @patch("afip.cpe_service.transport.post")
     def test_consultar_cpe_ok_sin_autenticacion(self, mock_post: Mock, _mock_token):
         xml = """
         <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
@@ -85,7 +85,7 @@ class ConsultarCPEAPITestCase(APITestCase):
         self.assertEqual(response.data["nro_ctg"], "1234")
 
     @patch("afip.cpe_service.get_token_sign", return_value=("TOKEN", "SIGN"))
-    @patch("afip.cpe_service.requests.post")
+    @patch("afip.cpe_service.transport.post")
     def test_consultar_cpe_http_error(self, mock_post: Mock, _mock_token):
         mock_post.return_value = _build_response(status.HTTP_500_INTERNAL_SERVER_ERROR, "")
 
@@ -97,7 +97,7 @@ class ConsultarCPEAPITestCase(APITestCase):
         self.assertEqual(response.data.get("code"), "AFIP_UNAVAILABLE")
 
     @patch("afip.cpe_service.get_token_sign", return_value=("TOKEN", "SIGN"))
-    @patch("afip.cpe_service.requests.post")
+    @patch("afip.cpe_service.transport.post")
     def test_consultar_cpe_token_expirado(self, mock_post: Mock, _mock_token):
         xml = """
         <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
@@ -119,7 +119,7 @@ class ConsultarCPEAPITestCase(APITestCase):
         self.assertEqual(response.data.get("code"), "TOKEN_EXPIRED")
 
     @patch("afip.cpe_service.get_token_sign", return_value=("TOKEN", "SIGN"))
-    @patch("afip.cpe_service.requests.post")
+    @patch("afip.cpe_service.transport.post")
     def test_consultar_cpe_ctg_invalido(self, mock_post: Mock, _mock_token):
         xml = """
         <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
@@ -144,3 +144,26 @@ class ConsultarCPEAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(response.data.get("code"), "INVALID_CTG")
 
+
+    @patch("afip.cpe_service.get_token_sign", return_value=("TOKEN", "SIGN"))
+    @patch("afip.cpe_service.transport.post")
+    def test_consultar_cpe_asocia_cliente_por_cuit_normalizado(self, mock_post: Mock, _mock_token):
+        xml = """
+        <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+          <soapenv:Body>
+            <respuesta>
+              <cabecera><nroCTG>1234</nroCTG></cabecera>
+              <destinatario><cuitDestinatario>20123456789</cuitDestinatario></destinatario>
+            </respuesta>
+          </soapenv:Body>
+        </soapenv:Envelope>
+        """
+        mock_post.return_value = _build_response(status.HTTP_200_OK, xml)
+
+        response = self.client.post(
+            "/api/cpe/consultar/", {"nro_ctg": "1234"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["client"], self.client_obj.pk)
+        self.assertEqual(Client.objects.count(), 1)
@@ -0,0 +1,81 @@
+import re
+from decimal import Decimal
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from afip import cpe_referencias
+from billing.models import Product
+from billing.tests.test_consultar_cpe_api import _build_response
+from trips.models import CPEAutomotor
+
+XML_OK = """
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+  <soapenv:Body>
+    <respuesta>
+      <cabecera><nroCTG>{ctg}</nroCTG><estado>AC</estado></cabecera>
+      <destinatario><cuitDestinatario>30716004720</cuitDestinatario></destinatario>
+      <datosCarga><codGrano>23</codGrano><pesoBruto>30000</pesoBruto><pesoTaraDescarga>10000</pesoTaraDescarga></datosCarga>
+      <transporte><dominio>AB123CD</dominio></transporte>
+    </respuesta>
+  </soapenv:Body>
+</soapenv:Envelope>
+"""
+
+XML_NO_EXISTE = """
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+  <soapenv:Body>
+    <respuesta><errores><error><codigo>123</codigo><mensaje>CTG inexistente</mensaje></error></errores></respuesta>
+  </soapenv:Body>
+</soapenv:Envelope>
+"""
+
+
+def _responder(url, data=None, headers=None, timeout=None):
+    ctg = re.search(rb"<nroCTG>(\d+)</nroCTG>", data).group(1).decode()
+    if ctg == "3":
+        return _build_response(status.HTTP_200_OK, XML_NO_EXISTE)
+    if ctg == "4":
+        return _build_response(status.HTTP_503_SERVICE_UNAVAILABLE, "")
+    return _build_response(status.HTTP_200_OK, XML_OK.format(ctg=ctg))
+
+
+class ConsultarCPELoteAPITestCase(APITestCase):
+    def setUp(self):
+        cpe_referencias.limpiar_cache()
+        self.addCleanup(cpe_referencias.limpiar_cache)
+        admin = get_user_model().objects.create_user(email="admin@example.com", password="password", is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(admin).access_token}")
+
+    @patch("afip.cpe_service.get_token_sign", return_value=("TOKEN", "SIGN"))
+    @patch("afip.cpe_service.transport.post", side_effect=_responder)
+    def test_estado_por_ctg_y_guardado_en_bloque(self, mock_post: Mock, mock_token: Mock):
+        Product.objects.create(name="Soja", afip_code="23", default_tariff=Decimal("2.00"))
+        CPEAutomotor.objects.create(nro_ctg="2", tariff=Decimal("5.00"))  # tarifa cargada a mano: se respeta
+
+        response = self.client.post(
+            "/api/cpe/consultar-lote/", {"ctgs": ["1", "2", "3", "4", "1"]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        estados = {r["nro_ctg"]: r["estado"] for r in response.data["resultados"]}
+        self.assertEqual(estados, {"1": "ok", "2": "ok", "3": "no_encontrado", "4": "error_transitorio"})
+        self.assertEqual(mock_post.call_count, 4)
+        mock_token.assert_called_once()
+
+        nueva, existente = CPEAutomotor.objects.get(nro_ctg="1"), CPEAutomotor.objects.get(nro_ctg="2")
+        self.assertEqual(response.data["resultados"][0]["cpe"]["id"], nueva.pk)
+        self.assertEqual(response.data["resultados"][0]["cpe"]["vehicle_domain"], "AB123CD")
+        self.assertEqual((nueva.tariff, nueva.peso_neto, nueva.importe_total), (Decimal("2.00"), Decimal("20000"), Decimal("40000.00")))
+        self.assertEqual((existente.estado, existente.tariff, existente.importe_total), ("AC", Decimal("5.00"), Decimal("100000.00")))
+        self.assertEqual(nueva.client_id, existente.client_id)
+        self.assertEqual(CPEAutomotor.objects.count(), 2)
+
+    def test_valida_la_lista(self):
+        response = self.client.post("/api/cpe/consultar-lote/", {"ctgs": []}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("ctgs", response.data)
@@ -0,0 +1,121 @@
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from billing.models import Product
+from billing.tests.test_consultar_cpe_api import _build_response
+from trips.models import CPEAutomotor, Vehicle
+
+XML_CPE = """
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+  <soapenv:Body>
+    <respuesta>
+      <cabecera><nroCTG>10100000012</nroCTG></cabecera>
+      <destinatario><cuitDestinatario>30-71600472-0</cuitDestinatario></destinatario>
+      <datosCarga>
+        <codGrano>23</codGrano>
+        <pesoBrutoDescarga>30000</pesoBrutoDescarga>
+        <pesoTaraDescarga>12000</pesoTaraDescarga>
+      </datosCarga>
+    </respuesta>
+  </soapenv:Body>
+</soapenv:Envelope>
+"""
+
+
+class CPEDerivadosTest(APITestCase):
+    def setUp(self):
+        admin = get_user_model().objects.create_user(email="admin@example.com", password="password", is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(admin).access_token}")
+
+    @patch("afip.cpe_service.get_token_sign", return_value=("TOKEN", "SIGN"))
+    @patch("afip.cpe_service.transport.post")
+    def test_la_consulta_guarda_los_derivados(self, mock_post: Mock, _mock_token):
+        Product.objects.create(name="Soja", afip_code="23", default_tariff=Decimal("2.50"))
+        mock_post.return_value = _build_response(status.HTTP_200_OK, XML_CPE)
+
+        response = self.client.post("/api/cpe/consultar/", {"nro_ctg": "10100000012"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cpe = CPEAutomotor.objects.get(nro_ctg="10100000012")
+        self.assertEqual(cpe.peso_tara_descarga, Decimal("12000"))
+        self.assertEqual(cpe.peso_neto, Decimal("18000"))
+        self.assertEqual(cpe.cuit_pagador, "30716004720")
+        self.assertEqual(cpe.importe_total, Decimal("45000.00"))
+
+    def test_cambiar_la_tarifa_recalcula_el_total(self):
+        cpe = CPEAutomotor.objects.create(
+            nro_ctg="1", peso_bruto_descarga=Decimal("30000"), peso_tara_descarga=Decimal("12000")
+        )
+        self.assertIsNone(cpe.importe_total)
+
+        response = self.client.patch(f"/api/cpe/{cpe.pk}/tarifa/", {"tariff": "1.25"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(str(response.data["total_amount"])), Decimal("22500.00"))
+        cpe.refresh_from_db()
+        self.assertEqual(cpe.importe_total, Decimal("22500.00"))
+
+    def test_estadisticas_suman_el_total_guardado(self):
+        vehicle = Vehicle.objects.create(domain="AB123CD")
+        for nro, tara in (("1", "12000"), ("2", None)):
+            CPEAutomotor.objects.create(
+                nro_ctg=nro, vehicle=vehicle, tariff=Decimal("2"), peso_bruto_descarga=Decimal("30000"),
+                peso_tara_descarga=Decimal(tara) if tara else None,
+            )
+
+        with self.assertNumQueries(3):  # usuario + una agregación por orden, sin leer raw_response
+            response = self.client.get("/api/estadisticas/dominios/")
+
+        self.assertEqual(response.data["mayor_facturacion"][0]["facturacion"], Decimal("96000.00"))
+
+    def test_recalcular_cpe_completa_las_filas_viejas(self):
+        raw = {"datosCarga": {"pesoBruto": "30000", "pesoTaraDescarga": "10000"}, "cuitDestino": "30716004720"}
+        cpe = CPEAutomotor.objects.create(nro_ctg="1", tariff=Decimal("1"), raw_response=raw)
+        CPEAutomotor.objects.filter(pk=cpe.pk).update(peso_neto=None, importe_total=None)
+
+        out = StringIO()
+        call_command("recalcular_cpe", lote=1, stdout=out)
+
+        cpe.refresh_from_db()
+        self.assertEqual(cpe.peso_bruto_descarga, Decimal("30000"))
+        self.assertEqual(cpe.peso_neto, Decimal("20000"))
+        self.assertEqual(cpe.cuit_pagador, "30716004720")
+        self.assertEqual(cpe.importe_total, Decimal("20000.00"))
+        self.assertIn("1 CPE recalculadas", out.getvalue())
+
+
+class MigracionDerivadosTest(APITransactionTestCase):
+    antes = [("trips", "0005_cpeautomotor_pdf")]
+
+    def _migrar(self, destino):
+        executor = MigrationExecutor(connection)
+        executor.migrate(destino or executor.loader.graph.leaf_nodes())
+
+    def test_las_cpe_viejas_cuentan_en_las_estadisticas(self):
+        self._migrar(self.antes)
+        self.addCleanup(self._migrar, None)
+        apps = MigrationExecutor(connection).loader.project_state(self.antes).apps
+        vehicle = apps.get_model("trips", "Vehicle").objects.create(domain="AB123CD")
+        # Filas guardadas antes de 0004: sin peso_neto ni importe_total.
+        apps.get_model("trips", "CPEAutomotor").objects.create(
+            nro_ctg="1", vehicle=vehicle, tariff=Decimal("2"), peso_bruto_descarga=Decimal("30000")
+        )
+        self._migrar(None)
+
+        cpe = CPEAutomotor.objects.get(nro_ctg="1")
+        self.assertEqual(cpe.peso_neto, Decimal("30000"))
+        self.assertEqual(cpe.importe_total, Decimal("60000.00"))
+        admin = get_user_model().objects.create_user(email="admin@example.com", password="password", is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(admin).access_token}")
+        response = self.client.get("/api/estadisticas/dominios/")
+        self.assertEqual(response.data["mayor_facturacion"][0]["facturacion"], Decimal("60000.00"))
@@ -0,0 +1,108 @@
+import base64
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from afip import cpe_referencias
+from billing.tests.test_consultar_cpe_api import _build_response
+from trips.models import CPEAutomotor
+
+PDF = b"%PDF-1.4 carta de porte"
+
+XML_CON_PDF = """
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+  <soapenv:Body>
+    <respuesta>
+      <cabecera><nroCTG>{ctg}</nroCTG><estado>AC</estado></cabecera>
+      <datosCarga><pesoBruto>30000</pesoBruto></datosCarga>
+      <pdf>{pdf}</pdf>
+    </respuesta>
+  </soapenv:Body>
+</soapenv:Envelope>
+"""
+
+
+def _responder_con_pdf(contenido: bytes):
+    def responder(url, data=None, headers=None, timeout=None):
+        ctg = data.split(b"<nroCTG>")[1].split(b"</nroCTG>")[0].decode()
+        return _build_response(
+            status.HTTP_200_OK, XML_CON_PDF.format(ctg=ctg, pdf=base64.b64encode(contenido).decode())
+        )
+
+    return responder
+
+
+@patch("afip.cpe_service.get_token_sign", return_value=("TOKEN", "SIGN"))
+class CPEPdfTestCase(APITestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        cpe_referencias.limpiar_cache()
+        self.addCleanup(cpe_referencias.limpiar_cache)
+        admin = get_user_model().objects.create_user(email="admin@example.com", password="password", is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(admin).access_token}")
+
+    def _descargar(self, cpe: CPEAutomotor) -> bytes:
+        response = self.client.get(f"/api/cpe/{cpe.pk}/pdf/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertIn(f"cpe-{cpe.nro_ctg}.pdf", response["Content-Disposition"])
+        if cpe.pdf:
+            self.assertTrue(response.streaming)
+            return b"".join(response.streaming_content)
+        return response.content
+
+    def test_consulta_guarda_el_pdf_en_archivo_y_no_en_raw_response(self, _mock_token):
+        with patch("afip.cpe_service.transport.post", side_effect=_responder_con_pdf(PDF)):
+            response = self.client.post("/api/cpe/consultar/", {"nro_ctg": "101"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        cpe = CPEAutomotor.objects.get(nro_ctg="101")
+        self.assertNotIn("pdf", cpe.raw_response)
+        self.assertEqual(Path(cpe.pdf.path).read_bytes(), PDF)
+        self.assertEqual(self._descargar(cpe), PDF)
+
+    def test_reconsultar_reemplaza_el_archivo(self, _mock_token):
+        with patch("afip.cpe_service.transport.post", side_effect=_responder_con_pdf(b"%PDF viejo")):
+            self.client.post("/api/cpe/consultar/", {"nro_ctg": "101"}, format="json")
+        anterior = Path(CPEAutomotor.objects.get(nro_ctg="101").pdf.path)
+
+        with patch("afip.cpe_service.transport.post", side_effect=_responder_con_pdf(PDF)):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post("/api/cpe/consultar-lote/", {"ctgs": ["101", "102"]}, format="json")
+
+        cpe = CPEAutomotor.objects.get(nro_ctg="101")
+        self.assertEqual(Path(cpe.pdf.path).read_bytes(), PDF)
+        self.assertFalse(anterior.exists())
+        self.assertEqual(self._descargar(CPEAutomotor.objects.get(nro_ctg="102")), PDF)
+
+    def test_extraer_pdfs_cpe_migra_las_cpe_viejas(self, _mock_token):
+        vieja = CPEAutomotor.objects.create(
+            nro_ctg="201", raw_response={"cabecera": {"nroCTG": "201"}, "pdf": base64.b64encode(PDF).decode()}
+        )
+        sin_pdf = CPEAutomotor.objects.create(nro_ctg="202", raw_response={"cabecera": {"nroCTG": "202"}})
+        # Antes de migrar se sigue sirviendo desde raw_response.
+        self.assertEqual(self._descargar(vieja), PDF)
+
+        call_command("extraer_pdfs_cpe", lote=1, stdout=StringIO())
+
+        vieja.refresh_from_db()
+        self.assertEqual(vieja.raw_response, {"cabecera": {"nroCTG": "201"}})
+        self.assertEqual(Path(vieja.pdf.path).read_bytes(), PDF)
+        self.assertEqual(self._descargar(vieja), PDF)
+        sin_pdf.refresh_from_db()
+        self.assertFalse(sin_pdf.pdf)
+        response = self.client.get(f"/api/cpe/{sin_pdf.pk}/pdf/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
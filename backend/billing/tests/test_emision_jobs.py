@@ -0,0 +1,209 @@
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from afip.models import NumeradorComprobante
+from billing.emision import procesar_pendientes, recuperar_colgados, tomar_siguiente
+from billing.models import Client, EmisionJob, Invoice
+
+CAE_OK = {
+    "cae": "12345678901234",
+    "cae_due": "20251231",
+    "cbte_nro": 42,
+    "xml": "<xml></xml>",
+    "observations": [],
+    "events": [],
+}
+
+
+def _autorizado(cbte_nro, doc_nro="20123456789", importe="100.00"):
+    """Respuesta de FECompConsultar para un comprobante que AFIP tiene autorizado."""
+    return {**CAE_OK, "cbte_nro": cbte_nro, "doc_nro": doc_nro, "importe": Decimal(importe)}
+
+
+@override_settings(FACTURACION_EMISION_ASINCRONA=True, FACTURACION_EMISION_MAX_INTENTOS=2)
+@patch("afip.fe_service.fe.obtener_tipos_comprobante_validos", return_value=[11])
+class EmisionAsincronaTest(APITestCase):
+    def setUp(self):
+        # El numerador consulta FECompUltimoAutorizado antes de reservar.
+        ultimo = patch("afip.solicitar_cae.ultimo_autorizado", return_value=0)
+        self.mock_ultimo = ultimo.start()
+        self.addCleanup(ultimo.stop)
+        user = get_user_model().objects.create_user(email="admin@example.com", password="password", is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        self.client_obj = Client.objects.create(name="Cliente Test", email="cliente@example.com")
+        self.payload = {
+            "client_id": self.client_obj.id,
+            "amount": "100.00",
+            "pto_vta": 3,
+            "cbte_tipo": 11,
+            "doc_nro": "20-12345678-9",
+        }
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media.name))
+
+    @patch("afip.fe_service._render_pdf_to_bytes", return_value=b"PDF")
+    @patch("afip.fe_service.fe.solicitar_cae", return_value=CAE_OK)
+    def test_encola_responde_202_y_el_worker_emite(self, mock_cae, _mock_pdf, _mock_tipos):
+        response = self.client.post("/api/facturas/emitir/", self.payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["estado"], EmisionJob.PENDIENTE)
+        mock_cae.assert_not_called()
+
+        self.assertEqual(procesar_pendientes(), 1)
+
+        mock_cae.assert_called_once()
+        estado = self.client.get(f"/api/facturas/jobs/{response.data['id']}/")
+        self.assertEqual(estado.status_code, status.HTTP_200_OK)
+        self.assertEqual(estado.data["estado"], EmisionJob.COMPLETADO)
+        self.assertEqual(estado.data["invoice"]["id"], Invoice.objects.get().id)
+
+    def _vencer_backoff(self):
+        EmisionJob.objects.update(disponible_desde=timezone.now() - timedelta(seconds=1))
+
+    @patch("afip.fe_service.fe.consultar_comprobante", return_value=None)
+    @patch("afip.fe_service.fe.solicitar_cae", side_effect=RuntimeError("AFIP caído"))
+    def test_error_de_afip_se_verifica_y_reintenta_hasta_el_maximo(self, mock_cae, mock_consulta, _mock_tipos):
+        self.client.post("/api/facturas/emitir/", self.payload, format="json")
+
+        procesar_pendientes()
+        job = EmisionJob.objects.get()
+        self.assertEqual(job.estado, EmisionJob.PENDIENTE)
+        self.assertEqual(job.error, {"detail": "AFIP caído"})
+        self.assertEqual(job.cbte_nro, 1)
+        self.assertIsNone(tomar_siguiente())  # en backoff
+
+        # Segundo intento: AFIP confirma que el 1 no existe y se vuelve a emitir.
+        self._vencer_backoff()
+        procesar_pendientes()
+        mock_consulta.assert_called_once_with("30716004720", 3, 11, 1)
+        self.assertEqual(mock_cae.call_count, 2)
+        job.refresh_from_db()
+        self.assertEqual(job.estado, EmisionJob.PENDIENTE)
+
+        # Agotados los intentos sólo se termina en error después de verificar el último.
+        self._vencer_backoff()
+        procesar_pendientes()
+        job.refresh_from_db()
+        self.assertEqual(job.estado, EmisionJob.ERROR)
+        self.assertEqual(mock_cae.call_count, 2)
+        self.assertEqual(mock_consulta.call_count, 2)
+        self.assertFalse(Invoice.objects.exists())
+
+    @patch("afip.fe_service.fe.consultar_comprobante", return_value=_autorizado(1))
+    @patch("afip.fe_service.fe.solicitar_cae", side_effect=TimeoutError("sin respuesta"))
+    def test_timeout_con_comprobante_autorizado_adopta_el_cae(self, mock_cae, _mock_consulta, _mock_tipos):
+        self.client.post("/api/facturas/emitir/", self.payload, format="json")
+        procesar_pendientes()
+        self._vencer_backoff()
+        procesar_pendientes()
+
+        job = EmisionJob.objects.get()
+        self.assertEqual(job.estado, EmisionJob.COMPLETADO)
+        self.assertEqual(job.invoice.cbte_nro, 1)
+        self.assertEqual(job.invoice.cae, CAE_OK["cae"])
+        mock_cae.assert_called_once()
+
+    @patch("afip.fe_service.fe.solicitar_cae", side_effect=RuntimeError("AFIP caído"))
+    def test_sin_respuesta_de_afip_al_verificar_no_se_emite(self, mock_cae, _mock_tipos):
+        self.client.post("/api/facturas/emitir/", self.payload, format="json")
+        procesar_pendientes()
+        self._vencer_backoff()
+        with patch("afip.fe_service.fe.consultar_comprobante", side_effect=ConnectionError("sin red")):
+            procesar_pendientes()
+
+        job = EmisionJob.objects.get()
+        self.assertEqual(job.estado, EmisionJob.PENDIENTE)
+        self.assertEqual(job.cbte_nro, 1)
+        self.assertIsNotNone(job.verificar_desde)
+        mock_cae.assert_called_once()
+
+    @patch("afip.fe_service.fe.solicitar_cae", return_value=CAE_OK)
+    def test_job_colgado_busca_en_afip_antes_de_reemitir(self, mock_cae, _mock_tipos):
+        Invoice.objects.create(client=self.client_obj, amount=Decimal("50.00"), pto_vta=3, cbte_tipo=11, cbte_nro=3)
+        self.client.post("/api/facturas/emitir/", self.payload, format="json")
+        job = tomar_siguiente()
+        EmisionJob.objects.filter(pk=job.pk).update(iniciado=timezone.now() - timedelta(hours=1))
+        self.assertEqual(recuperar_colgados(timedelta(minutes=15)), 1)
+
+        # El worker murió sin registrar el número: AFIP autorizó el 4 (este) y el 5 (otro receptor).
+        self.mock_ultimo.return_value = 5
+        consultas = {5: _autorizado(5, doc_nro="20999999999"), 4: _autorizado(4)}
+        with patch("afip.fe_service.fe.consultar_comprobante", side_effect=lambda c, p, t, nro: consultas[nro]) as consulta:
+            procesar_pendientes()
+
+        job.refresh_from_db()
+        self.assertEqual(job.estado, EmisionJob.COMPLETADO)
+        self.assertEqual(job.invoice.cbte_nro, 4)
+        self.assertEqual([c.args[3] for c in consulta.call_args_list], [5, 4])
+        mock_cae.assert_not_called()
+
+    @patch("afip.fe_service.fe.solicitar_cae", side_effect=ValueError("ImpTotal inválido."))
+    def test_error_de_validacion_sin_campo_va_a_non_field_errors(self, _mock_cae, _mock_tipos):
+        self.client.post("/api/facturas/emitir/", self.payload, format="json")
+        procesar_pendientes()
+
+        job = EmisionJob.objects.get()
+        self.assertEqual(job.estado, EmisionJob.ERROR)
+        self.assertEqual(job.error, {"non_field_errors": ["ImpTotal inválido."]})
+
+    def test_tipo_no_habilitado_se_rechaza_sin_encolar(self, _mock_tipos):
+        response = self.client.post(
+            "/api/facturas/emitir/", {**self.payload, "cbte_tipo": 13, "periodo_asoc": {"desde": "20250101", "hasta": "20250131"}}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(EmisionJob.objects.exists())
+
+    def test_dos_workers_no_toman_el_mismo_job(self, _mock_tipos):
+        for _ in range(2):
+            self.client.post("/api/facturas/emitir/", self.payload, format="json")
+        primero, segundo = EmisionJob.objects.order_by("id")
+
+        ganador = tomar_siguiente()
+        # El otro worker leyó los candidatos antes de que el primero cambiara el estado.
+        with patch("billing.emision._candidatos", side_effect=[[primero.pk, segundo.pk], []]):
+            otro = tomar_siguiente()
+
+        self.assertEqual((ganador.pk, otro.pk), (primero.pk, segundo.pk))
+        primero.refresh_from_db()
+        self.assertEqual((primero.estado, primero.intentos), (EmisionJob.PROCESANDO, 1))
+        self.assertIsNone(tomar_siguiente())
+
+    @patch("billing.management.commands.procesar_emisiones.time.sleep")
+    @patch("billing.management.commands.procesar_emisiones.procesar_pendientes")
+    def test_worker_sobrevive_a_la_base_bloqueada(self, mock_procesar, mock_sleep, _mock_tipos):
+        mock_procesar.side_effect = [OperationalError("database is locked"), 1]
+        out, err = StringIO(), StringIO()
+
+        call_command("procesar_emisiones", max_jobs=1, intervalo=0.5, stdout=out, stderr=err)
+
+        self.assertEqual(mock_procesar.call_count, 2)
+        mock_sleep.assert_called_once_with(0.5)
+        self.assertIn("database is locked", err.getvalue())
+        self.assertIn("Jobs procesados: 1", out.getvalue())
+
+    @override_settings(AFIP_CUIT_EMISOR="20111111112")
+    @patch("afip.fe_service._render_pdf_to_bytes", return_value=b"PDF")
+    @patch("afip.fe_service.fe.solicitar_cae", return_value=CAE_OK)
+    def test_emite_con_el_cuit_configurado(self, mock_cae, _mock_pdf, mock_tipos):
+        self.client.post("/api/facturas/emitir/", self.payload, format="json")
+        procesar_pendientes()
+
+        self.assertEqual({c.kwargs["cuit"] for c in mock_tipos.call_args_list}, {"20111111112"})
+        self.assertEqual(mock_cae.call_args.kwargs["cuit"], "20111111112")
+        self.assertTrue(NumeradorComprobante.objects.filter(cuit="20111111112", pto_vta=3, cbte_tipo=11).exists())
+        self.assertEqual(Invoice.objects.get().metadata["cuit_emisor"], "20111111112")
@@ -0,0 +1,113 @@
+import tempfile
+import zipfile
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.http import StreamingHttpResponse
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from billing import exportacion
+from billing.models import Client, Invoice
+
+
+@override_settings(FACTURACION_PDF_PROCESOS=0)
+class ExportarFacturasAPITestCase(APITestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_media = override_settings(MEDIA_ROOT=media.name)
+        settings_media.enable()
+        self.addCleanup(settings_media.disable)
+
+        user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        self.cliente = Client.objects.create(name="Cliente", email="c@example.com")
+        self.otro = Client.objects.create(name="Otro", email="o@example.com")
+
+    def _factura(self, nro, client, creada, pdf=None):
+        inv = Invoice.objects.create(
+            client=client, amount=Decimal("10.00"), pto_vta=3, cbte_tipo=11, cbte_nro=nro, cae="123"
+        )
+        Invoice.objects.filter(pk=inv.pk).update(created_at=creada)
+        if pdf is not None:
+            inv.pdf.save(f"cbte_11_3_{nro}.pdf", ContentFile(pdf), save=False)
+            inv.pdf_status = Invoice.PDF_LISTO
+            inv.save(update_fields=["pdf", "pdf_status"])
+        return inv
+
+    def _zip(self, response):
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+
+    @patch("afip.fe_service._render_pdf_to_bytes", return_value=b"%PDF generado")
+    def test_exporta_el_mes_y_genera_los_que_faltan(self, mock_render):
+        octubre = datetime(2025, 10, 10, 12, tzinfo=dt_timezone.utc)
+        self._factura(1, self.cliente, octubre, pdf=b"%PDF uno")
+        self._factura(2, self.otro, octubre)  # sin PDF todavía
+        self._factura(3, self.cliente, datetime(2025, 11, 2, 12, tzinfo=dt_timezone.utc), pdf=b"%PDF tres")
+
+        response = self.client.get("/api/facturas/export.zip", {"desde": "2025-10-01", "hasta": "2025-10-31"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertIn("facturas_2025-10-01_2025-10-31.zip", response["Content-Disposition"])
+        archivo = self._zip(response)
+        self.assertEqual(archivo.namelist(), ["cbte_11_3_1.pdf", "cbte_11_3_2.pdf"])
+        self.assertEqual(archivo.read("cbte_11_3_1.pdf"), b"%PDF uno")
+        self.assertEqual(archivo.read("cbte_11_3_2.pdf"), b"%PDF generado")
+        mock_render.assert_called_once()
+
+    def test_filtra_por_cliente(self):
+        hoy = datetime(2025, 10, 10, 12, tzinfo=dt_timezone.utc)
+        self._factura(1, self.cliente, hoy, pdf=b"%PDF uno")
+        self._factura(2, self.otro, hoy, pdf=b"%PDF dos")
+
+        response = self.client.get("/api/facturas/export.zip", {"client": self.otro.id})
+
+        self.assertEqual(self._zip(response).namelist(), ["cbte_11_3_2.pdf"])
+
+    @patch("afip.fe_service._render_pdf_to_bytes", side_effect=ValueError("template roto"))
+    def test_las_que_no_se_pueden_generar_van_a_errores(self, _mock_render):
+        self._factura(1, self.cliente, datetime(2025, 10, 10, 12, tzinfo=dt_timezone.utc))
+
+        archivo = self._zip(self.client.get("/api/facturas/export.zip"))
+
+        self.assertEqual(archivo.namelist(), ["errores.txt"])
+        self.assertIn("template roto", archivo.read("errores.txt").decode())
+
+    def test_rango_invalido(self):
+        response = self.client.get("/api/facturas/export.zip", {"desde": "2025-10-31", "hasta": "2025-10-01"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch.object(exportacion, "BLOQUE", 1024)
+    def test_el_zip_sale_en_bloques(self):
+        hoy = datetime(2025, 10, 10, 12, tzinfo=dt_timezone.utc)
+        for nro in range(1, 4):
+            self._factura(nro, self.cliente, hoy, pdf=b"%" * 10_000)
+
+        partes = list(exportacion.iterar_zip_facturas(exportacion.filtrar_facturas()))
+
+        # Ningún bloque trae más que un pedazo de PDF más encabezados: el ZIP nunca se arma entero.
+        self.assertGreater(len(partes), 30)
+        self.assertLess(max(len(p) for p in partes), 2048)
+        self.assertEqual(len(zipfile.ZipFile(BytesIO(b"".join(partes))).namelist()), 3)
+
+    @patch("afip.pdf_renderer.renderizar")
+    def test_el_zip_no_renderiza_los_que_faltan(self, mock_renderizar):
+        self._factura(1, self.cliente, datetime(2025, 10, 10, 12, tzinfo=dt_timezone.utc), pdf=b"%PDF uno")
+        self._factura(2, self.cliente, datetime(2025, 10, 10, 12, tzinfo=dt_timezone.utc))
+
+        partes = list(exportacion.iterar_zip_facturas(exportacion.filtrar_facturas()))
+
+        archivo = zipfile.ZipFile(BytesIO(b"".join(partes)))
+        self.assertEqual(archivo.namelist(), ["cbte_11_3_1.pdf", "errores.txt"])
+        self.assertIn("cbte_11_3_2.pdf: sin PDF generado", archivo.read("errores.txt").decode())
+        mock_renderizar.assert_not_called()
@@ -1,8 +1,10 @@
+import tempfile
 from decimal import Decimal
 from unittest.mock import patch
 
 import afip.fe_service  # noqa: F401
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -10,8 +12,13 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from billing.models import Client, Invoice
 
 
+@override_settings(FACTURACION_EMISION_ASINCRONA=False)
 class FacturacionAPITestCase(APITestCase):
     def setUp(self):
+        # El numerador consulta FECompUltimoAutorizado antes de reservar.
+        ultimo = patch("afip.solicitar_cae.ultimo_autorizado", return_value=0)
+        ultimo.start()
+        self.addCleanup(ultimo.stop)
         user_model = get_user_model()
         self.admin = user_model.objects.create_user(
             email="admin@example.com", password="password", is_staff=True
@@ -178,3 +185,65 @@ class FacturacionAPITestCase(APITestCase):
         response = self.client.get("/api/facturas/")
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @patch("afip.fe_service.fe.obtener_tipos_comprobante_validos", return_value=[11])
+    @patch("afip.fe_service._render_pdf_to_bytes", return_value=b"PDF")
+    @patch("afip.fe_service.fe.solicitar_cae_lote")
+    def test_emitir_lote(self, mock_lote, _mock_pdf, _mock_tipos):
+        mock_lote.return_value = [
+            {"cae": "111", "cae_due": "20251231", "cbte_nro": 5, "resultado": "A", "xml": "<xml/>", "observations": []},
+            {"cae": None, "cae_due": None, "cbte_nro": None, "resultado": "R", "xml": "<xml/>", "observations": ["10015: DocNro"]},
+        ]
+        payload = {
+            "pto_vta": 3,
+            "cbte_tipo": 11,
+            "comprobantes": [
+                {"client_id": self.client_obj.id, "amount": "121.00", "doc_nro": "20-12345678-9"},
+                {"client_id": self.client_obj.id, "amount": "242.00", "doc_nro": "1"},
+            ],
+        }
+
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            response = self.client.post("/api/facturas/emitir-lote/", payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        mock_lote.assert_called_once()
+        self.assertEqual(len(mock_lote.call_args.args[2]), 2)
+        self.assertEqual(mock_lote.call_args.kwargs["cbte_tipo"], 11)
+
+        invoice = Invoice.objects.get()
+        self.assertEqual(invoice.cbte_nro, 5)
+        self.assertEqual(invoice.cae, "111")
+        resultados = response.data["resultados"]
+        self.assertEqual(resultados[0]["invoice"]["id"], invoice.id)
+        self.assertIsNone(resultados[1]["invoice"])
+        self.assertEqual(resultados[1]["observations"], ["10015: DocNro"])
+
+    def test_emitir_lote_cliente_inexistente(self):
+        payload = {
+            "pto_vta": 3,
+            "comprobantes": [{"client_id": 999, "amount": "100.00", "doc_nro": "1"}],
+        }
+
+        response = self.client.post("/api/facturas/emitir-lote/", payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("comprobantes", response.data)
+
+    @override_settings(FACTURACION_PDF_PROCESOS=0)
+    @patch("afip.fe_service._render_pdf_to_bytes", return_value=b"%PDF-1.4 factura")
+    def test_descargar_pdf_lo_genera_si_esta_pendiente(self, mock_render):
+        invoice = Invoice.objects.create(
+            client=self.client_obj, amount=Decimal("121.00"), pto_vta=3, cbte_tipo=11, cbte_nro=7, cae="123"
+        )
+
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            response = self.client.get(f"/api/{invoice.id}/facturas/pdf/")
+            contenido = b"".join(response.streaming_content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(contenido, b"%PDF-1.4 factura")
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.pdf_status, Invoice.PDF_LISTO)
+        mock_render.assert_called_once()
@@ -0,0 +1,41 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+def _entrada(cuit, estado="ok"):
+    return {"cuit": cuit, "estado": estado, "datos": {}, "consultado": None, "desactualizado": False, "error": None}
+
+
+class PadronAPITestCase(APITestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(email="user@example.com", password="password")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+    @patch("billing.views.consultar_contribuyente", return_value=_entrada("30716004720"))
+    def test_consulta_individual(self, mock_consulta):
+        response = self.client.get("/api/padron/30-71600472-0/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_consulta.assert_called_once_with("30-71600472-0", forzar=False)
+
+    @patch("billing.views.consultar_contribuyente", return_value=_entrada("30716004720", "no_encontrado"))
+    def test_cuit_inexistente(self, _mock_consulta):
+        response = self.client.get("/api/padron/30716004720/")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch("billing.views.consultar_contribuyentes")
+    def test_consulta_en_lote(self, mock_lote):
+        mock_lote.return_value = {c: _entrada(c) for c in ("20111111112", "20222222223")}
+
+        response = self.client.post(
+            "/api/padron/lote/", {"cuits": ["20111111112", "20222222223"]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["resultados"]), 2)
+        mock_lote.assert_called_once_with(["20111111112", "20222222223"], forzar=False)
@@ -1,21 +1,20 @@
 import base64
 import binascii
 import json
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from decimal import Decimal
 
+from django.conf import settings
 from django.core.mail import EmailMessage
 from django.db.models import (
-    Case,
     Count,
     DecimalField,
-    ExpressionWrapper,
     F,
     Sum,
     Value,
-    When,
 )
 from django.db.models.functions import Coalesce
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
@@ -23,21 +22,30 @@ from rest_framework.permissions import AllowAny, BasePermission
 from rest_framework.response import Response
 # from rest_framework.exceptions import ValidationError
 
-from billing.models import Client, Invoice, Product, Provider
+from billing.emision import emitir_desde_datos, encolar_emision, error_de_validacion
+from billing.exportacion import filtrar_facturas, iterar_zip_facturas, preparar_pdfs
+from billing.models import Client, EmisionJob, Invoice, Product, Provider
 from billing.serializers import (
     CPEInvoiceSerializer,
     CPEListSerializer,
+    CPELoteSerializer,
     CPERequestSerializer,
     CPETariffUpdateSerializer,
     CPESerializer,
     ClientSerializer,
+    EmisionJobSerializer,
     EmitirFacturaSerializer,
+    EmitirLoteSerializer,
+    ExportarFacturasSerializer,
     InvoiceSerializer,
+    PadronLoteSerializer,
     ProviderSerializer,
     TarifaSerializer,
 )
-from afip.cpe_service import _find_first, CPEConsultationError, consultar_cpe_por_ctg
-from afip.fe_service import emitir_y_guardar_factura
+from afip.cpe_service import _find_first, CPEConsultationError, consultar_cpe_por_ctg, consultar_cpes
+from afip.fe_service import emitir_lote_y_guardar, validar_tipo_habilitado
+from afip.padron import consultar_contribuyente, consultar_contribuyentes
+from afip.pdf_renderer import asegurar_pdf
 from trips.models import CPEAutomotor
 
 
@@ -48,6 +56,24 @@ class AuthenticatedAccess(BasePermission):
         return bool(request.user and request.user.is_authenticated)
 
 
+def _esperar_pdf(inv: Invoice) -> Response | None:
+    """Espera (o dispara) el render del PDF; devuelve la respuesta de error si no se pudo."""
+    try:
+        asegurar_pdf(inv)
+    except FuturesTimeoutError:
+        return Response(
+            {"detail": "El PDF de la factura todavía se está generando.", "pdf_status": Invoice.PDF_GENERANDO},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "5"},
+        )
+    except Exception as exc:
+        return Response(
+            {"detail": f"No se pudo generar el PDF de la factura: {exc}", "pdf_status": Invoice.PDF_ERROR},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    return None
+
+
 def _normalize_tax_id(value: str | None) -> str:
     if not value:
         return ""
@@ -106,39 +132,107 @@ class FacturacionViewSet(viewsets.ViewSet):
 
         return Response(CPESerializer(cpe).data)
 
+    @action(detail=False, methods=["post"], url_path="cpe/consultar-lote")
+    def consultar_cpe_lote(self, request):
+        s = CPELoteSerializer(data=request.data)
+        s.is_valid(raise_exception=True)
+        try:
+            resultados = consultar_cpes(s.validated_data["ctgs"])
+        except Exception as exc:  # pragma: no cover - defensivo, depende de WSAA
+            return Response(
+                {"detail": f"No fue posible consultar las cartas de porte: {exc}"},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
+
+        salida = []
+        for resultado in resultados.values():
+            cpe = resultado["cpe"]
+            salida.append({**resultado, "cpe": CPEListSerializer(cpe).data if cpe else None})
+        return Response({"resultados": salida})
+
     @action(detail=False, methods=["post"], url_path="facturas/emitir")
     def emitir(self, request):
         s = EmitirFacturaSerializer(data=request.data)
         s.is_valid(raise_exception=True)
-        client = Client.objects.get(pk=s.validated_data["client_id"])
+
+        if getattr(settings, "FACTURACION_EMISION_ASINCRONA", False):
+            get_object_or_404(Client, pk=s.validated_data["client_id"])
+            try:
+                # Chequeo barato (cacheado) para rechazar en el acto lo que el worker rechazaría.
+                validar_tipo_habilitado(settings.AFIP_CUIT_EMISOR, s.validated_data["pto_vta"], s.validated_data["cbte_tipo"])
+            except ValueError as exc:
+                return Response({"cbte_tipo": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+            job = encolar_emision(s)
+            return Response(EmisionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            inv = emitir_desde_datos(s.validated_data)
+        except ValueError as exc:
+            return Response(error_de_validacion(exc), status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(InvoiceSerializer(inv).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["get"], url_path="facturas/jobs/(?P<job_id>[^/.]+)")
+    def estado_emision(self, request, job_id=None):
+        job = get_object_or_404(EmisionJob.objects.select_related("invoice__client"), pk=job_id)
+        return Response(EmisionJobSerializer(job).data)
+
+    @action(detail=False, methods=["post"], url_path="facturas/emitir-lote")
+    def emitir_lote(self, request):
+        s = EmitirLoteSerializer(data=request.data)
+        s.is_valid(raise_exception=True)
         try:
-            inv = emitir_y_guardar_factura(
-                client=client,
-                amount=s.validated_data["amount"],
+            resultados = emitir_lote_y_guardar(
                 pto_vta=s.validated_data["pto_vta"],
                 cbte_tipo=s.validated_data["cbte_tipo"],
-                doc_tipo=s.validated_data["doc_tipo"],
-                doc_nro=s.validated_data["doc_nro"],
-                condicion_iva_receptor_id=s.validated_data.get("condicion_iva_receptor_id", 5),
-                iva_rate=s.validated_data.get("iva_rate"),
-                cbtes_asoc=s.validated_data.get("cbtes_asoc"),
-                periodo_asoc=s.validated_data.get("periodo_asoc"),
+                comprobantes=s.validated_data["comprobantes"],
             )
         except ValueError as exc:
-            return Response({"cbte_tipo": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(error_de_validacion(exc), status=status.HTTP_400_BAD_REQUEST)
+        except RuntimeError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
 
-        return Response(InvoiceSerializer(inv).data, status=status.HTTP_201_CREATED)
+        data = [
+            {
+                "index": idx,
+                "resultado": r["resultado"],
+                "observations": r["observations"],
+                "invoice": InvoiceSerializer(r["invoice"]).data if r["invoice"] else None,
+            }
+            for idx, r in enumerate(resultados)
+        ]
+        todos_ok = all(r["invoice"] for r in resultados)
+        return Response(
+            {"resultados": data},
+            status=status.HTTP_201_CREATED if todos_ok else status.HTTP_207_MULTI_STATUS,
+        )
 
     @action(detail=False, methods=["get"], url_path="facturas")
     def list_facturas(self, request):
         qs = Invoice.objects.select_related("client").order_by("-id")
         return Response(InvoiceSerializer(qs, many=True).data)
 
+    # Ruta exacta /api/facturas/export.zip (sin barra final): se registra en server/urls.py.
+    def exportar_facturas(self, request):
+        s = ExportarFacturasSerializer(data=request.query_params)
+        s.is_valid(raise_exception=True)
+        filtros = s.validated_data
+        facturas = filtrar_facturas(**filtros)
+        errores = preparar_pdfs(facturas)
+        response = StreamingHttpResponse(iterar_zip_facturas(facturas, errores), content_type="application/zip")
+        sufijo = "_".join(str(filtros[k]) for k in ("desde", "hasta") if filtros.get(k)) or "todas"
+        response["Content-Disposition"] = f'attachment; filename="facturas_{sufijo}.zip"'
+        return response
+
     @action(detail=True, methods=["post"], url_path="facturas/enviar")
     def enviar_mail(self, request, pk=None):
         inv = Invoice.objects.select_related("client").get(pk=pk)
         if not inv.client.email:
             return Response({"detail":"El cliente no tiene email"}, status=400)
+        error = _esperar_pdf(inv)
+        if error is not None:
+            return error
+        inv.refresh_from_db(fields=["pdf", "pdf_status"])
         email = EmailMessage(
             subject=f"Factura {inv.cbte_tipo}-{inv.pto_vta}-{inv.cbte_nro}",
             body=f"Hola {inv.client.name}, te enviamos tu comprobante.",
@@ -149,6 +243,20 @@ class FacturacionViewSet(viewsets.ViewSet):
         email.send()
         return Response({"ok": True})
 
+    @action(detail=True, methods=["get"], url_path="facturas/pdf")
+    def descargar_pdf_factura(self, request, pk=None):
+        inv = get_object_or_404(Invoice.objects.select_related("client"), pk=pk)
+        error = _esperar_pdf(inv)
+        if error is not None:
+            return error
+        inv.refresh_from_db(fields=["pdf", "pdf_status"])
+        return FileResponse(
+            inv.pdf.open("rb"),
+            as_attachment=True,
+            filename=inv.pdf.name.rsplit("/", 1)[-1],
+            content_type="application/pdf",
+        )
+
     @action(detail=False, methods=["get", "post"], url_path="clientes")
     def clientes(self, request):
         if request.method.lower() == "post":
@@ -173,6 +281,29 @@ class FacturacionViewSet(viewsets.ViewSet):
         serializer.save()
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"], url_path="padron/(?P<cuit>[0-9-]+)")
+    def padron(self, request, cuit=None):
+        try:
+            entrada = consultar_contribuyente(cuit, forzar=request.query_params.get("forzar") == "1")
+        except ValueError as exc:
+            return Response({"cuit": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        if entrada["estado"] == "no_encontrado":
+            return Response(entrada, status=status.HTTP_404_NOT_FOUND)
+        if entrada["estado"] == "error":
+            return Response(entrada, status=status.HTTP_502_BAD_GATEWAY)
+        return Response(entrada)
+
+    @action(detail=False, methods=["post"], url_path="padron/lote")
+    def padron_lote(self, request):
+        s = PadronLoteSerializer(data=request.data)
+        s.is_valid(raise_exception=True)
+        try:
+            resultados = consultar_contribuyentes(s.validated_data["cuits"], forzar=s.validated_data["forzar"])
+        except ValueError as exc:
+            return Response({"cuits": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"resultados": list(resultados.values())})
+
     @action(detail=False, methods=["get"], url_path="envios")
     def list_envios(self, request):
         qs = CPEAutomotor.objects.order_by("-fecha_emision", "-id")
@@ -180,18 +311,6 @@ class FacturacionViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=["get"], url_path="estadisticas/dominios")
     def estadisticas_dominios(self, request):
-        facturacion_expr = Case(
-            When(
-                peso_bruto_descarga__isnull=False,
-                then=ExpressionWrapper(
-                    Coalesce(F("tariff"), Value(Decimal("0"))) * F("peso_bruto_descarga"),
-                    output_field=DecimalField(max_digits=20, decimal_places=2),
-                ),
-            ),
-            default=Coalesce(F("tariff"), Value(Decimal("0"))),
-            output_field=DecimalField(max_digits=20, decimal_places=2),
-        )
-
         dominios = (
             CPEAutomotor.objects.filter(vehicle__domain__isnull=False)
             .values("vehicle__domain")
@@ -200,7 +319,7 @@ class FacturacionViewSet(viewsets.ViewSet):
                 movimientos=Count("id"),
                 total_ctg=Count("id"),
                 facturacion=Coalesce(
-                    Sum(facturacion_expr),
+                    Sum("importe_total"),
                     Value(
                         Decimal("0"),
                         output_field=DecimalField(max_digits=20, decimal_places=2),
@@ -258,7 +377,7 @@ class FacturacionViewSet(viewsets.ViewSet):
             .filter(client=client)
             .order_by("-fecha_emision", "-id")
         )
-        normalized_tax_id = _normalize_tax_id(client.tax_id)
+        normalized_tax_id = client.tax_id_normalized
         if normalized_tax_id:
             candidatos = (
                 CPEAutomotor.objects.select_related("client", "provider", "product")
@@ -297,7 +416,16 @@ class FacturacionViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=["get"], url_path="cpe/(?P<cpe_id>[^/.]+)/pdf")
     def descargar_pdf_cpe(self, request, cpe_id=None):
-        cpe = get_object_or_404(CPEAutomotor, pk=cpe_id)
+        cpe = get_object_or_404(CPEAutomotor.objects.only("id", "nro_ctg", "pdf"), pk=cpe_id)
+        if cpe.pdf:
+            return FileResponse(
+                cpe.pdf.open("rb"),
+                as_attachment=True,
+                filename=f"cpe-{cpe.nro_ctg}.pdf",
+                content_type="application/pdf",
+            )
+
+        # CPE guardada antes de separar el PDF y todavía sin pasar por extraer_pdfs_cpe.
         pdf_base64 = _find_first(cpe.raw_response or {}, {"pdf"})
         if not pdf_base64:
             return Response(
@@ -2,3 +2,7 @@ import os
 from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server.settings")
 application = get_asgi_application()
+
+from afip.arranque import iniciar_servidor  # noqa: E402 - después de configurar Django
+
+iniciar_servidor()
@@ -115,3 +115,52 @@ EMAIL_HOST_PASSWORD = "pineuijecxkugaxo"  # App Password (sin espacios)
 
 DEFAULT_FROM_EMAIL = "LoteryAppPC <loteryapppc@gmail.com>"
 SERVER_EMAIL = DEFAULT_FROM_EMAIL
+
+# AFIP
+AFIP_CUIT_EMISOR = os.getenv("AFIP_CUIT_EMISOR", "30716004720")
+# Servicios cuyo ticket WSAA se renueva en segundo plano y margen (segundos) antes del vencimiento.
+AFIP_WSAA_SERVICIOS = ["wsfe", "wscpe", "ws_sr_padron_a13"]
+AFIP_WSAA_MARGEN_RENOVACION = int(os.getenv("AFIP_WSAA_MARGEN_RENOVACION", "1800"))
+AFIP_WSAA_INTERVALO_RENOVADOR = int(os.getenv("AFIP_WSAA_INTERVALO_RENOVADOR", "60"))
+# Arranca el renovador como hilo en cada proceso web, desde server/wsgi.py y asgi.py (alternativa: manage.py renovar_tickets_afip).
+AFIP_WSAA_RENOVADOR_AUTOMATICO = os.getenv("AFIP_WSAA_RENOVADOR_AUTOMATICO", "0") == "1"
+# Dónde se guardan los TA por (CUIT, servicio): "file" (secrets/) o "db" (compartido entre nodos).
+AFIP_CREDENTIAL_STORE = os.getenv("AFIP_CREDENTIAL_STORE", "file")
+# Pools keep-alive del transporte HTTP compartido con AFIP (afip.transport).
+AFIP_HTTP_POOL_CONNECTIONS = int(os.getenv("AFIP_HTTP_POOL_CONNECTIONS", "10"))
+AFIP_HTTP_POOL_MAXSIZE = int(os.getenv("AFIP_HTTP_POOL_MAXSIZE", "10"))
+# Cache de FEParamGetTiposCbte (segundos) y puntos de venta a precargar al arrancar el servidor
+# (server/wsgi.py, asgi.py) y el worker procesar_emisiones (ej. "3,4").
+AFIP_TIPOS_CBTE_TTL = int(os.getenv("AFIP_TIPOS_CBTE_TTL", "86400"))
+AFIP_PRECARGAR_PTO_VTAS = [int(p) for p in os.getenv("AFIP_PRECARGAR_PTO_VTAS", "").split(",") if p.strip()]
+# Numeración local de comprobantes: cada cuánto (segundos) se revalida contra FECompUltimoAutorizado.
+AFIP_NUMERADOR_RESYNC_SEGUNDOS = int(os.getenv("AFIP_NUMERADOR_RESYNC_SEGUNDOS", "3600"))
+
+# Emisión de facturas: por defecto dentro del request. Con "1" se encola (202 + job) y hace
+# falta al menos un worker `manage.py procesar_emisiones`; sin worker los jobs no avanzan.
+FACTURACION_EMISION_ASINCRONA = os.getenv("FACTURACION_EMISION_ASINCRONA", "0") == "1"
+FACTURACION_EMISION_MAX_INTENTOS = int(os.getenv("FACTURACION_EMISION_MAX_INTENTOS", "3"))
+# PDF de facturas: procesos del pool de render (0 = en el mismo hilo) y espera máxima al pedirlo.
+FACTURACION_PDF_PROCESOS = int(os.getenv("FACTURACION_PDF_PROCESOS", "2"))
+FACTURACION_PDF_TIMEOUT = int(os.getenv("FACTURACION_PDF_TIMEOUT", "60"))
+# Motor por template: "directo" (reportlab, layout fijo) o "html" (WeasyPrint / xhtml2pdf).
+FACTURACION_PDF_MOTORES = {
+    "billing/invoice_template.html": os.getenv("FACTURACION_PDF_MOTOR_FACTURA", "directo"),
+}
+
+# Modo de autorización: "CAE" (AFIP en cada factura) o "CAEA" (emisión local + manage.py informar_caea).
+AFIP_MODO_EMISION = os.getenv("AFIP_MODO_EMISION", "CAE").upper()
+AFIP_CAEA_INTERVALO_INFORME = int(os.getenv("AFIP_CAEA_INTERVALO_INFORME", "300"))
+
+# Cache de Padrón A13: segundos hasta revalidar, hasta dejar de servir la copia vieja, de un
+# "no encontrado" (CUIT inexistente o Fault) y requests en paralelo.
+AFIP_PADRON_TTL = int(os.getenv("AFIP_PADRON_TTL", str(7 * 86400)))
+AFIP_PADRON_STALE = int(os.getenv("AFIP_PADRON_STALE", str(30 * 86400)))
+AFIP_PADRON_TTL_NEGATIVO = int(os.getenv("AFIP_PADRON_TTL_NEGATIVO", "900"))
+AFIP_PADRON_CONCURRENCIA = int(os.getenv("AFIP_PADRON_CONCURRENCIA", "4"))
+
+# Consultas a wscpe en paralelo en /api/cpe/consultar-lote/.
+AFIP_CPE_CONCURRENCIA = int(os.getenv("AFIP_CPE_CONCURRENCIA", "4"))
+
+# Entradas por cache de clientes / proveedores / productos / vehículos al ingresar CPE (0 = sin cache)
+CPE_REFERENCIAS_CACHE = int(os.getenv("CPE_REFERENCIAS_CACHE", "4096"))
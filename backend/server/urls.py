@@ -20,5 +20,10 @@ urlpatterns = [
     path("api/auth/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/auth/logout/", TokenBlacklistView.as_view(), name="token_blacklist"),
     path("api/auth/", include("accounts.urls")),
+    path(
+        "api/facturas/export.zip",
+        FacturacionViewSet.as_view({"get": "exportar_facturas"}),
+        name="facturas-export-zip",
+    ),
     path("", include(router.urls)),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
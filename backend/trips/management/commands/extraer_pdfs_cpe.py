@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from afip.cpe_service import guardar_pdf, separar_pdf
+from trips.models import CPEAutomotor
+
+
+class Command(BaseCommand):
+    help = "Pasa a archivos el PDF embebido en raw_response de las CPE ya guardadas y lo saca del JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=200, help="Filas por bulk_update")
+
+    def handle(self, *args, **options):
+        lote = max(options["lote"], 1)
+        total = 0
+        ultimo_id = 0
+        # Por rangos de id, una transacción por lote: si se corta, volver a correrlo sigue
+        # con las que todavía no tienen archivo.
+        while True:
+            cpes = list(
+                CPEAutomotor.objects.filter(pdf="", id__gt=ultimo_id)
+                .only("id", "nro_ctg", "raw_response", "pdf")
+                .order_by("id")[:lote]
+            )
+            if not cpes:
+                break
+            ultimo_id = cpes[-1].id
+            pendientes = []
+            with transaction.atomic():
+                for cpe in cpes:
+                    if guardar_pdf(cpe, separar_pdf(cpe.raw_response or {})):
+                        pendientes.append(cpe)
+                if pendientes:
+                    total += CPEAutomotor.objects.bulk_update(pendientes, ["raw_response", "pdf"])
+        self.stdout.write(self.style.SUCCESS(f"{total} PDF de CPE pasados a archivo"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from afip.cpe_service import IndiceRespuesta, datos_derivados
+from trips.models import CPEAutomotor
+
+CAMPOS = ("peso_bruto_descarga", "peso_tara_descarga", "cuit_pagador", *CPEAutomotor.CAMPOS_DERIVADOS)
+
+
+class Command(BaseCommand):
+    help = "Completa tara, neto, CUIT pagador e importe total de las CPE ya guardadas a partir de raw_response"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500, help="Filas por bulk_update")
+
+    def handle(self, *args, **options):
+        lote = max(options["lote"], 1)
+        pendientes = []
+        total = 0
+        qs = CPEAutomotor.objects.only("id", "raw_response", "tariff", *CAMPOS).order_by("id")
+        for cpe in qs.iterator(chunk_size=lote):
+            for campo, valor in datos_derivados(IndiceRespuesta(cpe.raw_response or {}), cpe.peso_bruto_descarga).items():
+                setattr(cpe, campo, valor)
+            cpe.calcular_derivados()
+            pendientes.append(cpe)
+            if len(pendientes) >= lote:
+                total += CPEAutomotor.objects.bulk_update(pendientes, CAMPOS)
+                pendientes.clear()
+        if pendientes:
+            total += CPEAutomotor.objects.bulk_update(pendientes, CAMPOS)
+        self.stdout.write(self.style.SUCCESS(f"{total} CPE recalculadas"))
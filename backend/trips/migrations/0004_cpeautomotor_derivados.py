@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0003_vehicle_cpeautomotor_vehicle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cpeautomotor',
+            name='cuit_pagador',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=11),
+        ),
+        migrations.AddField(
+            model_name='cpeautomotor',
+            name='importe_total',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='cpeautomotor',
+            name='peso_neto',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='cpeautomotor',
+            name='peso_tara_descarga',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+    ]
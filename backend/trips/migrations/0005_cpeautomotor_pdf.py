@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0004_cpeautomotor_derivados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cpeautomotor',
+            name='pdf',
+            field=models.FileField(blank=True, upload_to='cpe/'),
+        ),
+    ]
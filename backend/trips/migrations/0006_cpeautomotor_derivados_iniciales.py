@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:10
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations
+from django.db.models import Q
+
+
+def calcular_derivados(apps, schema_editor):
+    # Las CPE de antes de 0004 quedaron con peso_neto/importe_total NULL y las estadísticas
+    # suman importe_total. Misma cuenta que CPEAutomotor.calcular_derivados con las columnas
+    # que ya hay (sin tara: tarifa * bruto, como antes); recalcular_cpe la afina con raw_response.
+    CPEAutomotor = apps.get_model("trips", "CPEAutomotor")
+    qs = CPEAutomotor.objects.filter(
+        Q(peso_neto__isnull=True, peso_bruto_descarga__isnull=False)
+        | Q(importe_total__isnull=True, tariff__isnull=False)
+    ).only("id", "tariff", "peso_bruto_descarga", "peso_tara_descarga", "peso_neto", "importe_total")
+    pendientes = []
+    for cpe in qs.order_by("id").iterator(chunk_size=500):
+        bruto, tara = cpe.peso_bruto_descarga, cpe.peso_tara_descarga
+        neto = bruto
+        if bruto is not None and tara not in (None, Decimal("0")) and bruto - tara > 0:
+            neto = bruto - tara
+        cpe.peso_neto = neto
+        if cpe.tariff is None:
+            cpe.importe_total = None
+        elif neto in (None, Decimal("0")):
+            cpe.importe_total = cpe.tariff
+        else:
+            cpe.importe_total = (cpe.tariff * neto).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        pendientes.append(cpe)
+    CPEAutomotor.objects.bulk_update(pendientes, ["peso_neto", "importe_total"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0005_cpeautomotor_pdf'),
+    ]
+
+    operations = [
+        migrations.RunPython(calcular_derivados, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+from decimal import ROUND_HALF_UP, Decimal
+
 from django.db import models
 
 from billing.models import Client, Product, Provider
@@ -36,7 +38,15 @@ class CPEAutomotor(models.Model):
         max_digits=12, decimal_places=3, null=True, blank=True
     )
     tariff = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    # Derivados de raw_response al ingresar la CPE (ver recalcular_cpe para las viejas).
+    peso_tara_descarga = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
+    cuit_pagador = models.CharField(max_length=11, blank=True, default="", db_index=True)
+    # Calculados en save() a partir de los pesos y la tarifa.
+    peso_neto = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
+    importe_total = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
     raw_response = models.JSONField(default=dict, blank=True)
+    # PDF que trae wscpe, fuera de raw_response (ver extraer_pdfs_cpe para las viejas).
+    pdf = models.FileField(upload_to="cpe/", blank=True)
     vehicle = models.ForeignKey(
         Vehicle,
         on_delete=models.SET_NULL,
@@ -45,9 +55,34 @@ class CPEAutomotor(models.Model):
         related_name="cpe_automotor",
     )
 
+    CAMPOS_BASE_DERIVADOS = frozenset({"peso_bruto_descarga", "peso_tara_descarga", "tariff"})
+    CAMPOS_DERIVADOS = ("peso_neto", "importe_total")
+
     def __str__(self):
         return self.nro_ctg
 
+    def calcular_derivados(self) -> None:
+        """Neto = bruto - tara (si la tara da un neto positivo); total = tarifa * neto."""
+        bruto, tara = self.peso_bruto_descarga, self.peso_tara_descarga
+        neto = bruto
+        if bruto is not None and tara not in (None, Decimal("0")) and bruto - tara > 0:
+            neto = bruto - tara
+        self.peso_neto = neto
+
+        if self.tariff is None:
+            self.importe_total = None
+        elif neto in (None, Decimal("0")):
+            self.importe_total = self.tariff
+        else:
+            self.importe_total = (self.tariff * neto).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+    def save(self, *args, **kwargs):
+        self.calcular_derivados()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and self.CAMPOS_BASE_DERIVADOS.intersection(update_fields):
+            kwargs["update_fields"] = {*update_fields, *self.CAMPOS_DERIVADOS}
+        super().save(*args, **kwargs)
+
     @property
     def vehicle_domain(self) -> str | None:
         return self.vehicle.domain if self.vehicle else None
@@ -1,8 +1,10 @@
 import { Injectable } from '@angular/core';
-import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { HttpClient, HttpErrorResponse } from '@angular/common/http';
+import { Observable, exhaustMap, filter, map, of, switchMap, take, throwError, timeout, timer } from 'rxjs';
 
 const API_BASE = '/api';
+// Espera máxima al job de emisión: si no termina, no hay worker procesando la cola.
+const EMISION_TIMEOUT_MS = 120000;
 
 export interface AuthTokens {
   access: string;
@@ -152,6 +154,34 @@ export interface EstadisticasDominiosResponse {
   mayor_facturacion: DominioEstadistica[];
 }
 
+export interface ContribuyentePadron {
+  cuit: string;
+  estado: 'ok' | 'no_encontrado' | 'error';
+  datos: any | null;
+  consultado: string | null;
+  desactualizado: boolean;
+  error: string | null;
+}
+
+export interface ResultadoCpeLote {
+  nro_ctg: string;
+  estado: 'ok' | 'no_encontrado' | 'error_transitorio' | 'error';
+  codigo: string | null;
+  detalle: string | null;
+  cpe: any | null;
+}
+
+export interface EmisionJob {
+  id: number;
+  estado: 'pendiente' | 'procesando' | 'completado' | 'error';
+  intentos: number;
+  error: any;
+  invoice: any | null;
+  created_at: string;
+  iniciado: string | null;
+  finalizado: string | null;
+}
+
 @Injectable({ providedIn: 'root' })
 export class ApiService {
   constructor(private http: HttpClient) {}
@@ -164,8 +194,46 @@ export class ApiService {
     return this.http.post(`${API_BASE}/cpe/consultar/`, payload);
   }
 
+  consultarCPELote(ctgs: string[]): Observable<{ resultados: ResultadoCpeLote[] }> {
+    return this.http.post<{ resultados: ResultadoCpeLote[] }>(`${API_BASE}/cpe/consultar-lote/`, { ctgs });
+  }
+
   emitirFactura(payload: EnvioFactura): Observable<any> {
-    return this.http.post(`${API_BASE}/facturas/emitir/`, payload);
+    // El backend puede encolar la emisión (202 + job): se espera el resultado y se devuelve la factura.
+    return this.http.post<any>(`${API_BASE}/facturas/emitir/`, payload, { observe: 'response' }).pipe(
+      switchMap(resp => (resp.status === 202 ? this.esperarEmision(resp.body.id) : of(resp.body)))
+    );
+  }
+
+  estadoEmision(jobId: number): Observable<EmisionJob> {
+    return this.http.get<EmisionJob>(`${API_BASE}/facturas/jobs/${jobId}/`);
+  }
+
+  private esperarEmision(jobId: number): Observable<any> {
+    return timer(0, 1500).pipe(
+      exhaustMap(() => this.estadoEmision(jobId)),
+      filter(job => job.estado === 'completado' || job.estado === 'error'),
+      take(1),
+      timeout({
+        first: EMISION_TIMEOUT_MS,
+        with: () =>
+          throwError(
+            () =>
+              new HttpErrorResponse({
+                error: {
+                  detail: `La emisión sigue pendiente (job ${jobId}). Revisá el listado de facturas antes de volver a emitir.`
+                },
+                status: 504
+              })
+          )
+      }),
+      map(job => {
+        if (job.estado === 'error') {
+          throw new HttpErrorResponse({ error: job.error, status: 400 });
+        }
+        return job.invoice;
+      })
+    );
   }
 
   listarFacturas(): Observable<any[]> {
@@ -176,6 +244,10 @@ export class ApiService {
     return this.http.post(`${API_BASE}/${id}/facturas/enviar/`, {});
   }
 
+  descargarPdfFactura(id: number): Observable<Blob> {
+    return this.http.get(`${API_BASE}/${id}/facturas/pdf/`, { responseType: 'blob' });
+  }
+
   listarClientes(): Observable<Client[]> {
     return this.http.get<Client[]>(`${API_BASE}/clientes/`);
   }
@@ -188,6 +260,14 @@ export class ApiService {
     return this.http.put<Client>(`${API_BASE}/clientes/${clienteId}/`, payload);
   }
 
+  consultarPadron(cuit: string): Observable<ContribuyentePadron> {
+    return this.http.get<ContribuyentePadron>(`${API_BASE}/padron/${encodeURIComponent(cuit)}/`);
+  }
+
+  consultarPadronLote(cuits: string[]): Observable<{ resultados: ContribuyentePadron[] }> {
+    return this.http.post<{ resultados: ContribuyentePadron[] }>(`${API_BASE}/padron/lote/`, { cuits });
+  }
+
   listarProveedores(): Observable<Provider[]> {
     return this.http.get<Provider[]>(`${API_BASE}/proveedores/`);
   }
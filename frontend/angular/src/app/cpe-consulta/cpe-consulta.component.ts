@@ -1,5 +1,5 @@
 import { Component } from '@angular/core';
-import { ApiService } from '../core/api.service';
+import { ApiService, ResultadoCpeLote } from '../core/api.service';
 
 @Component({
   selector: 'app-cpe-consulta',
@@ -13,6 +13,9 @@ export class CpeConsultaComponent {
   loading = false;
   lastQuery = '';
   descargandoPdf = false;
+  ctgsLote = '';
+  resultadosLote: ResultadoCpeLote[] = [];
+  loadingLote = false;
 
   constructor(private api: ApiService) {}
 
@@ -30,6 +33,27 @@ export class CpeConsultaComponent {
       error: _ => {
         this.loading = false;
         alert('Error consultando CPE');
+      }
+    });
+  }
+
+  buscarLote() {
+    const ctgs = this.ctgsLote
+      .split(/[\s,;]+/)
+      .map(ctg => ctg.trim())
+      .filter(ctg => ctg);
+    if (!ctgs.length || this.loadingLote) {
+      return;
+    }
+    this.loadingLote = true;
+    this.api.consultarCPELote(ctgs).subscribe({
+      next: r => {
+        this.resultadosLote = r.resultados;
+        this.loadingLote = false;
+      },
+      error: _ => {
+        this.loadingLote = false;
+        alert('Error consultando las CPE');
       }
     });
   }
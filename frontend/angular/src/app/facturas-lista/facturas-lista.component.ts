@@ -11,4 +11,19 @@ export class FacturasListaComponent implements OnInit {
   constructor(private api: ApiService) {}
   ngOnInit(){ this.api.listarFacturas().subscribe(r=>{this.items=r; this.loading=false;}); }
   enviar(id:number){ this.api.enviarFactura(id).subscribe(_=>alert('Enviado!')); }
+  descargar(f:any){
+    // El backend genera el PDF en el momento si todavía no estaba listo.
+    this.api.descargarPdfFactura(f.id).subscribe({
+      next: blob => {
+        const url = window.URL.createObjectURL(blob);
+        const enlace = document.createElement('a');
+        enlace.href = url;
+        enlace.download = `cbte_${f.cbte_tipo}_${f.pto_vta}_${f.cbte_nro}.pdf`;
+        enlace.click();
+        window.URL.revokeObjectURL(url);
+        f.pdf_status = 'listo';
+      },
+      error: _ => alert('No se pudo descargar el PDF de la factura.')
+    });
+  }
 }
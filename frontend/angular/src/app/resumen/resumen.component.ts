@@ -16,6 +16,7 @@ export class ResumenComponent implements OnInit {
   loadingProductos = false;
   loadingEnvios = false;
   guardandoCliente = false;
+  consultandoPadron = false;
   creandoProveedor = false;
   mensajeCliente: string | null = null;
   mensajeProveedor: string | null = null;
@@ -227,6 +228,39 @@ export class ResumenComponent implements OnInit {
     });
   }
 
+  completarDesdePadron(): void {
+    const cuit = this.nuevoCliente.tax_id.replace(/\D/g, '');
+    if (cuit.length !== 11 || this.clienteEditando) {
+      return;
+    }
+    this.consultandoPadron = true;
+    this.api.consultarPadron(cuit).subscribe({
+      next: resp => {
+        this.consultandoPadron = false;
+        const datos = resp.datos || {};
+        const nombre = datos.razon_social || [datos.apellido, datos.nombre].filter(Boolean).join(' ');
+        if (!this.nuevoCliente.name && nombre) {
+          this.nuevoCliente.name = nombre;
+        }
+        const domicilio = (datos.domicilios || [])[0];
+        if (!this.nuevoCliente.fiscal_address && domicilio) {
+          this.nuevoCliente.fiscal_address = [domicilio.direccion, domicilio.localidad, domicilio.provincia]
+            .filter(Boolean)
+            .join(', ');
+        }
+        // A13 informa 1 = Responsable Inscripto; en el alta de clientes es 4
+        const condicion = datos.summary?.condition_id;
+        const mapeo: Record<number, number> = { 1: 4, 5: 5, 6: 6 };
+        if (condicion in mapeo) {
+          this.nuevoCliente.tax_condition = mapeo[condicion];
+        }
+      },
+      error: _ => {
+        this.consultandoPadron = false;
+      }
+    });
+  }
+
   private defaultNuevoCliente(): NuevoCliente {
     return {
       name: '',